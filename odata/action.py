@@ -261,7 +261,7 @@ class ActionBase(object):
 
             entity_collection = []
             for value in (response_data or []):
-                entity_instance = self.return_type_collection.__new__(self.return_type_collection, from_data=value)
+                entity_instance = self.return_type_collection.__new__(self.return_type_collection, from_data=value, connection=connection)
                 entity_collection.append(entity_instance)
             return entity_collection
 
@@ -270,7 +270,7 @@ class ActionBase(object):
                 prop = self.return_type
                 return prop('temp').deserialize(response_data)
 
-            entity_instance = self.return_type.__new__(self.return_type, from_data=response_data)
+            entity_instance = self.return_type.__new__(self.return_type, from_data=response_data, connection=connection)
             return entity_instance
 
         # no defined type, return whatever we got
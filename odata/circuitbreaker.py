@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+Circuit breaker
+===============
+
+When an endpoint is down, every request waits for the connection timeout
+before failing. A :py:class:`CircuitBreaker` notices repeated failures and
+makes further requests to the same host fail immediately with
+:py:class:`~odata.exceptions.ODataCircuitOpenError`:
+
+.. code-block:: python
+
+    >>> from odata.circuitbreaker import CircuitBreaker
+    >>> breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=30)
+    >>> Service = ODataService(url, circuit_breaker=breaker)
+
+Connection errors and server errors count as failures, as do requests that
+take longer than ``slow_call_threshold`` seconds when it is given. Time spent
+waiting for a :py:mod:`rate limiter <odata.ratelimit>` is not counted. After
+``failure_threshold`` consecutive failures the circuit opens. Once
+``recovery_timeout`` seconds have passed, a limited number of trial requests
+are let through. The circuit closes when they succeed, and opens again if
+they fail.
+
+Contexts created with :py:func:`~odata.service.ODataService.create_context`
+share the service's breaker.
+
+----
+
+API
+---
+"""
+
+import threading
+import time
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse
+
+from odata.exceptions import ODataCircuitOpenError, ODataConnectionError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class Circuit(object):
+    """
+    State of the circuit of a single host
+    """
+    def __init__(self, host):
+        self.host = host
+        self.state = CLOSED
+        self.failures = 0
+        """Number of consecutive failures"""
+        self.opened_at = None
+        self.trials = 0
+        """Number of trial requests in flight while half-open"""
+
+    def __repr__(self):
+        return '<Circuit {0} {1}>'.format(self.host, self.state)
+
+
+class CircuitBreaker(object):
+    """
+    :param failure_threshold: Number of consecutive failures that opens the circuit
+    :param recovery_timeout: Seconds to keep the circuit open before trial requests
+    :param slow_call_threshold: Requests taking longer than this many seconds count as failures. Disabled if None
+    :param half_open_max_calls: Number of trial requests allowed at once while half-open
+    :param failure_statuses: Response status codes that count as failures
+    """
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, slow_call_threshold=None,
+                 half_open_max_calls=1, failure_statuses=(500, 502, 503, 504)):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.slow_call_threshold = slow_call_threshold
+        self.half_open_max_calls = half_open_max_calls
+        self.failure_statuses = failure_statuses
+        self.circuits = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<CircuitBreaker failure_threshold={0}>'.format(self.failure_threshold)
+
+    def get_circuit(self, url):
+        """
+        :param url: Request URL
+        :return: Circuit instance of the URL's host
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            circuit = self.circuits.get(host)
+            if circuit is None:
+                circuit = Circuit(host)
+                self.circuits[host] = circuit
+        return circuit
+
+    def before_request(self, url):
+        """
+        :param url: Request URL
+        :raises ODataCircuitOpenError: The circuit of the host is open
+        """
+        circuit = self.get_circuit(url)
+        with self._lock:
+            if circuit.state == OPEN:
+                if time.time() - circuit.opened_at < self.recovery_timeout:
+                    raise ODataCircuitOpenError(u'Circuit open for {0}'.format(circuit.host))
+                circuit.state = HALF_OPEN
+                circuit.trials = 0
+
+            if circuit.state == HALF_OPEN:
+                if circuit.trials >= self.half_open_max_calls:
+                    raise ODataCircuitOpenError(u'Circuit half-open for {0}'.format(circuit.host))
+                circuit.trials += 1
+
+    def record_success(self, url, elapsed):
+        """
+        :param url: Request URL
+        :param elapsed: Duration of the request in seconds
+        """
+        if self.slow_call_threshold is not None and elapsed > self.slow_call_threshold:
+            self.record_failure(url)
+            return
+
+        circuit = self.get_circuit(url)
+        with self._lock:
+            circuit.failures = 0
+            if circuit.state == HALF_OPEN:
+                circuit.trials -= 1
+                circuit.state = CLOSED
+
+    def record_failure(self, url):
+        """
+        :param url: Request URL
+        """
+        circuit = self.get_circuit(url)
+        with self._lock:
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or circuit.failures >= self.failure_threshold:
+                circuit.state = OPEN
+                circuit.opened_at = time.time()
+                circuit.trials = 0
+
+    def release(self, url):
+        """
+        Settle a request that ended without an outcome for the host, giving
+        back its trial if the circuit is half-open
+
+        :param url: Request URL
+        """
+        circuit = self.get_circuit(url)
+        with self._lock:
+            if circuit.state == HALF_OPEN and circuit.trials > 0:
+                circuit.trials -= 1
+
+    def call(self, url, send):
+        """
+        Send a request through the circuit of its host
+
+        :param url: Request URL
+        :param send: Function that sends the request and returns the response
+        :return: Response object
+        """
+        self.before_request(url)
+        started = time.time()
+        try:
+            response = send()
+        except ODataConnectionError:
+            self.record_failure(url)
+            raise
+        except BaseException:
+            # not caused by the host, like a passed deadline: only give back the trial
+            self.release(url)
+            raise
+
+        if response.status_code in self.failure_statuses:
+            self.record_failure(url)
+        else:
+            self.record_success(url, time.time() - started)
+        return response
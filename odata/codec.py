@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+JSON codecs
+===========
+
+Request and response bodies are encoded and decoded by the codec of the
+connection. The default :py:class:`JSONCodec` uses the standard library.
+Decoding large responses is often the most CPU intensive part of a query, so
+a faster implementation can be plugged in with the ``codec`` connection
+option:
+
+.. code-block:: python
+
+    >>> from odata.codec import OrjsonCodec
+    >>> Service = ODataService(url, codec=OrjsonCodec())
+
+:py:class:`OrjsonCodec` requires the `orjson`_ package. It decodes the
+response bytes directly, without creating a decoded text copy first.
+
+Numbers with a fractional part are decoded as floats by default. To keep the
+exact value of decimals, use ``JSONCodec(use_decimal=True)``, which decodes
+them as :py:class:`~decimal.Decimal` instead.
+
+Both codecs encode :py:class:`~decimal.Decimal` values as strings to keep
+their exact value, and request bodies are sent with
+``IEEE754Compatible=true`` so the server reads them as numbers.
+
+Custom codecs implement ``loads`` and ``dumps`` like the classes below.
+``iter_dumps`` is optional, and used to encode request bodies in chunks when
+the ``chunked_requests`` connection option is enabled. Codecs that write
+decimals as strings set ``decimals_as_strings = True``.
+
+.. _orjson: https://github.com/ijl/orjson
+
+----
+
+API
+---
+"""
+
+import json
+from decimal import Decimal
+
+try:
+    # noinspection PyUnresolvedReferences
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        # keep the exact value, DecimalProperty reads it back from a string
+        return str(value)
+    raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+def iter_encode(value, dumps, chunk_size=64 * 1024, depth=3):
+    """
+    Encode a value in chunks. Objects and arrays in the top levels are
+    encoded member by member, so that only one member is encoded at a time
+
+    :param value: Data to encode
+    :param dumps: Function that encodes a value to bytes
+    :param chunk_size: Approximate size of the chunks in bytes
+    :param depth: Number of levels to encode member by member
+    :return: Generator of bytes
+    """
+    buffered = []
+    size = 0
+    for part in _iter_parts(value, dumps, depth):
+        buffered.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield b''.join(buffered)
+            buffered = []
+            size = 0
+    if buffered:
+        yield b''.join(buffered)
+
+
+def _iter_parts(value, dumps, depth):
+    if depth and isinstance(value, dict) and value:
+        separator = b'{'
+        for key, item in value.items():
+            yield separator + _encode_key(key, dumps) + b': '
+            separator = b', '
+            for part in _iter_parts(item, dumps, depth - 1):
+                yield part
+        yield b'}'
+    elif depth and isinstance(value, (list, tuple)) and value:
+        separator = b'['
+        for item in value:
+            yield separator
+            separator = b', '
+            for part in _iter_parts(item, dumps, depth - 1):
+                yield part
+        yield b']'
+    else:
+        yield dumps(value)
+
+
+def _encode_key(key, dumps):
+    if isinstance(key, type(u'')):
+        return dumps(key)
+    # convert, or reject, other keys the same way as in objects encoded whole
+    encoded = dumps({key: None})
+    return encoded[1:encoded.rindex(b':')]
+
+
+class JSONCodec(object):
+    """
+    Codec using the standard library json module
+
+    :param use_decimal: Decode numbers with a fractional part as Decimal instead of float
+    """
+    decimals_as_strings = True
+    """Decimal values are encoded as strings"""
+
+    def __init__(self, use_decimal=False):
+        self.use_decimal = use_decimal
+
+    def __repr__(self):
+        return '<JSONCodec use_decimal={0}>'.format(self.use_decimal)
+
+    def loads(self, data):
+        """
+        :param data: Response body as bytes
+        :return: Decoded data
+        """
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        if self.use_decimal:
+            return json.loads(data, parse_float=Decimal)
+        return json.loads(data)
+
+    def dumps(self, value):
+        """
+        :param value: Data to encode
+        :return: UTF-8 encoded JSON as bytes
+        """
+        return json.dumps(value, default=_default).encode('utf-8')
+
+    def iter_dumps(self, value, chunk_size=64 * 1024):
+        """
+        :param value: Data to encode
+        :param chunk_size: Approximate size of the chunks in bytes
+        :return: Generator of UTF-8 encoded JSON chunks
+        """
+        return iter_encode(value, self.dumps, chunk_size=chunk_size)
+
+
+class OrjsonCodec(object):
+    """
+    Codec using the orjson package. Decimals are encoded as strings and
+    decoded as floats
+    """
+    decimals_as_strings = True
+    """Decimal values are encoded as strings"""
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('OrjsonCodec requires the orjson package')
+
+    def __repr__(self):
+        return '<OrjsonCodec>'
+
+    def loads(self, data):
+        """
+        :param data: Response body as bytes
+        :return: Decoded data
+        """
+        return orjson.loads(data)
+
+    def dumps(self, value):
+        """
+        :param value: Data to encode
+        :return: UTF-8 encoded JSON as bytes
+        """
+        return orjson.dumps(value, default=_default)
+
+    def iter_dumps(self, value, chunk_size=64 * 1024):
+        """
+        :param value: Data to encode
+        :param chunk_size: Approximate size of the chunks in bytes
+        :return: Generator of UTF-8 encoded JSON chunks
+        """
+        return iter_encode(value, self.dumps, chunk_size=chunk_size)
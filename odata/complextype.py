@@ -25,11 +25,11 @@ class ComplexTypeProperty(PropertyBase):
     :param type_class: A subclass of ComplexType
     """
 
-    def __init__(self, name, type_class=ComplexType):
+    def __init__(self, name, type_class=ComplexType, **kwargs):
         """
         :type name: str
         """
-        super(ComplexTypeProperty, self).__init__(name)
+        super(ComplexTypeProperty, self).__init__(name, **kwargs)
         self.type_class = type_class
 
     def serialize(self, value):
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""
+Request bodies
+==============
+
+Bodies of inserts, updates and action calls can be compressed before they
+are sent, for services that accept ``Content-Encoding`` on requests. Small
+bodies gain little from compression, so only bodies of at least
+``compress_min_size`` bytes are compressed:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, compression='gzip', compress_min_size=4096)
+
+Supported encodings are ``gzip`` and ``deflate``.
+
+Very large bodies, like deep inserts with thousands of related entities, can
+also be encoded and sent in chunks instead of building the whole body in
+memory first. Bodies larger than one chunk are then sent with chunked
+transfer encoding, and compressed chunk by chunk when compression is enabled:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, chunked_requests=True, compression='gzip')
+
+Request payloads are logged at DEBUG level, truncated to
+``ODataConnection.log_payload_size`` bytes.
+
+----
+
+API
+---
+"""
+
+import zlib
+
+from odata.exceptions import ODataError
+
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+
+
+def _compressobj(encoding, level):
+    if encoding == GZIP:
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == DEFLATE:
+        return zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS)
+    raise ODataError('Unsupported request compression: {0}'.format(encoding))
+
+
+def compress(data, encoding, level=6):
+    """
+    :param data: Request body as bytes
+    :param encoding: ``gzip`` or ``deflate``
+    :param level: zlib compression level
+    :return: Compressed bytes
+    """
+    compressor = _compressobj(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compress(chunks, encoding, level=6):
+    """
+    Compress a request body given in chunks, without joining them
+
+    :param chunks: Iterable of bytes
+    :param encoding: ``gzip`` or ``deflate``
+    :param level: zlib compression level
+    :return: Generator of compressed bytes
+    """
+    compressor = _compressobj(encoding, level)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 
-import json
 import functools
+import itertools
 import logging
+import threading
+import time
 
 import requests
-from requests.exceptions import RequestException
+from requests.exceptions import RequestException, Timeout
 
 from odata import version
+from .codec import JSONCodec
+from .compression import compress, iter_compress
+from .deadline import bind_deadlines, check_deadlines, get_request_timeout
 from .exceptions import ODataError, ODataConnectionError
+from .singleflight import SingleFlight
+from .streaming import PageParser
 
 
 def catch_requests_errors(fn):
@@ -16,11 +23,88 @@ def catch_requests_errors(fn):
     def inner(*args, **kwargs):
         try:
             return fn(*args, **kwargs)
+        except Timeout as e:
+            # timeouts shortened by a deadline are not the host's fault
+            check_deadlines()
+            raise ODataConnectionError(str(e))
         except RequestException as e:
             raise ODataConnectionError(str(e))
     return inner
 
 
+def retry_requests(method):
+    """
+    Send the request again according to the connection's retry policy.
+    Bodies given as generators can only be sent once and are never retried.
+    Every attempt first checks the deadlines of the current thread
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def inner(self, *args, **kwargs):
+            def send():
+                check_deadlines()
+                return fn(self, *args, **kwargs)
+
+            body = kwargs.get('data')
+            if self.retry is None or not (body is None or isinstance(body, (bytes, type(u'')))):
+                return send()
+            return self.retry.call(method, send)
+        return inner
+    return decorator
+
+
+def circuit_breaker(fn):
+    """Send the request through the connection's circuit breaker"""
+    @functools.wraps(fn)
+    def inner(self, url, *args, **kwargs):
+        if self.circuit_breaker is None:
+            return fn(self, url, *args, **kwargs)
+        return self.circuit_breaker.call(url, lambda: fn(self, url, *args, **kwargs))
+    return inner
+
+
+def rate_limited(fn):
+    """
+    Wait for the connection's rate limiter before sending the request.
+    Streamed responses hold their place until they are closed
+    """
+    @functools.wraps(fn)
+    def inner(self, url, *args, **kwargs):
+        limiter = self.rate_limiter
+        if limiter is None:
+            return fn(self, url, *args, **kwargs)
+        limiter.acquire(url)
+        try:
+            response = fn(self, url, *args, **kwargs)
+        except BaseException:
+            limiter.release(url)
+            raise
+        if kwargs.get('stream'):
+            _call_on_close(response, lambda: limiter.release(url))
+        else:
+            limiter.release(url)
+        return response
+    return inner
+
+
+def _call_on_close(response, callback):
+    """Call ``callback`` once, when ``response`` is closed for the first time"""
+    close = response.close
+    lock = threading.Lock()
+    called = []
+
+    def inner():
+        try:
+            close()
+        finally:
+            with lock:
+                first = not called
+                called.append(True)
+            if first:
+                callback()
+    response.close = inner
+
+
 class ODataConnection(object):
 
     base_headers = {
@@ -29,36 +113,117 @@ class ODataConnection(object):
         'User-Agent': 'python-odata {0}'.format(version),
     }
     timeout = 90
-
-    def __init__(self, session=None, auth=None):
-        if session is None:
-            self.session = requests.Session()
-        else:
+    stream_chunk_size = 64 * 1024
+    request_chunk_size = 64 * 1024
+    log_payload_size = 1000
+    """Maximum number of payload bytes to log at DEBUG level"""
+
+    def __init__(self, session=None, auth=None, page_size=None, metadata=None,
+                 ieee754_compatible=False, codec=None, streaming=False, compression=None,
+                 compress_min_size=1024, chunked_requests=False, retry=None,
+                 rate_limiter=None, circuit_breaker=None, http_cache=None,
+                 coalesce_requests=False, pool=None, hedging=None):
+        if session is not None:
             self.session = session
+        elif pool is not None:
+            self.session = pool.create_session()
+        else:
+            self.session = requests.Session()
+        # a given session does not send its requests through the pool
+        self.pool = pool if session is None else None
+        self.last_used = None
+        """Time the last request was sent, as a timestamp"""
+        self.hedging = hedging
         self.auth = auth
+        self.page_size = page_size
+        self.metadata = metadata
+        self.ieee754_compatible = ieee754_compatible
+        self.codec = codec or JSONCodec()
+        self.streaming = streaming
+        self.compression = compression
+        self.compress_min_size = compress_min_size
+        self.chunked_requests = chunked_requests
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.http_cache = http_cache
+        if coalesce_requests is True:
+            coalesce_requests = SingleFlight()
+        self.single_flight = coalesce_requests or None
         self.log = logging.getLogger('odata.connection')
 
+    def get_accept_header(self, metadata=None, ieee754_compatible=None, streaming=None):
+        """
+        Build the Accept header for the response format. Arguments left as
+        None use the connection's settings
+
+        :param metadata: ``odata.metadata`` level: ``full``, ``minimal`` or ``none``
+        :param ieee754_compatible: Ask for 64-bit integers and decimals as strings
+        :param streaming: Ask for ``odata.streaming`` responses
+        :return: Accept header value
+        """
+        if metadata is None:
+            metadata = self.metadata
+        if ieee754_compatible is None:
+            ieee754_compatible = self.ieee754_compatible
+        if streaming is None:
+            streaming = self.streaming
+
+        accept = [self.base_headers['Accept']]
+        if metadata:
+            accept.append('odata.metadata={0}'.format(metadata))
+        if ieee754_compatible:
+            accept.append('IEEE754Compatible=true')
+        if streaming:
+            accept.append('odata.streaming=true')
+        return ';'.join(accept)
+
+    def get_content_type_header(self):
+        """
+        Build the Content-Type header for request bodies. Codecs that write
+        decimals as strings mark the body as ``IEEE754Compatible``, so the
+        server reads them as numbers
+
+        :return: Content-Type header value
+        """
+        if getattr(self.codec, 'decimals_as_strings', False):
+            return 'application/json;IEEE754Compatible=true'
+        return 'application/json'
+
     def _apply_options(self, kwargs):
-        kwargs['timeout'] = self.timeout
+        self.last_used = time.time()
+        kwargs['timeout'] = get_request_timeout(self.timeout)
 
         if self.auth is not None:
             kwargs['auth'] = self.auth
 
+    @retry_requests('GET')
+    @rate_limited
+    @circuit_breaker
     @catch_requests_errors
     def _do_get(self, *args, **kwargs):
         self._apply_options(kwargs)
         return self.session.get(*args, **kwargs)
 
+    @retry_requests('POST')
+    @rate_limited
+    @circuit_breaker
     @catch_requests_errors
     def _do_post(self, *args, **kwargs):
         self._apply_options(kwargs)
         return self.session.post(*args, **kwargs)
 
+    @retry_requests('PATCH')
+    @rate_limited
+    @circuit_breaker
     @catch_requests_errors
     def _do_patch(self, *args, **kwargs):
         self._apply_options(kwargs)
         return self.session.patch(*args, **kwargs)
 
+    @retry_requests('DELETE')
+    @rate_limited
+    @circuit_breaker
     @catch_requests_errors
     def _do_delete(self, *args, **kwargs):
         self._apply_options(kwargs)
@@ -75,7 +240,7 @@ class ODataConnection(object):
             response_ct = response.headers.get('content-type', '')
 
             if 'application/json' in response_ct:
-                errordata = response.json()
+                errordata = self.codec.loads(response.content)
 
                 if 'error' in errordata:
                     odata_error = errordata.get('error')
@@ -96,36 +261,151 @@ class ODataConnection(object):
             err.detailed_message = detailed_message
             raise err
 
-    def execute_get(self, url, params=None):
-        headers = {}
-        headers.update(self.base_headers)
+    def execute_get(self, url, params=None, headers=None, stats=None):
+        """
+        :param url: URL to GET
+        :param params: Query string parameters
+        :param headers: Additional request headers
+        :param stats: Optional dictionary to fill with ``elapsed`` seconds and response ``bytes``
+        :return: Decoded JSON response or None
+        """
+        request_headers = self._get_request_headers(headers)
 
         self.log.info(u'GET {0}'.format(url))
         if params:
             self.log.info(u'Query: {0}'.format(params))
 
-        response = self._do_get(url, params=params, headers=headers)
-        self._handle_odata_error(response)
+        started = time.time()
+
+        def send(send_headers):
+            if self.hedging is not None:
+                # streamed, so the losing response can be closed unread
+                return self.hedging.call(
+                    lambda: self._do_get(url, params=params, headers=send_headers, stream=True))
+            return self._do_get(url, params=params, headers=send_headers)
+
+        def decode(response):
+            try:
+                self._handle_odata_error(response)
+                if stats is not None:
+                    stats['elapsed'] = time.time() - started
+                    stats['bytes'] = len(response.content or b'')
+                response_ct = response.headers.get('content-type', '')
+                if response.status_code == requests.codes.no_content:
+                    return
+                if 'application/json' in response_ct:
+                    return self.codec.loads(response.content)
+                else:
+                    msg = u'Unsupported response Content-Type: {0}'.format(response_ct)
+                    raise ODataError(msg)
+            finally:
+                # hedged responses are streamed and hold a rate limiter slot until closed
+                response.close()
+
+        def fetch():
+            if self.http_cache is not None:
+                return self.http_cache.fetch(url, params, request_headers, send, decode)
+            return decode(send(request_headers))
+
+        if self.single_flight is not None:
+            key = (url, tuple(sorted((params or {}).items())), tuple(sorted(request_headers.items())))
+            return self.single_flight.do(key, fetch)
+        return fetch()
+
+    def execute_get_stream(self, url, params=None, headers=None):
+        """
+        GET a response to read incrementally. See :py:mod:`odata.streaming`
+
+        :param url: URL to GET
+        :param params: Query string parameters
+        :param headers: Additional request headers
+        :return: :py:class:`~odata.streaming.PageParser` instance or None
+        """
+        request_headers = self._get_request_headers(headers)
+
+        self.log.info(u'GET {0}'.format(url))
+        if params:
+            self.log.info(u'Query: {0}'.format(params))
+
+        response = self._do_get(url, params=params, headers=request_headers, stream=True)
+        try:
+            self._handle_odata_error(response)
+        except Exception:
+            response.close()
+            raise
         response_ct = response.headers.get('content-type', '')
         if response.status_code == requests.codes.no_content:
+            response.close()
             return
         if 'application/json' in response_ct:
-            data = response.json()
-            return data
+            return PageParser(self._iter_content(response), self.codec, response=response,
+                              check=bind_deadlines(check_deadlines))
         else:
+            response.close()
             msg = u'Unsupported response Content-Type: {0}'.format(response_ct)
             raise ODataError(msg)
 
+    def _iter_content(self, response):
+        try:
+            for chunk in response.iter_content(self.stream_chunk_size):
+                yield chunk
+        except RequestException as e:
+            raise ODataConnectionError(str(e))
+
+    def _get_request_headers(self, headers=None):
+        request_headers = {}
+        request_headers.update(self.base_headers)
+        request_headers['Accept'] = self.get_accept_header()
+        if headers:
+            request_headers.update(headers)
+        return request_headers
+
+    def _encode_body(self, data, headers):
+        """
+        Encode a request body. With ``chunked_requests``, bodies larger than
+        one chunk are returned as a generator and sent with chunked
+        transfer encoding
+        """
+        if not self.chunked_requests or not hasattr(self.codec, 'iter_dumps'):
+            body = self.codec.dumps(data)
+            self._log_payload(body)
+            return self._compress_body(body, headers)
+
+        chunks = self.codec.iter_dumps(data, chunk_size=self.request_chunk_size)
+        first = next(chunks, b'')
+        self._log_payload(first)
+        second = next(chunks, None)
+        if second is None:
+            return self._compress_body(first, headers)
+
+        chunks = itertools.chain([first, second], chunks)
+        if self.compression:
+            headers['Content-Encoding'] = self.compression
+            return iter_compress(chunks, self.compression)
+        return chunks
+
+    def _compress_body(self, data, headers):
+        if self.compression and len(data) >= self.compress_min_size:
+            headers['Content-Encoding'] = self.compression
+            return compress(data, self.compression)
+        return data
+
+    def _log_payload(self, data):
+        if not self.log.isEnabledFor(logging.DEBUG):
+            return
+        payload = data[:self.log_payload_size].decode('utf-8', 'replace')
+        if len(data) > self.log_payload_size:
+            payload += u'...'
+        self.log.debug(u'Payload: {0}'.format(payload))
+
     def execute_post(self, url, data, params=None):
         headers = {
-            'Content-Type': 'application/json',
+            'Content-Type': self.get_content_type_header(),
         }
         headers.update(self.base_headers)
 
-        data = json.dumps(data)
-
         self.log.info(u'POST {0}'.format(url))
-        self.log.info(u'Payload: {0}'.format(data))
+        data = self._encode_body(data, headers)
 
         response = self._do_post(url, data=data, headers=headers, params=params)
         self._handle_odata_error(response)
@@ -133,19 +413,17 @@ class ODataConnection(object):
         if response.status_code == requests.codes.no_content:
             return
         if 'application/json' in response_ct:
-            return response.json()
+            return self.codec.loads(response.content)
         # no exceptions here, POSTing to Actions may not return data
 
     def execute_patch(self, url, data):
         headers = {
-            'Content-Type': 'application/json',
+            'Content-Type': self.get_content_type_header(),
         }
         headers.update(self.base_headers)
 
-        data = json.dumps(data)
-
         self.log.info(u'PATCH {0}'.format(url))
-        self.log.info(u'Payload: {0}'.format(data))
+        data = self._encode_body(data, headers)
 
         response = self._do_patch(url, data=data, headers=headers)
         self._handle_odata_error(response)
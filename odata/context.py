@@ -3,19 +3,29 @@
 import logging
 
 from odata.query import Query
+from odata.join import CrossJoinQuery
 from odata.connection import ODataConnection
 
 
 class Context:
 
-    def __init__(self, session=None, auth=None):
+    def __init__(self, session=None, auth=None, **connection_options):
         self.log = logging.getLogger('odata.context')
-        self.connection = ODataConnection(session=session, auth=auth)
+        self.connection = ODataConnection(session=session, auth=auth, **connection_options)
 
     def query(self, entitycls):
         q = Query(entitycls, connection=self.connection)
         return q
 
+    def crossjoin(self, *entities):
+        """
+        Start a new ``$crossjoin`` query over the given entity classes
+
+        :param entities: Entity classes to join
+        :return: CrossJoinQuery instance
+        """
+        return CrossJoinQuery(entities, connection=self.connection)
+
     def call(self, action_or_function, **parameters):
         """
         Call a defined Action or Function using this Context's connection
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+Deadlines and cancellation
+==========================
+
+:py:attr:`~odata.connection.ODataConnection.timeout` limits every socket
+operation separately, so a query that follows many pages has no overall
+bound. A :py:class:`Deadline` gives a block of work a total time budget.
+Every request sent by the thread inside the block is sent with the remaining
+budget as its timeout, and no request is sent once the budget is spent:
+
+.. code-block:: python
+
+    >>> from odata.deadline import Deadline
+    >>> with Deadline(5.0):
+    ...     orders = Service.query(Order).filter(Order.Status == 'Open').all()
+    ...     Service.save(order)
+
+A request that cannot be sent or answered in time raises
+:py:class:`~odata.exceptions.ODataTimeoutError`. Retries stop at the
+deadline as well. These timeouts are caused by the caller's budget rather
+than the host, so a shared :py:mod:`circuit breaker <odata.circuitbreaker>`
+does not count them as failures.
+
+Deadlines can also be cancelled from another thread with a
+:py:class:`CancellationToken`. Cancellation is cooperative: the request in
+flight finishes, and the next one raises
+:py:class:`~odata.exceptions.ODataCancelledError`:
+
+.. code-block:: python
+
+    >>> token = CancellationToken()
+    >>> with Deadline(token=token):
+    ...     for order in Service.query(Order):
+    ...         process(order)
+
+    >>> token.cancel()  # in another thread
+
+Queries are iterated lazily, so a query may be read after its ``with`` block
+has ended. :py:func:`~odata.query.Query.deadline` gives the query a budget
+that starts when its iteration starts and covers all of its pages:
+
+.. code-block:: python
+
+    >>> for order in Service.query(Order).deadline(30.0, token=token):
+    ...     process(order)
+
+Deadlines are nested: a request uses the earliest of the deadlines active in
+its thread.
+
+----
+
+API
+---
+"""
+
+import threading
+import time
+
+from odata.exceptions import ODataTimeoutError, ODataCancelledError
+
+_local = threading.local()
+
+
+class CancellationToken(object):
+    """
+    Cancels the deadlines it is given to, from any thread
+    """
+    def __init__(self):
+        self._cancelled = threading.Event()
+
+    def __repr__(self):
+        return '<CancellationToken cancelled={0}>'.format(self.cancelled)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+
+class Deadline(object):
+    """
+    Time budget for the requests sent inside a ``with`` block
+
+    :param timeout: Seconds from now. No time limit if None
+    :param token: :py:class:`CancellationToken` instance
+    """
+    def __init__(self, timeout=None, token=None):
+        self.timeout = timeout
+        self.token = token
+        if timeout is None:
+            self.expires = None
+        else:
+            self.expires = time.time() + timeout
+
+    def __repr__(self):
+        return '<Deadline remaining={0}>'.format(self.remaining())
+
+    def __enter__(self):
+        _get_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _get_stack().remove(self)
+
+    def remaining(self):
+        """
+        :return: Seconds left, or None if there is no time limit
+        """
+        if self.expires is None:
+            return
+        return max(0.0, self.expires - time.time())
+
+    def check(self):
+        """
+        :raises ODataCancelledError: Token was cancelled
+        :raises ODataTimeoutError: Deadline has passed
+        """
+        if self.token is not None and self.token.cancelled:
+            raise ODataCancelledError('Cancelled')
+        if self.expires is not None and time.time() >= self.expires:
+            raise ODataTimeoutError('Deadline of {0}s exceeded'.format(self.timeout))
+
+
+def _get_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def bind_deadlines(fn):
+    """
+    Bind the deadlines active in the current thread to ``fn``, for calling
+    it in another thread
+
+    :param fn: Function
+    :return: Function that runs ``fn`` with the deadlines active
+    """
+    deadlines = list(_get_stack())
+
+    def inner(*args, **kwargs):
+        stack = _get_stack()
+        stack.extend(deadlines)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            del stack[len(stack) - len(deadlines):]
+    return inner
+
+
+def check_deadlines():
+    """
+    Check the deadlines active in the current thread
+
+    :raises ODataCancelledError: A token was cancelled
+    :raises ODataTimeoutError: A deadline has passed
+    """
+    for deadline in _get_stack():
+        deadline.check()
+
+
+def get_request_timeout(timeout):
+    """
+    :param timeout: Timeout of the connection in seconds
+    :return: The timeout, shortened to the remaining time of the deadlines active in the current thread
+    """
+    for deadline in _get_stack():
+        remaining = deadline.remaining()
+        if remaining is not None:
+            remaining = max(remaining, 0.01)  # zero would make the socket non-blocking
+            timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
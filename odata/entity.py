@@ -103,18 +103,28 @@ class EntityBase(object):
 
         if 'from_data' in kwargs:
             raw_data = kwargs.pop('from_data')
+            connection = kwargs.pop('connection', None)
+            es.connection = connection
 
-            # check for values from $expand
+            # check for values from $expand, nested expands are created recursively
             for prop_name, prop in es.navigation_properties:
                 if prop.name in raw_data:
-                    expanded_data = raw_data.pop(prop.name)
+                    expanded_data = raw_data[prop.name]
                     if prop.is_collection:
-                        es.nav_cache[prop.name] = dict(collection=prop.instances_from_data(expanded_data))
+                        cache = dict(collection=prop.instances_from_data(expanded_data, connection=connection))
+                        count_key = '{0}@odata.count'.format(prop.name)
+                        if count_key in raw_data:
+                            cache['count'] = raw_data[count_key]
+                        es.nav_cache[prop.name] = cache
+                    elif expanded_data is None:
+                        es.nav_cache[prop.name] = dict(single=None)
                     else:
-                        es.nav_cache[prop.name] = dict(single=prop.instances_from_data(expanded_data))
+                        es.nav_cache[prop.name] = dict(single=prop.instances_from_data(expanded_data, connection=connection))
 
+            # properties missing from the response are left unloaded
             for prop_name, prop in es.properties:
-                i.__odata__[prop.name] = raw_data.get(prop.name)
+                if prop.name in raw_data:
+                    i.__odata__[prop.name] = raw_data[prop.name]
 
             i.__odata__.persisted = True
         else:
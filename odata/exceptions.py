@@ -35,6 +35,30 @@ class ODataConnectionError(ODataError):
     pass
 
 
+class ODataCircuitOpenError(ODataConnectionError):
+    """
+    Raised without contacting the endpoint when its circuit breaker is open.
+    See :py:mod:`odata.circuitbreaker`
+    """
+    pass
+
+
+class ODataTimeoutError(ODataError):
+    """
+    Raised instead of sending a request when its deadline has passed. See
+    :py:mod:`odata.deadline`
+    """
+    pass
+
+
+class ODataCancelledError(ODataError):
+    """
+    Raised instead of sending a request when its deadline was cancelled. See
+    :py:mod:`odata.deadline`
+    """
+    pass
+
+
 class ODataQueryError(ODataError):
     pass
 
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+Hedged requests
+===============
+
+A few slow responses, caused for example by garbage collection pauses on the
+server, can dominate the latency of an application. A :py:class:`HedgePolicy`
+given to the connection sends a second copy of a GET request when the first
+has not answered within the usual response time, and uses whichever response
+arrives first:
+
+.. code-block:: python
+
+    >>> from odata.hedging import HedgePolicy
+    >>> hedging = HedgePolicy(percentile=95, budget=0.05)
+    >>> Service = ODataService(url, hedging=hedging)
+
+The delay before the second request is the ``percentile`` of recent response
+times, so only the slowest few percent of requests are hedged. No requests
+are hedged until ``min_samples`` responses have been timed. ``budget``
+limits hedged requests to a share of recent requests, which keeps the extra
+load on the service bounded when it slows down as a whole. Requests count
+less towards the budget as they age, and have little weight left after
+``budget_window`` seconds, so a quiet period does not save up a budget for a
+burst of hedges later.
+
+The response that arrives later is closed without reading its body. Only
+GET requests that are read in full are hedged. Inserts, updates, actions and
+streamed responses are always sent once.
+
+A policy given to the service is shared by its contexts, so the response
+times and the budget are shared as well.
+
+----
+
+API
+---
+"""
+
+import collections
+import math
+import threading
+import time
+
+try:
+    # noinspection PyUnresolvedReferences
+    import queue
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    import Queue as queue
+
+from odata.deadline import bind_deadlines
+
+
+class HedgePolicy(object):
+    """
+    :param percentile: Percentile of recent response times to wait before hedging
+    :param min_delay: Shortest delay before hedging in seconds
+    :param max_delay: Longest delay before hedging in seconds
+    :param budget: Largest share of requests that may be hedged, between 0 and 1
+    :param window: Number of recent response times to keep
+    :param min_samples: Number of response times needed before hedging
+    :param budget_window: Seconds over which the share of hedged requests is measured
+    """
+    def __init__(self, percentile=95.0, min_delay=0.01, max_delay=5.0, budget=0.05,
+                 window=200, min_samples=20, budget_window=60.0):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        self.budget_window = budget_window
+        self.requests = 0
+        self.hedged = 0
+        """Number of requests sent a second time"""
+        self.hedge_wins = 0
+        """Number of hedged requests answered first by the second request"""
+        self._latencies = collections.deque(maxlen=window)
+        self._recent_requests = 0.0
+        self._recent_hedged = 0.0
+        self._decayed_at = time.time()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<HedgePolicy percentile={0} budget={1}>'.format(self.percentile, self.budget)
+
+    def get_delay(self):
+        """
+        :return: Seconds to wait before hedging, or None if there are too few response times
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.min_samples:
+            return
+        index = int(round((len(latencies) - 1) * self.percentile / 100.0))
+        return min(self.max_delay, max(self.min_delay, latencies[index]))
+
+    def record(self, elapsed):
+        """
+        :param elapsed: Response time in seconds
+        """
+        with self._lock:
+            self._latencies.append(elapsed)
+
+    def call(self, send):
+        """
+        Send a request, and send it again if it does not answer within the
+        hedging delay
+
+        :param send: Function that sends the request and returns the response
+        :return: Response object of the first attempt to answer
+        """
+        with self._lock:
+            self._decay()
+            self.requests += 1
+            self._recent_requests += 1
+        delay = self.get_delay()
+        if delay is None:
+            started = time.time()
+            response = send()
+            self.record(time.time() - started)
+            return response
+
+        send = bind_deadlines(send)
+        results = queue.Queue()
+        self._start(send, results, 0)
+        try:
+            outcome = results.get(timeout=delay)
+            pending = 0
+        except queue.Empty:
+            pending = 1
+            if self._acquire_hedge():
+                self._start(send, results, 1)
+                pending = 2
+            outcome = results.get()
+            pending -= 1
+
+        # a failed attempt loses to one that is still running
+        while outcome[2] is not None and pending:
+            failed = outcome
+            outcome = results.get()
+            pending -= 1
+            if outcome[2] is not None:
+                outcome = failed
+
+        if pending:
+            self._discard(results, pending)
+
+        index, response, error, elapsed = outcome
+        if error is not None:
+            raise error
+        self.record(elapsed)
+        if index == 1:
+            with self._lock:
+                self.hedge_wins += 1
+        return response
+
+    def _decay(self):
+        """
+        Age the recent request counts. Must be called with the lock held
+        """
+        now = time.time()
+        factor = math.exp(-max(0.0, now - self._decayed_at) / self.budget_window)
+        self._recent_requests *= factor
+        self._recent_hedged *= factor
+        self._decayed_at = now
+
+    def _acquire_hedge(self):
+        with self._lock:
+            if self._recent_hedged + 1 > self.budget * self._recent_requests:
+                return False
+            self.hedged += 1
+            self._recent_hedged += 1
+            return True
+
+    def _start(self, send, results, index):
+        def attempt():
+            started = time.time()
+            try:
+                results.put((index, send(), None, time.time() - started))
+            except Exception as e:
+                results.put((index, None, e, time.time() - started))
+
+        thread = threading.Thread(target=attempt)
+        thread.daemon = True
+        thread.start()
+
+    def _discard(self, results, pending):
+        def close():
+            for _ in range(pending):
+                response = results.get()[1]
+                if response is not None:
+                    response.close()
+
+        thread = threading.Thread(target=close)
+        thread.daemon = True
+        thread.start()
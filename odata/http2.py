@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP/2 transport
+================
+
+Requests speaks HTTP/1.1, which sends one request at a time per connection.
+Fanning out queries from many threads then needs as many sockets, which
+endpoints behind load balancers often limit per client. With `httpx`_
+installed with its HTTP/2 extra, an :py:class:`HTTP2Pool` multiplexes
+concurrent requests over a few connections:
+
+.. code-block:: bash
+
+    $ pip install odata[http2]
+
+.. code-block:: python
+
+    >>> from odata.http2 import HTTP2Pool
+    >>> Service = ODataService(url, pool=HTTP2Pool(max_connections=4))
+
+The pool takes the place of the :py:class:`~odata.pool.ConnectionPool`, so
+all contexts of the service share its connections while keeping their own
+credentials. Retries, rate limiting, circuit breaking and caching work the
+same as with Requests. Plain ``http://`` URLs and servers without HTTP/2
+support are spoken to with HTTP/1.1.
+
+Credentials can be given as a ``(username, password)`` tuple or as Requests
+auth objects that only add headers, like ``HTTPBasicAuth``. Auth schemes
+that need several round trips, like NTLM, are not supported.
+
+.. _httpx: https://www.python-httpx.org/
+
+----
+
+API
+---
+"""
+
+import threading
+import time
+
+import requests
+from requests.exceptions import ConnectionError, Timeout, HTTPError
+
+from odata.exceptions import ODataError
+
+try:
+    # noinspection PyUnresolvedReferences
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class HTTP2Response(object):
+    """
+    Wraps an httpx response in the parts of the Requests response interface
+    used by the connection
+    """
+    def __init__(self, response):
+        self._response = response
+
+    def __repr__(self):
+        return '<HTTP2Response [{0}]>'.format(self.status_code)
+
+    @property
+    def status_code(self):
+        return self._response.status_code
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def http_version(self):
+        return self._response.http_version
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    def iter_content(self, chunk_size=None):
+        try:
+            for chunk in self._response.iter_bytes(chunk_size):
+                yield chunk
+        except httpx.HTTPError as e:
+            raise ConnectionError(str(e))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            msg = u'{0} {1} for url: {2}'.format(self.status_code, self._response.reason_phrase,
+                                                 self._response.url)
+            raise HTTPError(msg, response=self)
+
+    def close(self):
+        self._response.close()
+
+
+class HTTP2Session(object):
+    """
+    Session sending requests through the client of an :py:class:`HTTP2Pool`
+
+    :param pool: HTTP2Pool instance
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self.headers = dict(pool.headers)
+        self.auth = None
+
+    def _get_auth_headers(self, method, url, auth):
+        if auth is None or isinstance(auth, tuple):
+            return {}
+        prepared = requests.Request(method, url).prepare()
+        auth(prepared)
+        return dict(prepared.headers)
+
+    def request(self, method, url, params=None, headers=None, data=None, timeout=None,
+                auth=None, stream=False):
+        auth = auth or self.auth
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        request_headers.update(self._get_auth_headers(method, url, auth))
+
+        client = self.pool.client
+        request = client.build_request(method, url, params=params, headers=request_headers,
+                                       content=data, timeout=timeout)
+        self.pool._request_started()
+        try:
+            response = client.send(request, auth=auth if isinstance(auth, tuple) else None,
+                                   stream=stream)
+        except httpx.TimeoutException as e:
+            raise Timeout(str(e))
+        except httpx.HTTPError as e:
+            raise ConnectionError(str(e))
+        finally:
+            self.pool._request_finished()
+        return HTTP2Response(response)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        pass
+
+
+class HTTP2Pool(object):
+    """
+    :param max_connections: Number of connections to open at most
+    :param max_keepalive_connections: Number of idle connections to keep open
+    :param keepalive_expiry: Seconds to keep idle connections open
+    :param http2: Negotiate HTTP/2 with servers that support it
+    :param headers: Headers to add to the sessions created from the pool
+    :param transport: Custom httpx transport
+    :raises ODataError: httpx is not installed
+    """
+    def __init__(self, max_connections=10, max_keepalive_connections=None, keepalive_expiry=5.0,
+                 http2=True, headers=None, transport=None):
+        if httpx is None:
+            raise ODataError('HTTP/2 transport requires httpx. Install it with: pip install httpx[http2]')
+
+        self.headers = headers or {}
+        self.sessions = 0
+        """Number of sessions created from the pool"""
+        self.requests = 0
+        self.active = 0
+        """Number of requests being sent"""
+        self.peak_active = 0
+        self.last_used = None
+        """Time the last request was sent, as a timestamp"""
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_keepalive_connections,
+                              keepalive_expiry=keepalive_expiry)
+        self.client = httpx.Client(http2=http2, limits=limits, transport=transport)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<HTTP2Pool>'
+
+    def create_session(self):
+        """
+        :return: New :py:class:`HTTP2Session` sending its requests through the pool
+        """
+        with self._lock:
+            self.sessions += 1
+        return HTTP2Session(self)
+
+    def get_stats(self):
+        """
+        :return: Dictionary of pool usage: ``sessions``, ``requests``, ``active`` requests and ``peak_active`` requests
+        """
+        with self._lock:
+            return dict(sessions=self.sessions, requests=self.requests,
+                        active=self.active, peak_active=self.peak_active)
+
+    def close(self):
+        """
+        Close all pooled connections
+        """
+        self.client.close()
+
+    def _request_started(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.last_used = time.time()
+            self.peak_active = max(self.peak_active, self.active)
+
+    def _request_finished(self):
+        with self._lock:
+            self.active -= 1
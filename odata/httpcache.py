@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+"""
+HTTP caching
+============
+
+Responses to GET requests can be cached following the HTTP caching headers
+sent by the service. Give an :py:class:`HTTPCache` to the connection:
+
+.. code-block:: python
+
+    >>> from odata.httpcache import HTTPCache, FileCacheStore
+    >>> cache = HTTPCache(FileCacheStore('/var/cache/myapp/odata'))
+    >>> Service = ODataService(url, http_cache=cache, reflect_entities=True)
+
+Responses are reused without a request while they are fresh according to
+``Cache-Control: max-age`` or ``Expires``. Stale responses with an ``ETag``
+or ``Last-Modified`` header are revalidated with ``If-None-Match`` and
+``If-Modified-Since``, and a ``304 Not Modified`` reuses the cached, already
+decoded payload. ``no-store`` responses are never cached.
+
+The metadata document is cached the same way, so with a file store services
+that support validation only download it again when it has changed.
+
+Cached payloads are shared between the requests that use them. Entities are
+created from them without modifying them, but changing the raw data of an
+entity in place also changes the cached response.
+
+A cache given to the service is shared by the contexts created from it, and
+the cache key does not include credentials. Give contexts with different
+access rights caches of their own.
+
+----
+
+API
+---
+"""
+
+import email.utils
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlencode
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urllib import urlencode
+
+from odata.codec import JSONCodec
+
+
+class CacheEntry(object):
+    """
+    A cached response
+
+    :param data: Decoded payload
+    :param expires: Time the response goes stale, as a timestamp
+    :param etag: ETag header of the response
+    :param last_modified: Last-Modified header of the response
+    """
+    def __init__(self, data, expires, etag=None, last_modified=None):
+        self.data = data
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def __repr__(self):
+        return '<CacheEntry expires={0} etag={1}>'.format(self.expires, self.etag)
+
+    @property
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def get_validators(self):
+        """
+        :return: Dictionary of conditional request headers
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class MemoryCacheStore(object):
+    """
+    Keeps the most recently used entries in memory
+
+    :param max_entries: Number of entries to keep
+    """
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class FileCacheStore(object):
+    """
+    Keeps entries in files in a directory, one file per entry. Files hold a
+    line of JSON with the validators of the response, followed by the payload
+    encoded with the codec, or the payload itself if it is bytes
+
+    :param directory: Directory for the cache files, created if it does not exist
+    :param codec: Codec to encode the entries with. New :py:class:`~odata.codec.JSONCodec` if None
+    """
+    def __init__(self, directory, codec=None):
+        self.directory = directory
+        self.codec = codec or JSONCodec()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _get_path(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def get(self, key):
+        try:
+            with open(self._get_path(key), 'rb') as f:
+                header = self.codec.loads(f.readline())
+                body = f.read()
+            data = body if header['raw'] else self.codec.loads(body)
+            return CacheEntry(data, header['expires'], etag=header['etag'],
+                              last_modified=header['last_modified'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            # missing, or written by another version
+            return
+
+    def set(self, key, entry):
+        raw = isinstance(entry.data, bytes)
+        header = dict(expires=entry.expires, etag=entry.etag,
+                      last_modified=entry.last_modified, raw=raw)
+        body = entry.data if raw else self.codec.dumps(entry.data)
+
+        path = self._get_path(key)
+        temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            f.write(self.codec.dumps(header) + b'\n')
+            f.write(body)
+        os.rename(temp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._get_path(key))
+        except OSError:
+            pass
+
+
+class HTTPCache(object):
+    """
+    :param store: Cache store. New :py:class:`MemoryCacheStore` if None
+    :param default_ttl: Seconds to consider responses without caching headers fresh. Not cached if None
+    """
+    def __init__(self, store=None, default_ttl=None):
+        self.store = store or MemoryCacheStore()
+        self.default_ttl = default_ttl
+        self.hits = 0
+        """Number of responses used without a request"""
+        self.revalidated = 0
+        """Number of cached responses confirmed with ``304 Not Modified``"""
+        self.misses = 0
+
+    def __repr__(self):
+        return '<HTTPCache {0}>'.format(self.store.__class__.__name__)
+
+    def get_key(self, url, params=None, headers=None):
+        """
+        :return: Cache key of the request
+        """
+        query = urlencode(sorted((params or {}).items()))
+        accept = (headers or {}).get('Accept', '')
+        return u'{0}?{1}#{2}'.format(url, query, accept)
+
+    def fetch(self, url, params, headers, send, decode):
+        """
+        Get a response from the cache, or send a request for it
+
+        :param url: URL to GET
+        :param params: Query string parameters
+        :param headers: Request headers
+        :param send: Function that sends the request with the given headers and returns the response
+        :param decode: Function that checks the response and returns the payload to cache
+        :return: Decoded payload
+        """
+        key = self.get_key(url, params, headers)
+        entry = self.store.get(key)
+        if entry is not None and entry.is_fresh:
+            self.hits += 1
+            return entry.data
+
+        headers = dict(headers)
+        if entry is not None:
+            headers.update(entry.get_validators())
+
+        response = send(headers)
+        if entry is not None and response.status_code == 304:
+            response.close()
+            self.revalidated += 1
+            entry.expires = self._get_expiry(response) or 0
+            self.store.set(key, entry)
+            return entry.data
+
+        self.misses += 1
+        data = decode(response)
+        self._store_response(key, response, data)
+        return data
+
+    def _store_response(self, key, response, data):
+        cache_control = self._parse_cache_control(response)
+        if 'no-store' in cache_control or response.status_code != 200:
+            return
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        expires = self._get_expiry(response)
+        if expires is None:
+            if self.default_ttl is not None:
+                expires = time.time() + self.default_ttl
+            elif etag or last_modified:
+                expires = 0
+            else:
+                return
+        self.store.set(key, CacheEntry(data, expires, etag=etag, last_modified=last_modified))
+
+    def _parse_cache_control(self, response):
+        directives = {}
+        for part in response.headers.get('Cache-Control', '').split(','):
+            name, _, value = part.strip().partition('=')
+            if name:
+                directives[name.lower()] = value.strip('"')
+        return directives
+
+    def _get_expiry(self, response):
+        """
+        :return: Timestamp the response goes stale, or None if not given
+        """
+        cache_control = self._parse_cache_control(response)
+        if 'no-cache' in cache_control:
+            return 0
+        if 'max-age' in cache_control:
+            try:
+                return time.time() + int(cache_control['max-age'])
+            except ValueError:
+                return 0
+        expires = response.headers.get('Expires')
+        if expires:
+            parsed = email.utils.parsedate_tz(expires)
+            if parsed is None:
+                return 0
+            return email.utils.mktime_tz(parsed)
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+
+"""
+Joining queries
+===============
+
+Results of two queries can be combined with :py:func:`~odata.query.Query.join`.
+The first query is streamed, and the entities matching its distinct join keys
+are fetched from the second query in batches, with the keys pushed down to the
+second query's ``$filter``. Matching pairs are yielded as tuples:
+
+.. code-block:: python
+
+    orders = Service.query(Order).filter(Order.ShipCountry == 'Finland')
+    customers = Service.query(Customer)
+
+    for order, customer in orders.join(customers, on=(Order.CustomerID, Customer.CustomerID)):
+        print(order.OrderID, customer.CompanyName)
+
+Each distinct key is fetched only once while it is among the ``cache_size``
+most recently seen keys. With ``max_workers`` greater than one, batches are
+fetched in background threads while the first query is still being read. ``outer=True`` also yields the entities of the first query that
+have no match, paired with None.
+
+Queries using :py:func:`~odata.query.Query.select` can be joined as well, as
+long as the join property is one of the selected properties.
+
+
+Server-side joins
+-----------------
+
+Services that support ``$crossjoin`` can join entity sets on the server.
+Properties are qualified with their entity set with
+:py:func:`CrossJoinQuery.qualify`, and compared with the usual operators:
+
+.. code-block:: python
+
+    query = Service.crossjoin(Customer, Order)
+    c, o = query.qualify(Customer), query.qualify(Order)
+
+    query = query.filter(c.CustomerID == o.CustomerID)
+    query = query.filter(o.ShipCountry == 'Finland')
+    query = query.select(c.CompanyName, o.OrderID, o.OrderDate)
+    query = query.order_by(o.OrderDate.desc())
+
+    for row in query:
+        print(row.Customer.CompanyName, row.Order.OrderID)
+
+Each row is a named tuple of entity instances, in the order the entity
+classes were given. Properties left out with ``select`` are loaded on access.
+Like other queries, cross joins follow the page size, response format and
+deadline given to them or to the connection.
+
+----
+
+API
+---
+"""
+
+import inspect
+from collections import OrderedDict, deque, namedtuple
+
+from odata.deadline import bind_deadlines
+from odata.exceptions import ODataError
+from odata.property import PropertyBase
+from odata.query import QueryBase
+
+try:
+    # noinspection PyUnresolvedReferences
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+
+class _Batch(object):
+    """
+    Left query entities joined together, and the keys fetched for them
+    """
+    def __init__(self):
+        self.entities = []
+        self.keys = []
+        self.sources = {}
+        """Key to a list of matches, or to the batch fetching them"""
+        self.result = None
+
+    def get_result(self):
+        if hasattr(self.result, 'result'):
+            self.result = self.result.result()
+        return self.result
+
+
+class SemiJoin(object):
+    """
+    Iterable of matching entity pairs from two queries. Created with
+    :py:func:`~odata.query.Query.join`
+
+    :param left: Query to stream
+    :param right: Query to fetch matching entities from
+    :param on: Tuple of ``Entity.Property`` instances to match, one from each query's entity
+    :param batch_size: Maximum number of distinct keys in one request
+    :param max_workers: Number of batches fetched concurrently
+    :param outer: Also yield unmatched entities of the left query, paired with None
+    :param cache_size: Number of keys to keep the matches of after their batch has been joined
+    """
+    def __init__(self, left, right, on, batch_size=50, max_workers=1, outer=False,
+                 cache_size=10000):
+        self.left = left
+        self.right = right
+        self.left_prop, self.right_prop = on
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.outer = outer
+        self.cache_size = cache_size
+
+    def __repr__(self):
+        return '<SemiJoin of {0} and {1}>'.format(self.left.entity, self.right.entity)
+
+    def __iter__(self):
+        cache = OrderedDict()
+        in_flight = {}
+        pending = deque()
+        executor = None
+        if self.max_workers > 1 and ThreadPoolExecutor is not None:
+            executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            for batch in self._iter_left_batches(cache, in_flight):
+                if executor is not None:
+                    batch.result = executor.submit(bind_deadlines(self._fetch), batch.keys)
+                else:
+                    batch.result = self._fetch(batch.keys)
+                pending.append(batch)
+
+                # keep up to max_workers batches in flight
+                while len(pending) >= max(self.max_workers, 1):
+                    for pair in self._join_batch(pending.popleft(), cache, in_flight):
+                        yield pair
+
+            while pending:
+                for pair in self._join_batch(pending.popleft(), cache, in_flight):
+                    yield pair
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def all(self):
+        """
+        :return: A list of all matching (left, right) tuples
+        """
+        return list(iter(self))
+
+    def _get_key(self, row, prop):
+        if isinstance(row, dict):
+            if prop.name not in row:
+                msg = u'Rows of a query with select() must include the join property {0}'
+                raise ODataError(msg.format(prop.name))
+            return row[prop.name]
+        return row.__odata__.data.get(prop.name)
+
+    def _iter_left_batches(self, cache, in_flight):
+        batch = _Batch()
+        for entity in self.left:
+            batch.entities.append(entity)
+            key = self._get_key(entity, self.left_prop)
+            if key is not None and key not in batch.sources:
+                if key in cache:
+                    matches = batch.sources[key] = cache.pop(key)
+                    cache[key] = matches
+                elif key in in_flight:
+                    batch.sources[key] = in_flight[key]
+                else:
+                    batch.sources[key] = in_flight[key] = batch
+                    batch.keys.append(key)
+
+            # bound the entities held when keys repeat a lot
+            if len(batch.keys) >= self.batch_size or len(batch.entities) >= self.batch_size * 10:
+                yield batch
+                batch = _Batch()
+
+        if batch.entities:
+            yield batch
+
+    def _fetch(self, keys):
+        related = {}
+        if not keys:
+            return related
+
+        values = [self.right_prop.deserialize(key) for key in keys]
+        query = self.right.filter(self.right_prop.in_(values))
+        for entity in query:
+            key = self._get_key(entity, self.right_prop)
+            related.setdefault(key, []).append(entity)
+        return related
+
+    def _join_batch(self, batch, cache, in_flight):
+        result = batch.get_result()
+        for key in batch.keys:
+            del in_flight[key]
+            cache[key] = result.get(key, [])
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+        entities, sources = batch.entities, batch.sources
+        # later batches may still read the result, but not the entities
+        batch.entities = batch.sources = None
+        for entity in entities:
+            key = self._get_key(entity, self.left_prop)
+            matches = sources.get(key)
+            if isinstance(matches, _Batch):
+                matches = matches.get_result().get(key)
+            matches = matches or []
+            for match in matches:
+                yield entity, match
+            if not matches and self.outer:
+                yield entity, None
+
+
+class _QualifiedEntity(object):
+    """
+    Gives access to an entity class' properties, named with the entity set
+    prefix used in ``$crossjoin`` queries
+    """
+    def __init__(self, entitycls):
+        self.entitycls = entitycls
+
+    def __repr__(self):
+        return '<Qualified {0}>'.format(self.entitycls)
+
+    def __getattr__(self, item):
+        prop = getattr(self.entitycls, item)
+        qualified = prop.__class__.__new__(prop.__class__)
+        qualified.__dict__.update(prop.__dict__)
+        qualified.name = '{0}/{1}'.format(self.entitycls.__odata_collection__, prop.name)
+        return qualified
+
+
+class CrossJoinQuery(QueryBase):
+    """
+    A query over the cartesian product of entity sets, filtered on the
+    server. Create with :py:func:`~odata.service.ODataService.crossjoin`.
+    Like :py:class:`~odata.query.Query`, builder methods return a new query
+
+    :param entities: Entity classes to join
+    :param connection: ODataConnection instance
+    """
+    def __init__(self, entities, connection=None, options=None):
+        self.entities = list(entities)
+        self.connection = connection
+        self.options = options or dict()
+        names = [entitycls.__name__ for entitycls in self.entities]
+        self.row_type = namedtuple('CrossJoinRow', names)
+
+    def __repr__(self):
+        return '<CrossJoinQuery for {0}>'.format(self.entities)
+
+    def __iter__(self):
+        for page in self._iter_pages(self._get_url(), self._get_options()):
+            for row in page:
+                yield self._create_row(row)
+
+    def _get_url(self):
+        service = self.entities[0].__odata_service__
+        collections = [entitycls.__odata_collection__ for entitycls in self.entities]
+        return service.url + '$crossjoin({0})'.format(','.join(collections))
+
+    def _get_url_base(self):
+        return self.entities[0].__odata_service__.url
+
+    def _get_options(self):
+        options = dict()
+
+        expand = []
+        selected = self.options.get('$select', [])
+        for entitycls in self.entities:
+            collection = entitycls.__odata_collection__
+            prefix = collection + '/'
+            names = [i[len(prefix):] for i in selected if i.startswith(prefix)]
+            if names:
+                # without their keys, the entities could not load the rest of their properties
+                names += [name for name in self._get_primary_key_names(entitycls) if name not in names]
+                expand.append('{0}($select={1})'.format(collection, ','.join(names)))
+            else:
+                expand.append(collection)
+        options['$expand'] = ','.join(expand)
+
+        _filters = self.options.get('$filter')
+        if _filters:
+            options['$filter'] = ' and '.join(_filters)
+
+        _order_by = self.options.get('$orderby')
+        if _order_by:
+            options['$orderby'] = ','.join(_order_by)
+
+        if self.options.get('$top') is not None:
+            options['$top'] = self.options['$top']
+        if self.options.get('$skip') is not None:
+            options['$skip'] = self.options['$skip']
+        return options
+
+    def _get_primary_key_names(self, entitycls):
+        return [prop.name for _, prop in inspect.getmembers(entitycls)
+                if isinstance(prop, PropertyBase) and prop.primary_key]
+
+    def _create_row(self, row):
+        instances = []
+        for entitycls in self.entities:
+            data = row.get(entitycls.__odata_collection__)
+            if data is None:
+                instances.append(None)
+                continue
+            instances.append(entitycls.__new__(entitycls, from_data=data, connection=self.connection))
+        return self.row_type(*instances)
+
+    def _new_query(self):
+        o = dict()
+        o['$top'] = self.options.get('$top')
+        o['$skip'] = self.options.get('$skip')
+        o['$select'] = self.options.get('$select', [])[:]
+        o['$filter'] = self.options.get('$filter', [])[:]
+        o['$orderby'] = self.options.get('$orderby', [])[:]
+        o['page_size'] = self.options.get('page_size')
+        o['format'] = self.options.get('format')
+        o['deadline'] = self.options.get('deadline')
+        return CrossJoinQuery(self.entities, connection=self.connection, options=o)
+
+    def qualify(self, entitycls):
+        """
+        Access the properties of one of the joined entity classes for use in
+        filters, ordering and selects
+
+        :param entitycls: Entity class
+        :return: Object with the entity class' properties as attributes
+        """
+        return _QualifiedEntity(entitycls)
+
+    def filter(self, value):
+        """
+        Set ``$filter`` query parameter. Multiple calls are concatenated with 'and'
+
+        :param value: Comparison of qualified properties
+        :return: CrossJoinQuery instance
+        """
+        q = self._new_query()
+        q.options['$filter'].append(value)
+        return q
+
+    def select(self, *values):
+        """
+        Set the properties to load for each entity set. Entity sets without
+        selected properties are loaded in full
+
+        :param values: Qualified properties
+        :return: CrossJoinQuery instance
+        """
+        q = self._new_query()
+        q.options['$select'].extend(prop.name for prop in values)
+        return q
+
+    def order_by(self, *values):
+        """
+        Set ``$orderby`` query parameter
+
+        :param values: One of more of qualified Property.asc() or Property.desc()
+        :return: CrossJoinQuery instance
+        """
+        q = self._new_query()
+        q.options['$orderby'].extend(values)
+        return q
+
+    def limit(self, value):
+        """
+        Set ``$top`` query parameter
+
+        :param value: Number of rows to return
+        :return: CrossJoinQuery instance
+        """
+        q = self._new_query()
+        q.options['$top'] = value
+        return q
+
+    def offset(self, value):
+        """
+        Set ``$skip`` query parameter
+
+        :param value: Number of rows to skip
+        :return: CrossJoinQuery instance
+        """
+        q = self._new_query()
+        q.options['$skip'] = value
+        return q
+
+    def all(self):
+        """
+        :return: A list of all rows
+        """
+        return list(iter(self))
+
+    def first(self):
+        """
+        :return: The first row or None
+        """
+        rows = self.limit(1).all()
+        if rows:
+            return rows[0]
@@ -0,0 +1,528 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local queries
+=============
+
+Entity sets that change rarely can be kept in an :py:class:`EntityStore`.
+Queries for a stored entity set are then answered from memory without
+accessing the network:
+
+.. code-block:: python
+
+    from odata.localquery import EntityStore
+
+    store = EntityStore(ttl=600)
+    Service.entity_store = store
+
+    # fetch the complete entity set, and index a property used in filters
+    store.load(Service.query(Country))
+    store.add_index(Country, Country.Region)
+
+    # answered locally
+    query = Service.query(Country).filter(Country.Region == 'Europe')
+    query = query.order_by(Country.Name.asc()).limit(10)
+    countries = query.all()
+
+The local evaluator supports the filters that properties produce (comparisons,
+``and``, ``or``, ``not``, :py:func:`~odata.property.PropertyBase.in_`,
+``startswith``, ``endswith`` and ``contains``) as well as ordering, ``$top``,
+``$skip`` and :py:func:`~odata.query.Query.select`. Queries that the store
+cannot answer, such as queries for entity sets that are not loaded or have
+expired, queries with ``$expand`` or filters with other functions, are sent
+to the service as usual.
+
+Filters on primary keys and indexed properties are looked up from indexes
+instead of scanning the whole entity set.
+
+Stores can be saved to disk and restored, for example when starting up a new
+process:
+
+.. code-block:: python
+
+    store.save('/var/cache/myapp/odata.json')
+
+    store = EntityStore(ttl=600)
+    store.restore('/var/cache/myapp/odata.json', [Country, Currency])
+
+----
+
+API
+---
+"""
+
+import io
+import json
+import re
+import threading
+import time
+
+import dateutil.parser
+
+from odata.query import Query
+from odata.exceptions import ODataError
+
+
+class FilterParseError(ODataError):
+    """Raised when a filter can not be evaluated locally"""
+    pass
+
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+      (?P<string>'(?:[^']|'')*')
+    | (?P<guid>[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})
+    | (?P<datetime>\d{4}-\d{2}-\d{2}(?:T[0-9:.]+(?:Z|[+-]\d{2}:\d{2})?)?)
+    | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<name>[A-Za-z_][\w/.]*)
+    | (?P<punct>[(),])
+    )""", re.VERBOSE)
+
+_COMPARISONS = ('eq', 'ne', 'gt', 'ge', 'lt', 'le')
+
+_FUNCTIONS = {
+    'startswith': lambda a, b: a is not None and b is not None and a.startswith(b),
+    'endswith': lambda a, b: a is not None and b is not None and a.endswith(b),
+    'contains': lambda a, b: a is not None and b is not None and b in a,
+    'tolower': lambda a: a.lower() if a is not None else None,
+    'toupper': lambda a: a.upper() if a is not None else None,
+    'trim': lambda a: a.strip() if a is not None else None,
+    'length': lambda a: len(a) if a is not None else None,
+}
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if match is None or match.end() == pos:
+            raise FilterParseError(u'Unexpected input at {0}: {1}'.format(pos, text))
+        pos = match.end()
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+class _Parser(object):
+
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None, None
+
+    def take(self, value=None):
+        kind, token = self.peek()
+        if kind is None or (value is not None and token != value):
+            raise FilterParseError(u'Expected {0}, got {1}'.format(value, token))
+        self.pos += 1
+        return kind, token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise FilterParseError(u'Unexpected token: {0}'.format(self.peek()[1]))
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ('name', 'or'):
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ('name', 'and'):
+            self.take()
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ('name', 'not'):
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        node = self.parse_primary()
+        kind, token = self.peek()
+        if kind == 'name' and token in _COMPARISONS:
+            self.take()
+            node = ('cmp', token, node, self.parse_primary())
+        return node
+
+    def parse_primary(self):
+        kind, token = self.take()
+        if kind == 'punct' and token == '(':
+            node = self.parse_or()
+            self.take(')')
+            return node
+        if kind == 'string':
+            return ('lit', token[1:-1].replace("''", "'"))
+        if kind == 'guid':
+            return ('lit', token)
+        if kind == 'datetime':
+            return ('lit', dateutil.parser.parse(token))
+        if kind == 'number':
+            if '.' in token or 'e' in token.lower():
+                return ('lit', float(token))
+            return ('lit', int(token))
+        if kind == 'name':
+            if token == 'true':
+                return ('lit', True)
+            if token == 'false':
+                return ('lit', False)
+            if token == 'null':
+                return ('lit', None)
+            if self.peek() == ('punct', '('):
+                if token not in _FUNCTIONS:
+                    raise FilterParseError(u'Unsupported function: {0}'.format(token))
+                self.take()
+                args = [self.parse_or()]
+                while self.peek() == ('punct', ','):
+                    self.take()
+                    args.append(self.parse_or())
+                self.take(')')
+                return ('call', token, args)
+            return ('prop', token)
+        raise FilterParseError(u'Unexpected token: {0}'.format(token))
+
+
+def parse_filter(text):
+    """
+    Parse a ``$filter`` expression
+
+    :param text: Filter expression
+    :return: Expression tree of tuples
+    :raises FilterParseError: Expression is not supported
+    """
+    return _Parser(text).parse()
+
+
+def _compare(op, a, b):
+    if a is None or b is None:
+        if op == 'eq':
+            return a is b
+        if op == 'ne':
+            return a is not b
+        return False
+    if op == 'eq':
+        return a == b
+    if op == 'ne':
+        return a != b
+    if op == 'gt':
+        return a > b
+    if op == 'ge':
+        return a >= b
+    if op == 'lt':
+        return a < b
+    return a <= b
+
+
+class _Evaluator(object):
+
+    def __init__(self, properties, available):
+        self.properties = properties
+        self.available = available
+
+    def value(self, node, row):
+        kind = node[0]
+        if kind == 'lit':
+            return node[1]
+        if kind == 'prop':
+            name = node[1]
+            if name.split('/')[0] not in self.available:
+                raise FilterParseError(u'Property not stored: {0}'.format(name))
+            prop = self.properties.get(name)
+            if prop is not None:
+                return prop.deserialize(row.get(name))
+            # complex type member
+            value = row
+            for part in name.split('/'):
+                if not isinstance(value, dict) or part not in value:
+                    raise FilterParseError(u'Unknown property: {0}'.format(name))
+                value = value[part]
+            return value
+        if kind == 'call':
+            args = [self.value(arg, row) for arg in node[2]]
+            return _FUNCTIONS[node[1]](*args)
+        return self.test(node, row)
+
+    def test(self, node, row):
+        kind = node[0]
+        if kind == 'and':
+            return self.test(node[1], row) and self.test(node[2], row)
+        if kind == 'or':
+            return self.test(node[1], row) or self.test(node[2], row)
+        if kind == 'not':
+            return not self.test(node[1], row)
+        if kind == 'cmp':
+            return _compare(node[1], self.value(node[2], row), self.value(node[3], row))
+        return bool(self.value(node, row))
+
+
+def _conjuncts(node):
+    if node[0] == 'and':
+        return _conjuncts(node[1]) + _conjuncts(node[2])
+    return [node]
+
+
+def _equality_values(node):
+    """
+    Find the property and the accepted values of an equality comparison or a
+    group of them joined with 'or'
+
+    :return: Tuple of property name and list of values, or None
+    """
+    if node[0] == 'cmp' and node[1] == 'eq':
+        left, right = node[2], node[3]
+        if left[0] == 'lit' and right[0] == 'prop':
+            left, right = right, left
+        if left[0] == 'prop' and right[0] == 'lit':
+            return left[1], [right[1]]
+    if node[0] == 'or':
+        a = _equality_values(node[1])
+        b = _equality_values(node[2])
+        if a and b and a[0] == b[0]:
+            return a[0], a[1] + b[1]
+
+
+class _Collection(object):
+
+    def __init__(self, rows, loaded_at, names):
+        self.rows = rows
+        self.loaded_at = loaded_at
+        self.names = set(names)
+        self.indexes = {}
+
+
+class EntityStore(object):
+    """
+    Complete entity sets held in memory for answering queries locally
+
+    :param ttl: Seconds a loaded entity set is used before queries fall back to the service. None to never expire
+    """
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.collections = {}
+        self._index_properties = {}
+        self._lock = threading.Lock()
+
+    def _get_properties(self, entitycls):
+        return dict((prop.name, prop) for prop in Query(entitycls)._get_entity_properties())
+
+    def _build_index(self, entitycls, collection, prop):
+        index = {}
+        for row in collection.rows:
+            value = prop.deserialize(row.get(prop.name))
+            try:
+                index.setdefault(value, []).append(row)
+            except TypeError:
+                # unhashable values can not be indexed
+                return
+        collection.indexes[prop.name] = index
+
+    def _set_rows(self, entitycls, rows, loaded_at, names):
+        collection = _Collection(rows, loaded_at, names)
+        props = self._get_properties(entitycls)
+        pk_props = [prop for prop in props.values() if prop.primary_key]
+        if len(pk_props) == 1:
+            self._build_index(entitycls, collection, pk_props[0])
+        for name in self._index_properties.get(entitycls, []):
+            self._build_index(entitycls, collection, props[name])
+        with self._lock:
+            self.collections[entitycls] = collection
+
+    def load(self, query):
+        """
+        Fetch and store the complete entity set of a query. Options of the
+        query, other than ones that affect the selected properties, are
+        ignored
+
+        :param query: Query instance for the entity set
+        """
+        entitycls = query.entity
+        base_query = Query(entitycls, connection=query.connection)
+        base_query.options['undefer'] = query.options.get('undefer', [])
+        url = base_query._get_url()
+        options = base_query._get_options()
+
+        names = options.get('$select')
+        if names:
+            names = names.split(',')
+        else:
+            names = self._get_properties(entitycls).keys()
+
+        rows = []
+        for page in base_query._iter_pages(url, options):
+            rows.extend(page)
+        self._set_rows(entitycls, rows, time.time(), names)
+
+    def add_index(self, entitycls, prop):
+        """
+        Index a property to look up equality filters without scanning all the
+        entities. Primary keys are always indexed
+
+        :param entitycls: Entity class
+        :param prop: ``Entity.Property`` instance
+        """
+        with self._lock:
+            names = self._index_properties.setdefault(entitycls, [])
+            if prop.name not in names:
+                names.append(prop.name)
+            collection = self.collections.get(entitycls)
+        if collection is not None:
+            self._build_index(entitycls, collection, prop)
+
+    def invalidate(self, entitycls=None):
+        """
+        Remove stored entities
+
+        :param entitycls: Entity class to remove, or None to remove everything
+        """
+        with self._lock:
+            if entitycls is None:
+                self.collections = {}
+            else:
+                self.collections.pop(entitycls, None)
+
+    def _get_collection(self, entitycls):
+        collection = self.collections.get(entitycls)
+        if collection is None:
+            return
+        if self.ttl is not None and time.time() - collection.loaded_at > self.ttl:
+            return
+        return collection
+
+    def covers(self, query):
+        """
+        Check if the query can be answered from stored entities
+
+        :param query: Query instance
+        :return: Boolean
+        """
+        return self._plan(query) is not None
+
+    _supported_options = ('$top', '$skip', '$select', '$filter', '$orderby', 'undefer',
+                          'page_size', 'format', 'deadline')
+
+    def _plan(self, query):
+        for key, value in query.options.items():
+            if key not in self._supported_options and value:
+                return
+        options = query.options
+
+        collection = self._get_collection(query.entity)
+        if collection is None:
+            return
+
+        names = options.get('$select') or []
+        names = names + [order.split()[0] for order in options.get('$orderby') or []]
+        if not collection.names.issuperset(names):
+            return
+
+        filters = options.get('$filter') or []
+        try:
+            trees = [parse_filter(i) for i in filters]
+        except FilterParseError:
+            return
+        return collection, trees
+
+    def execute(self, query):
+        """
+        Answer the query from stored entities
+
+        :param query: Query instance
+        :return: List of Entity instances, or raw rows if the query selects properties. None if the query is not covered
+        """
+        plan = self._plan(query)
+        if plan is None:
+            return
+        collection, trees = plan
+
+        properties = self._get_properties(query.entity)
+        evaluator = _Evaluator(properties, collection.names)
+
+        candidates = collection.rows
+        conjuncts = []
+        for tree in trees:
+            conjuncts.extend(_conjuncts(tree))
+        for node in conjuncts:
+            found = _equality_values(node)
+            if found and found[0] in collection.indexes:
+                index = collection.indexes[found[0]]
+                candidates = []
+                for value in found[1]:
+                    try:
+                        candidates.extend(index.get(value, []))
+                    except TypeError:
+                        candidates = collection.rows
+                        break
+                break
+
+        try:
+            rows = [row for row in candidates
+                    if all(evaluator.test(node, row) for node in conjuncts)]
+            for order in reversed(query.options.get('$orderby') or []):
+                parts = order.split()
+                if parts[0] not in properties:
+                    return
+                descending = len(parts) > 1 and parts[1] == 'desc'
+                node = ('prop', parts[0])
+
+                def sort_key(row, node=node):
+                    value = evaluator.value(node, row)
+                    return value is not None, value
+                rows.sort(key=sort_key, reverse=descending)
+        except (FilterParseError, TypeError, AttributeError):
+            return
+
+        offset = query.options.get('$skip')
+        if offset:
+            rows = rows[offset:]
+        limit = query.options.get('$top')
+        if limit is not None:
+            rows = rows[:limit]
+
+        select = query.options.get('$select')
+        if select:
+            return [dict((name, row.get(name)) for name in select) for row in rows]
+        return list(query._create_models([dict(row) for row in rows]))
+
+    def save(self, path):
+        """
+        Write stored entity sets to a file
+
+        :param path: File path
+        """
+        data = {}
+        for entitycls, collection in list(self.collections.items()):
+            data[entitycls.__odata_type__] = dict(
+                loaded_at=collection.loaded_at,
+                names=sorted(collection.names),
+                rows=collection.rows,
+            )
+        with io.open(path, 'w', encoding='utf-8') as f:
+            # decimals from JSONCodec(use_decimal=True) are stored as strings
+            f.write(json.dumps(data, ensure_ascii=False, default=str))
+
+    def restore(self, path, entity_classes):
+        """
+        Read entity sets written with :py:func:`save`. Expiry is counted from
+        the time the entity sets were originally loaded
+
+        :param path: File path
+        :param entity_classes: List of Entity classes to restore
+        """
+        with io.open(path, 'r', encoding='utf-8') as f:
+            data = json.loads(f.read())
+        for entitycls in entity_classes:
+            stored = data.get(entitycls.__odata_type__)
+            if stored is not None:
+                self._set_rows(entitycls, stored['rows'], stored['loaded_at'], stored['names'])
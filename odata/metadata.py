@@ -218,8 +218,19 @@ class MetaData(object):
 
     def load_document(self):
         self.log.info('Loading metadata document: {0}'.format(self.url))
-        response = self.connection._do_get(self.url)
-        return ET.fromstring(response.content)
+        cache = self.connection.http_cache
+        if cache is None:
+            response = self.connection._do_get(self.url)
+            return ET.fromstring(response.content)
+
+        def send(headers):
+            return self.connection._do_get(self.url, headers=headers)
+
+        def decode(response):
+            return response.content
+
+        content = cache.fetch(self.url, None, {}, send, decode)
+        return ET.fromstring(content)
 
     def _parse_action(self, xmlq, action_element, schema_name):
         action = {
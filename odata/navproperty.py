@@ -35,6 +35,7 @@ try:
 except ImportError:
     # noinspection PyUnresolvedReferences
     from urlparse import urljoin
+import inspect
 
 
 class NavigationProperty(object):
@@ -55,11 +56,108 @@ class NavigationProperty(object):
     def __repr__(self):
         return u'<NavigationProperty to {0}>'.format(self.entitycls)
 
-    def instances_from_data(self, raw_data):
+    def instances_from_data(self, raw_data, connection=None):
+        cls = self.entitycls
         if self.is_collection:
-            return [self.entitycls.__new__(self.entitycls, from_data=d) for d in raw_data]
+            instances = [cls.__new__(cls, from_data=d, connection=connection) for d in raw_data]
+            for i in instances:
+                i.__odata__.load_group = instances
+            return instances
         else:
-            return self.entitycls.__new__(self.entitycls, from_data=raw_data)
+            return cls.__new__(cls, from_data=raw_data, connection=connection)
+
+    def _get_target_pk(self):
+        from odata.property import PropertyBase
+        pks = [prop for _, prop in inspect.getmembers(self.entitycls)
+               if isinstance(prop, PropertyBase) and prop.primary_key]
+        if len(pks) == 1:
+            return pks[0]
+
+    def _get_reverse_navigation(self, parentcls):
+        for _, prop in inspect.getmembers(self.entitycls):
+            if not isinstance(prop, NavigationProperty):
+                continue
+            if prop.is_collection or not prop.foreign_key:
+                continue
+            if issubclass(parentcls, prop.entitycls):
+                return prop
+
+    def can_load_batch(self, parentcls):
+        """
+        Check if this relationship can be loaded with key lookups. Single
+        relationships require a foreign key, collections a single relationship
+        back to the parent with a foreign key
+
+        :param parentcls: Entity class that owns this property
+        :return: Boolean
+        """
+        if self.is_collection:
+            reverse = self._get_reverse_navigation(parentcls)
+            return reverse is not None and reverse._get_target_pk() is not None
+        return bool(self.foreign_key) and self._get_target_pk() is not None
+
+    def get_batch_key(self, parentcls):
+        """
+        :param parentcls: Entity class that owns this property
+        :return: Name of the parent property that :py:func:`load_batch` looks up related entities with
+        """
+        return self._get_batch_keys(parentcls)[0]
+
+    def _get_batch_keys(self, parentcls):
+        """
+        :return: Tuple of the parent's key property name and the matching property of the related entity
+        """
+        if self.is_collection:
+            reverse = self._get_reverse_navigation(parentcls)
+            target_prop = [prop for _, prop in inspect.getmembers(self.entitycls)
+                           if getattr(prop, 'name', None) == reverse.foreign_key][0]
+            return reverse._get_target_pk().name, target_prop
+        return self.foreign_key, self._get_target_pk()
+
+    def load_batch(self, entities, connection, batch_size=50):
+        """
+        Load this relationship for multiple entities with key lookups, one
+        request per ``batch_size`` distinct keys. Entities read without the
+        key property are left unloaded and load the relationship on access
+
+        :param entities: Entity instances that own this property
+        :param connection: ODataConnection instance
+        :param batch_size: Maximum number of keys in one request
+        """
+        from odata.query import Query
+
+        if not entities:
+            return
+
+        key_name, target_prop = self._get_batch_keys(entities[0].__class__)
+
+        # entities read without the key are left to load lazily
+        entities = [entity for entity in entities if key_name in entity.__odata__.data]
+
+        keys = []
+        seen = set()
+        for entity in entities:
+            key = entity.__odata__.data[key_name]
+            if key is not None and key not in seen:
+                seen.add(key)
+                keys.append(key)
+
+        related = {}
+        for i in range(0, len(keys), batch_size):
+            chunk = [target_prop.deserialize(key) for key in keys[i:i + batch_size]]
+            query = Query(self.entitycls, connection=connection)
+            query = query.filter(target_prop.in_(chunk))
+            for instance in query:
+                key = instance.__odata__.data.get(target_prop.name)
+                related.setdefault(key, []).append(instance)
+
+        for entity in entities:
+            key = entity.__odata__.data[key_name]
+            cache = self._get_parent_cache(entity)
+            if self.is_collection:
+                cache['collection'] = related.get(key, [])
+            else:
+                cache['single'] = (related.get(key) or [None])[0]
 
     def _get_parent_cache(self, instance):
         es = instance.__odata__
@@ -90,6 +188,11 @@ class NavigationProperty(object):
             return self
 
         es = instance.__odata__
+        # relationships managed by a LoadPlanner record their first access
+        statistics = es.nav_statistics.pop(self.name, None)
+        if statistics is not None:
+            statistics.record_access()
+
         connection = es.connection
         parent_url = es.instance_url
         new_object = parent_url is None
@@ -107,15 +210,19 @@ class NavigationProperty(object):
             if 'collection' not in cache:
                 raw_data = connection.execute_get(url)
                 if raw_data:
-                    cache['collection'] = self.instances_from_data(raw_data['value'])
+                    cache['collection'] = self.instances_from_data(raw_data['value'], connection=connection)
                 else:
                     cache['collection'] = []
+                if statistics is not None:
+                    statistics.observe(1, cache['collection'])
             return cache['collection']
         else:
             if 'single' not in cache:
                 raw_data = connection.execute_get(url)
                 if raw_data:
-                    cache['single'] = self.instances_from_data(raw_data)
+                    cache['single'] = self.instances_from_data(raw_data, connection=connection)
                 else:
                     cache['single'] = None
+                if statistics is not None:
+                    statistics.observe(1, [cache['single']])
             return cache['single']
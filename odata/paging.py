@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""
+Page size
+=========
+
+Servers return large entity sets in pages, following the server's default
+page size unless the client asks for another one with the
+``Prefer: odata.maxpagesize`` header. The preference can be set for a single
+query, or for all queries of a connection:
+
+.. code-block:: python
+
+    >>> query = Service.query(Order).page_size(1000)
+
+    >>> Service = ODataService(url, page_size=1000)
+    >>> context = Service.create_context(page_size=500)
+
+Instead of a fixed number, an :py:class:`AdaptivePageSize` instance tunes the
+page size per entity set from the time and response size of the pages
+already fetched:
+
+.. code-block:: python
+
+    >>> from odata.paging import AdaptivePageSize
+    >>> adaptive = AdaptivePageSize(target_time=2.0, target_bytes=8 * 1024 * 1024)
+    >>> Service = ODataService(url, page_size=adaptive)
+
+The page size grows while pages are fetched faster and smaller than the
+targets, and shrinks when either target is exceeded. Servers are free to
+return smaller pages than requested.
+
+----
+
+API
+---
+"""
+
+import threading
+
+
+class AdaptivePageSize(object):
+    """
+    Chooses the page size per entity set to keep the time and response size
+    of each page near the given targets
+
+    :param initial: Page size to request before anything is observed
+    :param minimum: Smallest page size to request
+    :param maximum: Largest page size to request
+    :param target_time: Wanted time to fetch one page, in seconds
+    :param target_bytes: Wanted response size of one page, in bytes
+    :param growth: Largest factor to change the page size by after one page
+    """
+    def __init__(self, initial=100, minimum=10, maximum=5000, target_time=1.0,
+                 target_bytes=4 * 1024 * 1024, growth=2.0):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_time = target_time
+        self.target_bytes = target_bytes
+        self.growth = growth
+        self.sizes = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<AdaptivePageSize target_time={0} target_bytes={1}>'.format(
+            self.target_time, self.target_bytes)
+
+    def get(self, key):
+        """
+        :param key: Entity set URL
+        :return: Page size to request next
+        """
+        with self._lock:
+            return self.sizes.get(key, self.initial)
+
+    def observe(self, key, rows, elapsed, size):
+        """
+        Adjust the page size of an entity set after fetching a page
+
+        :param key: Entity set URL
+        :param rows: Number of rows in the page
+        :param elapsed: Time taken to fetch the page, in seconds
+        :param size: Response size in bytes
+        """
+        if rows <= 0:
+            return
+
+        # fixed request overhead is counted per row too, which underestimates
+        # how many rows fit the targets and keeps growth conservative
+        wanted = float(self.maximum)
+        if elapsed > 0:
+            wanted = min(wanted, self.target_time * rows / elapsed)
+        if size > 0:
+            wanted = min(wanted, float(self.target_bytes) * rows / size)
+
+        with self._lock:
+            current = self.sizes.get(key, self.initial)
+            wanted = min(wanted, current * self.growth)
+            wanted = max(wanted, current / self.growth)
+            self.sizes[key] = int(max(self.minimum, min(self.maximum, wanted)))
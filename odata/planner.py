@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+"""
+Loading related entities
+========================
+
+:py:func:`~odata.query.Query.expand` always loads related entities in the
+same response. Many-to-one relationships repeat the same related entity for
+every parent, and rarely used relationships are loaded for nothing. Lazy
+loading on the other hand costs one request per parent.
+
+:py:func:`~odata.query.Query.prefetch` leaves the choice to the service's
+:py:class:`LoadPlanner`:
+
+.. code-block:: python
+
+    >>> query = Service.query(Order).prefetch(Order.Customer, Order.Order_Details)
+
+For every relationship the planner picks one of the strategies:
+
+- ``expand``: ``$expand`` in the same request
+- ``batch``: a follow-up request per page that looks up the related entities
+  by key, loading each distinct entity only once
+- ``lazy``: no prefetching, relationships are loaded when accessed
+
+The choice is based on statistics collected from earlier queries: how many
+related entities each parent has, how many of them are duplicates, their size
+in the response and how often the relationship is actually accessed. Until
+enough data is collected, ``batch`` is used when the relationship has the
+foreign keys needed for key lookups, otherwise ``expand``.
+
+----
+
+API
+---
+"""
+
+import json
+import math
+import threading
+
+EXPAND = 'expand'
+BATCH = 'batch'
+LAZY = 'lazy'
+
+
+class RelationshipStatistics(object):
+    """
+    Observed cardinality, payload size and access rate of a relationship
+    """
+    def __init__(self):
+        self.pages = 0
+        self.parents = 0
+        """Number of parent entities loaded"""
+        self.accessed = 0
+        """Number of parent entities whose relationship was read"""
+        self.loaded_parents = 0
+        """Number of parent entities whose related entities were loaded"""
+        self.related = 0
+        """Number of related entities loaded"""
+        self.distinct = 0
+        """Number of distinct related entities, counted per page"""
+        self.sampled_bytes = 0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<RelationshipStatistics parents={0} related={1}>'.format(
+            self.parents, self.related)
+
+    @property
+    def access_ratio(self):
+        if self.parents:
+            return float(self.accessed) / self.parents
+        return 1.0
+
+    @property
+    def related_per_parent(self):
+        if self.loaded_parents:
+            return float(self.related) / self.loaded_parents
+        return 1.0
+
+    @property
+    def distinct_ratio(self):
+        if self.related:
+            return float(self.distinct) / self.related
+        return 1.0
+
+    @property
+    def related_size(self):
+        if self.samples:
+            return float(self.sampled_bytes) / self.samples
+        return 0.0
+
+    @property
+    def page_size(self):
+        if self.pages:
+            return float(self.parents) / self.pages
+        return 0.0
+
+    def record_page(self, parents):
+        with self._lock:
+            self.pages += 1
+            self.parents += parents
+
+    def record_access(self):
+        with self._lock:
+            self.accessed += 1
+
+    def observe(self, parents, related):
+        """
+        Record related entities loaded for a number of parents
+
+        :param parents: Number of parent entities
+        :param related: List of related entity instances, duplicates included
+        """
+        related = [i for i in related if i is not None]
+        distinct = set(i.__odata__.id or id(i) for i in related)
+
+        sample = None
+        if related:
+            sample = len(json.dumps(related[0].__odata__.data, default=str))
+
+        with self._lock:
+            self.loaded_parents += parents
+            self.related += len(related)
+            self.distinct += len(distinct)
+            if sample is not None:
+                self.sampled_bytes += sample
+                self.samples += 1
+
+
+class LoadPlanner(object):
+    """
+    Chooses how to load relationships requested with
+    :py:func:`~odata.query.Query.prefetch`
+
+    :param request_cost: Cost of an additional request, in bytes of payload
+    :param batch_size: Maximum number of keys in one batched lookup
+    :param min_observations: Number of parent entities to observe before statistics are used
+    """
+    def __init__(self, request_cost=2000, batch_size=50, min_observations=20):
+        self.request_cost = request_cost
+        self.batch_size = batch_size
+        self.min_observations = min_observations
+        self.statistics = {}
+        self._lock = threading.Lock()
+
+    def get_statistics(self, entitycls, nav):
+        """
+        :param entitycls: Entity class that owns the relationship
+        :param nav: NavigationProperty instance
+        :return: RelationshipStatistics instance
+        """
+        key = (entitycls, nav.name)
+        with self._lock:
+            stats = self.statistics.get(key)
+            if stats is None:
+                stats = RelationshipStatistics()
+                self.statistics[key] = stats
+        return stats
+
+    def estimate_costs(self, entitycls, nav):
+        """
+        Estimate the cost of loading a page of parents with each available
+        strategy
+
+        :return: Dictionary of strategy name and cost in bytes
+        """
+        stats = self.get_statistics(entitycls, nav)
+        parents = stats.page_size or 1.0
+        related = parents * stats.related_per_parent
+        size = stats.related_size
+
+        costs = {
+            EXPAND: related * size,
+            LAZY: parents * stats.access_ratio * (self.request_cost + stats.related_per_parent * size),
+        }
+        if nav.can_load_batch(entitycls):
+            distinct = related * stats.distinct_ratio
+            requests = math.ceil(distinct / self.batch_size) or 1
+            costs[BATCH] = distinct * size + requests * self.request_cost
+        return costs
+
+    def choose(self, entitycls, nav):
+        """
+        Choose the strategy for loading a relationship
+
+        :param entitycls: Entity class that owns the relationship
+        :param nav: NavigationProperty instance
+        :return: One of ``expand``, ``batch`` or ``lazy``
+        """
+        stats = self.get_statistics(entitycls, nav)
+        if stats.loaded_parents < self.min_observations:
+            if nav.can_load_batch(entitycls):
+                return BATCH
+            return EXPAND
+
+        costs = self.estimate_costs(entitycls, nav)
+        # prefer fewer requests when costs are equal
+        order = [EXPAND, BATCH, LAZY]
+        return min(costs, key=lambda strategy: (costs[strategy], order.index(strategy)))
+
+    def load_page(self, entitycls, plan, entities, connection):
+        """
+        Load and observe relationships for a page of query results
+
+        :param entitycls: Entity class being queried
+        :param plan: List of (NavigationProperty, strategy) tuples
+        :param entities: Entity instances in the page
+        :param connection: ODataConnection instance
+        """
+        for nav, strategy in plan:
+            stats = self.get_statistics(entitycls, nav)
+            stats.record_page(len(entities))
+
+            if strategy == BATCH:
+                nav.load_batch(entities, connection, batch_size=self.batch_size)
+
+            if strategy in (EXPAND, BATCH):
+                related = []
+                for entity in entities:
+                    cache = entity.__odata__.nav_cache.get(nav.name, {})
+                    if nav.is_collection:
+                        related.extend(cache.get('collection') or [])
+                    else:
+                        related.append(cache.get('single'))
+                stats.observe(len(entities), related)
+
+            for entity in entities:
+                entity.__odata__.nav_statistics[nav.name] = stats
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+Connection pooling
+==================
+
+A service keeps one :py:class:`ConnectionPool` that the sessions of all its
+contexts send their requests through. Contexts created with
+:py:func:`~odata.service.ODataService.create_context` get a session of their
+own, with their own credentials and headers, but reuse the open connections
+of the service instead of connecting and negotiating TLS again:
+
+.. code-block:: python
+
+    >>> from odata.pool import ConnectionPool
+    >>> pool = ConnectionPool(pool_maxsize=50, pool_block=True)
+    >>> Service = ODataService(url, pool=pool)
+    >>> tenant_context = Service.create_context(auth=tenant_auth)
+
+``pool_maxsize`` is the number of connections kept open per host. When more
+requests are sent at once, ``pool_block=True`` makes them wait for a free
+connection. Otherwise extra connections are opened and closed after use.
+:py:func:`ConnectionPool.get_stats` shows whether the pool is large enough:
+
+.. code-block:: python
+
+    >>> Service.pool.get_stats()
+    {'requests': 1204, 'connections': 12, 'active': 3, 'peak_active': 10, 'saturated': 31, ...}
+
+Contexts given a ``session`` use that session and its own pool as before.
+
+----
+
+API
+---
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse
+
+
+class HostStats(object):
+    """
+    Pool usage of a single host
+    """
+    def __init__(self):
+        self.requests = 0
+        self.active = 0
+        """Number of requests being sent"""
+        self.peak_active = 0
+        self.saturated = 0
+        """Number of requests started while all pooled connections were in use"""
+
+
+class PoolAdapter(HTTPAdapter):
+    """
+    Transport adapter shared by the sessions of a :py:class:`ConnectionPool`.
+    Closing a session does not close it
+    """
+    def __init__(self, pool, **kwargs):
+        self.pool = pool
+        super(PoolAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.pool._request_started(request.url)
+        try:
+            return super(PoolAdapter, self).send(request, **kwargs)
+        finally:
+            self.pool._request_finished(request.url)
+
+    def close(self):
+        pass
+
+
+class ConnectionPool(object):
+    """
+    :param pool_connections: Number of hosts to keep connections to
+    :param pool_maxsize: Number of connections to keep open per host
+    :param pool_block: Wait for a free connection instead of opening extra ones
+    :param keep_alive: Reuse connections. If False, connections are closed after every request
+    :param headers: Headers to add to the sessions created from the pool
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True, headers=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.headers = headers or {}
+        self.sessions = 0
+        """Number of sessions created from the pool"""
+        self.hosts = {}
+        """Dictionary of host and :py:class:`HostStats`"""
+        self.last_used = None
+        """Time the last request was sent, as a timestamp"""
+        self.adapter = PoolAdapter(self, pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<ConnectionPool pool_maxsize={0}>'.format(self.pool_maxsize)
+
+    def create_session(self):
+        """
+        :return: New Requests session sending its requests through the pool
+        """
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        session.headers.update(self.headers)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        with self._lock:
+            self.sessions += 1
+        return session
+
+    def get_stats(self):
+        """
+        :return: Dictionary of pool usage: ``sessions``, ``requests``, ``connections`` opened, ``active`` requests, ``peak_active`` requests per host and ``saturated`` requests
+        """
+        with self._lock:
+            hosts = list(self.hosts.values())
+            stats = dict(
+                sessions=self.sessions,
+                requests=sum(h.requests for h in hosts),
+                active=sum(h.active for h in hosts),
+                peak_active=max([h.peak_active for h in hosts] or [0]),
+                saturated=sum(h.saturated for h in hosts),
+            )
+
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        stats['connections'] = connections
+        return stats
+
+    def close(self):
+        """
+        Close all pooled connections
+        """
+        HTTPAdapter.close(self.adapter)
+
+    def _request_started(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            stats = self.hosts.get(host)
+            if stats is None:
+                stats = HostStats()
+                self.hosts[host] = stats
+            if stats.active >= self.pool_maxsize:
+                stats.saturated += 1
+            stats.requests += 1
+            stats.active += 1
+            self.last_used = time.time()
+            stats.peak_active = max(stats.peak_active, stats.active)
+
+    def _request_finished(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            self.hosts[host].active -= 1
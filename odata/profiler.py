@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+Access profiling
+================
+
+An opt-in profiler records which properties are read from the entities each
+query returns. Queries are identified by their call site, the line of code
+that executed the query. Once a call site has been observed, later executions
+of it only ``$select`` the properties that were actually used:
+
+.. code-block:: python
+
+    from odata.profiler import AccessProfiler
+
+    Service.access_profiler = AccessProfiler(warmup=1)
+
+    def list_order_cities():
+        # first execution loads full Orders, later ones only OrderID and ShipCity
+        return [o.ShipCity for o in Service.query(Order)]
+
+Reading a property that the narrowed query did not select is still safe:
+the value is loaded on access, together with the rest of the result set, and
+the property is included in the call site's future queries.
+
+Queries that use :py:func:`~odata.query.Query.select` are never narrowed.
+Only the ``max_sites`` most recently used call sites are kept. A call site
+that was dropped is observed again the next time it runs.
+
+The call site is the first frame outside of the ``odata`` package. An
+application that runs its queries through a data access layer of its own can
+skip that layer as well, so that the code calling it is profiled:
+
+.. code-block:: python
+
+    Service.access_profiler = AccessProfiler(skip_modules=['odata', 'myapp.repository'])
+
+----
+
+API
+---
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+class SiteProfile(object):
+    """
+    Properties read from the entities of a single query call site
+
+    :param key: Tuple of filename, line number and entity class
+    """
+    def __init__(self, key):
+        self.key = key
+        self.executions = 0
+        self.accessed = set()
+
+    def __repr__(self):
+        return '<SiteProfile {0}:{1}>'.format(self.key[0], self.key[1])
+
+    def record(self, name):
+        self.accessed.add(name)
+
+
+class AccessProfiler(object):
+    """
+    Records property access per query call site and narrows ``$select`` of
+    later executions
+
+    :param warmup: Number of executions to observe before narrowing queries
+    :param skip_modules: Names of the modules and packages whose frames are skipped when looking for the call site
+    :param max_sites: Number of call sites to keep
+    """
+    def __init__(self, warmup=1, skip_modules=('odata',), max_sites=1000):
+        self.warmup = warmup
+        self.skip_modules = tuple(skip_modules)
+        self.max_sites = max_sites
+        self.sites = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Forget all recorded call sites"""
+        with self._lock:
+            self.sites = OrderedDict()
+
+    def get_site(self, entitycls):
+        """
+        Find the profile for the code that is currently executing a query
+
+        :param entitycls: Entity class being queried
+        :return: SiteProfile instance
+        """
+        frame = sys._getframe(1)
+        while frame is not None and self._is_skipped(frame):
+            frame = frame.f_back
+
+        if frame is None:
+            key = (None, None, entitycls)
+        else:
+            key = (frame.f_code.co_filename, frame.f_lineno, entitycls)
+
+        with self._lock:
+            site = self.sites.pop(key, None)
+            if site is None:
+                site = SiteProfile(key)
+            self.sites[key] = site
+            while len(self.sites) > self.max_sites:
+                self.sites.popitem(last=False)
+            site.executions += 1
+        return site
+
+    def _is_skipped(self, frame):
+        module = frame.f_globals.get('__name__', '')
+        for name in self.skip_modules:
+            if module == name or module.startswith(name + '.'):
+                return True
+        return False
+
+    def get_select(self, site, properties):
+        """
+        Property names to select for the call site, or None while the site is
+        still being observed
+
+        :param site: SiteProfile instance
+        :param properties: List of the entity's properties
+        :return: List of property names or None
+        """
+        if site.executions <= self.warmup:
+            return
+        accessed = site.accessed
+        return [prop.name for prop in properties
+                if prop.primary_key or prop.name in accessed]
+
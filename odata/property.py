@@ -31,6 +31,33 @@ called.
 This behavior is similar to SQLAlchemy's ORM.
 
 
+Deferred properties
+-------------------
+
+Properties containing large values (long texts, binary data, collections)
+can be marked as deferred. Queries leave deferred properties out of the
+default ``$select``, and their values are fetched on first access. All the
+entities loaded in the same result set get their values in the same request:
+
+.. code-block:: python
+
+    class Document(Service.Entity):
+        __odata_type__ = 'DocumentService.Objects.Document'
+        __odata_collection__ = 'Documents'
+
+        id = IntegerProperty('DocumentID', primary_key=True)
+        title = StringProperty('Title')
+        content = StringProperty('Content', deferred=True)
+
+    >>> documents = Service.query(Document).all()  # Content is not loaded
+    >>> documents[0].content  # loads Content for all the documents
+    'Lorem ipsum...'
+
+Use :py:func:`~odata.query.Query.undefer` to load deferred properties in the
+initial query. Reflected entities can be adjusted after the fact by setting
+``Document.Content.deferred = True``.
+
+
 .. automodule:: odata.navproperty
 
 
@@ -65,15 +92,18 @@ class PropertyBase(object):
     :param name: Name of the property in the endpoint
     :param primary_key: This property is a primary key
     :param is_collection: This property contains multiple values
+    :param deferred: Leave this property out of queries by default and load it on first access
     """
-    def __init__(self, name, primary_key=False, is_collection=False):
+    def __init__(self, name, primary_key=False, is_collection=False, deferred=False):
         """
         :type name: str
         :type primary_key: bool
+        :type deferred: bool
         """
         self.name = name
         self.primary_key = primary_key
         self.is_collection = is_collection
+        self.deferred = deferred
 
     def __repr__(self):
         return '<Property({0})>'.format(self.name)
@@ -88,20 +118,24 @@ class PropertyBase(object):
 
         es = instance.__odata__
 
-        if self.name in es:
-            raw_data = es[self.name]
-            if self.is_collection:
-                if raw_data is None:
-                    return
-
-                data = []
-                for i in raw_data:
-                    data.append(self.deserialize(i))
-                return data
-            else:
-                return self.deserialize(raw_data)
+        if es.access_profile is not None:
+            es.access_profile.record(self.name)
+
+        if self.name not in es:
+            # value was left out of the response, deferred or otherwise
+            es.load_properties(self)
+
+        raw_data = es[self.name]
+        if self.is_collection:
+            if raw_data is None:
+                return
+
+            data = []
+            for i in raw_data:
+                data.append(self.deserialize(i))
+            return data
         else:
-            raise AttributeError()
+            return self.deserialize(raw_data)
 
     def __set__(self, instance, value):
         """
@@ -110,18 +144,26 @@ class PropertyBase(object):
 
         es = instance.__odata__
 
-        if self.name in es:
-            if self.is_collection:
-                data = []
-                for i in (value or []):
-                    data.append(self.serialize(i))
-                new_value = data
-            else:
-                new_value = self.serialize(value)
-            old_value = es[self.name]
-            if new_value != old_value:
-                es[self.name] = new_value
-                es.set_property_dirty(self)
+        if self.is_collection:
+            data = []
+            for i in (value or []):
+                data.append(self.serialize(i))
+            new_value = data
+        else:
+            new_value = self.serialize(value)
+
+        # unloaded values are always overwritten. Loaded values are compared
+        # deserialized, IEEE754Compatible responses keep numbers as strings
+        if self.name not in es or self._normalize(new_value) != self._normalize(es[self.name]):
+            es[self.name] = new_value
+            es.set_property_dirty(self)
+
+    def _normalize(self, raw_data):
+        if raw_data is None:
+            return None
+        if self.is_collection:
+            return [self.deserialize(i) for i in raw_data]
+        return self.deserialize(raw_data)
 
     def serialize(self, value):
         """
@@ -161,30 +203,47 @@ class PropertyBase(object):
     def desc(self):
         return '{0} desc'.format(self.name)
 
+    def _operand(self, other):
+        # comparing two properties, for example in $crossjoin filters
+        if isinstance(other, PropertyBase):
+            return other.name
+        return self.escape_value(other)
+
     def __eq__(self, other):
-        value = self.escape_value(other)
+        value = self._operand(other)
         return u'{0} eq {1}'.format(self.name, value)
 
     def __ne__(self, other):
-        value = self.escape_value(other)
+        value = self._operand(other)
         return u'{0} ne {1}'.format(self.name, value)
 
     def __ge__(self, other):
-        value = self.escape_value(other)
+        value = self._operand(other)
         return u'{0} ge {1}'.format(self.name, value)
 
     def __gt__(self, other):
-        value = self.escape_value(other)
+        value = self._operand(other)
         return u'{0} gt {1}'.format(self.name, value)
 
     def __le__(self, other):
-        value = self.escape_value(other)
+        value = self._operand(other)
         return u'{0} le {1}'.format(self.name, value)
 
     def __lt__(self, other):
-        value = self.escape_value(other)
+        value = self._operand(other)
         return u'{0} lt {1}'.format(self.name, value)
 
+    def in_(self, values):
+        """
+        Match any of the given values. Rendered as ``eq`` comparisons joined
+        with 'or' for compatibility with OData 4.0 services
+
+        :param values: Iterable of values for this property
+        :return: Grouped filter expression
+        """
+        parts = [self == value for value in values]
+        return u'({0})'.format(' or '.join(parts))
+
     def startswith(self, value):
         value = self.escape_value(value)
         return u'startswith({0}, {1})'.format(self.name, value)
@@ -196,12 +255,15 @@ class PropertyBase(object):
 
 class IntegerProperty(PropertyBase):
     """
-    Property that stores a plain old integer
+    Property that stores a plain old integer. Accepts 64-bit integers sent as
+    strings by ``IEEE754Compatible`` responses
     """
     def serialize(self, value):
         return value
 
     def deserialize(self, value):
+        if isinstance(value, (bytes, type(u''))):
+            return int(value)
         return value
 
 
@@ -245,13 +307,15 @@ class FloatProperty(PropertyBase):
         return value
 
     def deserialize(self, value):
-        return value
+        if value is not None:
+            return float(value)
 
 
 class DecimalProperty(PropertyBase):
     """
     Property that stores a decimal value. JSON does not support this directly,
-    so the value will be transmitted as a float
+    so the value will be transmitted as a float, or as a string in
+    ``IEEE754Compatible`` responses
     """
     def escape_value(self, value):
         if value is None:
@@ -263,6 +327,8 @@ class DecimalProperty(PropertyBase):
             return float(value)
 
     def deserialize(self, value):
+        if isinstance(value, Decimal):
+            return value
         if value is not None:
             return Decimal(str(value))
 
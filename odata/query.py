@@ -37,6 +37,49 @@ Navigation properties can be loaded in the same request with
     >>> query.expand(Order.Shipper, Order.Customer)
     >>> order = query.first()
 
+Expanded entities can be trimmed with nested query options, given with
+:py:class:`Expand`. The results are loaded into the navigation properties at
+every level:
+
+.. code-block:: python
+
+    >>> from odata.query import Expand
+    >>> query.expand(Expand(Customer.Orders,
+    ...                     select=[Order.OrderID, Order.ShippedDate],
+    ...                     filter=Order.ShippedDate > last_week,
+    ...                     order_by=Order.ShippedDate.desc(),
+    ...                     limit=5,
+    ...                     count=True,
+    ...                     expand=[Order.Order_Details]))
+    >>> query.expand('Orders/Order_Details')
+    >>> query.expand(Expand(Employee.DirectReports, levels='max'))
+
+Note that a navigation property loaded with ``$filter`` or ``$top`` only
+contains the matching entities. The total count requested with ``count=True``
+is available in ``entity.__odata__.nav_cache[name]['count']``.
+
+Alternatively, :py:func:`~Query.prefetch` chooses between ``$expand``,
+batched follow-up requests and lazy loading based on earlier queries. See
+:py:mod:`odata.planner`.
+
+Values computed on the server with ``$compute`` can be used in filters,
+ordering and selects:
+
+.. code-block:: python
+
+    >>> query = Service.query(OrderDetail)
+    >>> query = query.compute('UnitPrice mul Quantity', as_='Total', property_type=DecimalProperty)
+    >>> query = query.filter(query.computed('Total') > 100).order_by(query.computed('Total').desc())
+    >>> query.first().__odata__.computed['Total']
+    Decimal('168.0')
+
+Properties marked as deferred are left out of the query unless requested
+with :py:func:`~Query.undefer`:
+
+.. code-block:: python
+
+    >>> query.undefer(Document.Content)
+
 ----
 
 API
@@ -49,11 +92,228 @@ try:
 except ImportError:
     # noinspection PyUnresolvedReferences
     from urlparse import urljoin
+import inspect
+import time
 
 import odata.exceptions as exc
+from odata.property import PropertyBase, NavigationProperty
+from odata.planner import EXPAND, BATCH
+from odata.deadline import Deadline
 
 
-class Query(object):
+class Expand(object):
+    """
+    Navigation property to expand with nested query options. Given to
+    :py:func:`Query.expand`
+
+    :param prop: ``Entity.Property`` instance or a path such as ``'Orders/Items'``. Options apply to the last property of a path
+    :param select: List of ``Entity.Property`` instances to select
+    :param filter: Property comparison or a list of them, concatenated with 'and'
+    :param order_by: One or more of Property.asc() or Property.desc()
+    :param limit: Number of related entities to return (``$top``)
+    :param offset: Number of related entities to skip (``$skip``)
+    :param count: Include the total count of related entities
+    :param levels: Number of levels to expand recursive relationships, or ``'max'``
+    :param expand: List of nested ``Entity.Property`` or :py:class:`Expand` instances
+
+    The primary key of the expanded entity is always selected along with
+    ``select``, so that the rest of the properties can be loaded on access.
+    For paths, the entity is found once the expand is given to a query
+    """
+    def __init__(self, prop, select=None, filter=None, order_by=None,
+                 limit=None, offset=None, count=False, levels=None, expand=None):
+        self.path = getattr(prop, 'name', prop).split('/')
+        self.target = getattr(prop, 'entitycls', None)
+        self.select = [getattr(p, 'name', p) for p in (select or [])]
+        if isinstance(filter, (list, tuple)):
+            self.filter = list(filter)
+        else:
+            self.filter = [filter] if filter else []
+        if isinstance(order_by, (list, tuple)):
+            self.order_by = list(order_by)
+        else:
+            self.order_by = [order_by] if order_by else []
+        self.limit = limit
+        self.offset = offset
+        self.count = count
+        self.levels = levels
+        self.expand = [i if isinstance(i, Expand) else Expand(i) for i in (expand or [])]
+        if self.target is not None:
+            self._select_keys()
+            for i in self.expand:
+                i.resolve(self.target)
+
+    def __repr__(self):
+        return '<Expand {0}>'.format(self)
+
+    def resolve(self, entitycls):
+        """
+        Find the expanded entity class of a path and select its primary key
+
+        :param entitycls: Entity class the path starts from
+        """
+        if self.target is None:
+            target = entitycls
+            for name in self.path:
+                navs = [prop for _, prop in inspect.getmembers(target)
+                        if isinstance(prop, NavigationProperty) and prop.name == name]
+                if not navs:
+                    return
+                target = navs[0].entitycls
+            self.target = target
+            self._select_keys()
+        for i in self.expand:
+            i.resolve(self.target)
+
+    def _select_keys(self):
+        if not self.select:
+            return
+        for _, prop in inspect.getmembers(self.target):
+            if isinstance(prop, PropertyBase) and prop.primary_key and prop.name not in self.select:
+                self.select.append(prop.name)
+
+    def __str__(self):
+        options = []
+        if self.select:
+            options.append('$select=' + ','.join(self.select))
+        if self.filter:
+            options.append('$filter=' + ' and '.join(self.filter))
+        if self.order_by:
+            options.append('$orderby=' + ','.join(self.order_by))
+        if self.limit is not None:
+            options.append('$top={0}'.format(self.limit))
+        if self.offset is not None:
+            options.append('$skip={0}'.format(self.offset))
+        if self.count:
+            options.append('$count=true')
+        if self.levels is not None:
+            options.append('$levels={0}'.format(self.levels))
+        if self.expand:
+            options.append('$expand=' + ','.join(str(i) for i in self.expand))
+
+        value = self.path[-1]
+        if options:
+            value += '({0})'.format(';'.join(options))
+        for name in reversed(self.path[:-1]):
+            value = '{0}($expand={1})'.format(name, value)
+        return value
+
+
+class QueryBase(object):
+    """
+    Paging, response format and deadline options shared by
+    :py:class:`Query` and :py:class:`~odata.join.CrossJoinQuery`. Subclasses
+    keep their options in ``options``, the connection in ``connection``, and
+    implement ``_get_url``, ``_get_url_base`` and ``_new_query``
+    """
+    def _iter_pages(self, url, options, deadline=None):
+        """
+        Fetch result pages, following ``@odata.nextLink``
+
+        :param deadline: :py:class:`~odata.deadline.Deadline` for the page requests. Created from the query options if None
+        :return: Generator of iterables of raw rows
+        """
+        if deadline is None:
+            deadline = self._get_deadline()
+        page_size = self.options.get('page_size') or self.connection.page_size
+        adaptive = page_size is not None and hasattr(page_size, 'observe')
+        response_format = self.options.get('format') or {}
+        streaming = response_format.get('streaming')
+        if streaming is None:
+            streaming = self.connection.streaming
+        key = self._get_url()
+        while True:
+            headers = {}
+            stats = None
+            if page_size is not None:
+                size = page_size.get(key) if adaptive else page_size
+                headers['Prefer'] = 'odata.maxpagesize={0}'.format(size)
+            if response_format:
+                headers['Accept'] = self.connection.get_accept_header(**response_format)
+            if adaptive:
+                stats = {}
+
+            if streaming:
+                started = time.time()
+                with deadline:
+                    page = self.connection.execute_get_stream(url, options, headers=headers)
+                if page is None:
+                    break
+                try:
+                    yield page
+                finally:
+                    page.close()
+
+                if adaptive:
+                    page_size.observe(key, page.rows, time.time() - started, page.bytes_read)
+                data = page.annotations
+            else:
+                with deadline:
+                    data = self.connection.execute_get(url, options, headers=headers, stats=stats)
+                if not data or 'value' not in data:
+                    break
+
+                if adaptive and stats:
+                    page_size.observe(key, len(data['value']), stats['elapsed'], stats['bytes'])
+
+                yield data.get('value', [])
+
+            if '@odata.nextLink' in data:
+                url = urljoin(self._get_url_base(), data['@odata.nextLink'])
+                options = {}  # we get all options in the nextLink url
+            else:
+                break
+
+    def _get_url_base(self):
+        raise NotImplementedError()
+
+    def _get_deadline(self):
+        return Deadline(**(self.options.get('deadline') or {}))
+
+    def page_size(self, value):
+        """
+        Ask the server for pages of at most this many results with the
+        ``Prefer: odata.maxpagesize`` header. Overrides the page size of the
+        connection. See :py:mod:`odata.paging`
+
+        :param value: Number of results per page, or an :py:class:`~odata.paging.AdaptivePageSize` instance
+        :return: Query of the same type
+        """
+        q = self._new_query()
+        q.options['page_size'] = value
+        return q
+
+    def response_format(self, metadata=None, ieee754_compatible=None, streaming=None):
+        """
+        Set the response format for this query, overriding the connection's
+        settings. Entity identity is built from the primary key properties,
+        so responses without metadata annotations work the same
+
+        :param metadata: ``odata.metadata`` level: ``full``, ``minimal`` or ``none``
+        :param ieee754_compatible: Ask for 64-bit integers and decimals as strings
+        :param streaming: Read the results incrementally. See :py:mod:`odata.streaming`
+        :return: Query of the same type
+        """
+        q = self._new_query()
+        q.options['format'] = dict(metadata=metadata, ieee754_compatible=ieee754_compatible,
+                                   streaming=streaming)
+        return q
+
+    def deadline(self, timeout=None, token=None):
+        """
+        Limit the total time spent on the requests of this query. The time
+        starts when iteration starts. See :py:mod:`odata.deadline`
+
+        :param timeout: Seconds for all the requests of the query. No time limit if None
+        :param token: :py:class:`~odata.deadline.CancellationToken` to stop the iteration with
+        :return: Query of the same type
+        """
+        q = self._new_query()
+        q.options['deadline'] = dict(timeout=timeout, token=token)
+        return q
+
+
+class Query(QueryBase):
     """
     This class should not be instantiated directly, but from a
     :py:class:`~odata.service.ODataService` object.
@@ -64,20 +324,28 @@ class Query(object):
         self.connection = connection
 
     def __iter__(self):
+        store = getattr(self.entity.__odata_service__, 'entity_store', None)
+        if store is not None:
+            local_results = store.execute(self)
+            if local_results is not None:
+                for model in local_results:
+                    yield model
+                return
+
         url = self._get_url()
         options = self._get_options()
-        while True:
-            data = self.connection.execute_get(url, options)
-            if 'value' in data:
-                value = data.get('value', [])
-                for row in value:
-                    yield self._create_model(row)
-
-                if '@odata.nextLink' in data:
-                    url = urljoin(self.entity.__odata_url_base__, data['@odata.nextLink'])
-                    options = {}  # we get all options in the nextLink url
-                else:
-                    break
+        access_profile = self._get_access_profile(options)
+        load_plan = self._get_load_plan(options)
+        deadline = self._get_deadline()
+        for value in self._iter_pages(url, options, deadline=deadline):
+            models = self._create_models(value, access_profile)
+            if load_plan:
+                models = list(models)
+                planner = self.entity.__odata_service__.load_planner
+                with deadline:
+                    planner.load_page(self.entity, load_plan, models, self.connection)
+            for model in models:
+                yield model
 
     def __repr__(self):
         return '<Query for {0}>'.format(self.entity)
@@ -88,6 +356,9 @@ class Query(object):
     def _get_url(self):
         return self.entity.__odata_url__()
 
+    def _get_url_base(self):
+        return self.entity.__odata_url_base__
+
     def _get_options(self):
         """
         Format current query options to a dict that can be passed to requests
@@ -103,9 +374,14 @@ class Query(object):
         if _offset is not None:
             options['$skip'] = _offset
 
-        _select = self.options.get('$select')
+        _select = self.options.get('$select') or self._get_default_select()
         if _select:
-            options['$select'] = ','.join(_select)
+            computed = [i for i in self._get_computed_names() if i not in _select]
+            options['$select'] = ','.join(_select + computed)
+
+        _compute = self.options.get('$compute')
+        if _compute:
+            options['$compute'] = ','.join(_compute)
 
         _filters = self.options.get('$filter')
         if _filters:
@@ -120,13 +396,107 @@ class Query(object):
             options['$orderby'] = ','.join(_order_by)
         return options
 
+    def _get_computed_names(self):
+        return [name for name, _ in self.options.get('computed', [])]
+
+    def _get_entity_properties(self):
+        return [prop for _, prop in inspect.getmembers(self.entity)
+                if isinstance(prop, PropertyBase)]
+
+    def _get_default_select(self):
+        """
+        Property names to select when the entity has deferred properties
+
+        :return: List of property names or None
+        """
+        props = self._get_entity_properties()
+        if not any(prop.deferred for prop in props):
+            return
+
+        undefer = self.options.get('undefer', [])
+        return [prop.name for prop in props
+                if not prop.deferred or prop.name in undefer]
+
+    def _get_access_profile(self, options):
+        """
+        Find the access profile for this query's call site and narrow the
+        selected properties if the service has an access profiler enabled
+
+        :param options: Options that are about to be sent, modified in place
+        :return: SiteProfile instance or None
+        """
+        service = self.entity.__odata_service__
+        profiler = getattr(service, 'access_profiler', None)
+        if profiler is None or self.options.get('$select'):
+            return
+
+        site = profiler.get_site(self.entity)
+        narrowed = profiler.get_select(site, self._get_entity_properties())
+        if narrowed:
+            options['$select'] = ','.join(narrowed + self._get_computed_names())
+        return site
+
+    def _get_load_plan(self, options):
+        """
+        Choose loading strategies for prefetched relationships. Relationships
+        to expand are added to the options
+
+        :param options: Options that are about to be sent, modified in place
+        :return: List of (NavigationProperty, strategy) tuples
+        """
+        prefetch = self.options.get('prefetch')
+        if not prefetch or self.options.get('$select'):
+            return []
+
+        planner = self.entity.__odata_service__.load_planner
+        plan = []
+        expand = []
+        for nav in prefetch:
+            strategy = planner.choose(self.entity, nav)
+            if strategy == EXPAND and not self._is_expanded(nav.name):
+                expand.append(nav.name)
+            plan.append((nav, strategy))
+
+        if expand:
+            options['$expand'] = ','.join(filter(None, [options.get('$expand')] + expand))
+
+        # batch lookups need their keys even when the selection is narrowed
+        if options.get('$select'):
+            select = options['$select'].split(',')
+            for nav, strategy in plan:
+                key_name = nav.get_batch_key(self.entity) if strategy == BATCH else None
+                if key_name and key_name not in select:
+                    select.append(key_name)
+            options['$select'] = ','.join(select)
+        return plan
+
+    def _is_expanded(self, name):
+        for value in self.options.get('$expand', []):
+            if value == name or value.startswith(name + '(') or value.startswith(name + '/'):
+                return True
+        return False
+
+    def _create_models(self, rows, access_profile=None):
+        # entities of a page load their unloaded properties together
+        load_group = []
+        for row in rows:
+            model = self._create_model(row)
+            if not isinstance(model, dict):
+                model.__odata__.load_group = load_group
+                model.__odata__.access_profile = access_profile
+                load_group.append(model)
+            yield model
+
     def _create_model(self, row):
         if len(self.options.get('$select', [])):
             return row
         else:
-            e = self.entity.__new__(self.entity, from_data=row)
-            es = e.__odata__
-            es.connection = self.connection
+            e = self.entity.__new__(self.entity, from_data=row, connection=self.connection)
+            for name, property_type in self.options.get('computed', []):
+                value = row.get(name)
+                if property_type is not None:
+                    value = property_type(name).deserialize(value)
+                e.__odata__.computed[name] = value
             return e
 
     def _get_or_create_option(self, name):
@@ -151,6 +521,13 @@ class Query(object):
         o['$filter'] = self.options.get('$filter', [])[:]
         o['$expand'] = self.options.get('$expand', [])[:]
         o['$orderby'] = self.options.get('$orderby', [])[:]
+        o['undefer'] = self.options.get('undefer', [])[:]
+        o['prefetch'] = self.options.get('prefetch', [])[:]
+        o['$compute'] = self.options.get('$compute', [])[:]
+        o['computed'] = self.options.get('computed', [])[:]
+        o['page_size'] = self.options.get('page_size')
+        o['format'] = self.options.get('format')
+        o['deadline'] = self.options.get('deadline')
         return Query(self.entity, options=o, connection=self.connection)
 
     def as_string(self):
@@ -188,15 +565,77 @@ class Query(object):
         """
         Set ``$expand`` query parameter
 
-        :param values: ``Entity.Property`` instance
+        :param values: ``Entity.Property`` instance, :py:class:`Expand` instance or a path such as ``'Orders/Items'``
         :return: Query instance
         """
         q = self._new_query()
         option = q._get_or_create_option('$expand')
+        for value in values:
+            if not isinstance(value, Expand):
+                value = Expand(value)
+            value.resolve(self.entity)
+            option.append(str(value))
+        return q
+
+    def undefer(self, *values):
+        """
+        Load deferred properties in this query instead of on first access
+
+        :param values: ``Entity.Property`` instance
+        :return: Query instance
+        """
+        q = self._new_query()
+        option = q._get_or_create_option('undefer')
         for prop in values:
             option.append(prop.name)
         return q
 
+    def prefetch(self, *values):
+        """
+        Load relationships of the resulting entities with the strategy chosen
+        by the service's :py:class:`~odata.planner.LoadPlanner`: in the same
+        request with ``$expand``, with batched key lookups, or lazily on access
+
+        :param values: ``Entity.NavigationProperty`` instance
+        :return: Query instance
+        """
+        q = self._new_query()
+        option = q._get_or_create_option('prefetch')
+        option.extend(values)
+        return q
+
+    def compute(self, expr, as_, property_type=None):
+        """
+        Set ``$compute`` query parameter (OData 4.01). The computed value is
+        available in ``entity.__odata__.computed``, or in the raw values when
+        properties are selected. Use :py:func:`computed` to refer to the value
+        in filters, ordering and selects
+
+        :param expr: Expression to compute, for example ``'Price mul Quantity'`` or ``'year(OrderDate)'``
+        :param as_: Name for the computed value
+        :param property_type: Property class used to deserialize the value and escape filter values, for example DecimalProperty. Raw values are used if None
+        :return: Query instance
+        """
+        q = self._new_query()
+        expr = getattr(expr, 'name', expr)
+        q._get_or_create_option('$compute').append(u'{0} as {1}'.format(expr, as_))
+        q._get_or_create_option('computed').append((as_, property_type))
+        return q
+
+    def computed(self, name):
+        """
+        Refer to a value defined with :py:func:`compute`
+
+        :param name: Name of the computed value
+        :return: Property instance
+        """
+        for computed_name, property_type in self.options.get('computed', []):
+            if computed_name == name:
+                if property_type is None:
+                    return PropertyBase(name)
+                return property_type(name)
+        raise KeyError(name)
+
     def order_by(self, *values):
         """
         Set ``$orderby`` query parameter
@@ -245,16 +684,50 @@ class Query(object):
 
     # Actions ##################################################################
 
-    def all(self):
+    def join(self, other, on, batch_size=50, max_workers=1, outer=False, cache_size=10000):
+        """
+        Stream this query's results and pair them with the matching entities
+        of another query, fetched in batches of distinct keys. See
+        :py:mod:`odata.join`
+
+        :param other: Query to fetch matching entities from
+        :param on: Tuple of ``Entity.Property`` instances to match, ``(ThisEntity.Prop, OtherEntity.Prop)``
+        :param batch_size: Maximum number of distinct keys in one request
+        :param max_workers: Number of batches fetched concurrently
+        :param outer: Also yield entities without a match, paired with None
+        :param cache_size: Number of keys to keep the matches of after their batch has been joined
+        :return: :py:class:`~odata.join.SemiJoin` instance yielding (entity, other_entity) tuples
+        """
+        from odata.join import SemiJoin
+        return SemiJoin(self, other, on, batch_size=batch_size,
+                        max_workers=max_workers, outer=outer, cache_size=cache_size)
+
+    def all(self, memory_limit=None, spill_dir=None):
         """
         Returns a list of all Entity instances that match the current query
         options. Iterates through all results with multiple requests fired if
         necessary, exhausting the query
 
+        :param memory_limit: If given, return a :py:class:`~odata.resultset.ResultSet` that writes results to disk after this many bytes
+        :param spill_dir: Directory for the spill file when ``memory_limit`` is given
         :return: A list of Entity instances
         """
+        if memory_limit is not None:
+            return self.materialize(memory_limit=memory_limit, spill_dir=spill_dir)
         return list(iter(self))
 
+    def materialize(self, memory_limit=64 * 1024 * 1024, spill_dir=None):
+        """
+        Fetch all results into a sequence that is written to disk once it
+        grows over ``memory_limit``. See :py:mod:`odata.resultset`
+
+        :param memory_limit: Bytes of encoded rows to keep in memory
+        :param spill_dir: Directory for the spill file. Default temporary directory if None
+        :return: :py:class:`~odata.resultset.ResultSet` instance
+        """
+        from odata.resultset import ResultSet
+        return ResultSet(self, memory_limit=memory_limit, spill_dir=spill_dir)
+
     def first(self):
         """
         Return the first Entity instance that matches current query
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+"""
+Rate limiting
+=============
+
+Services with request quotas throttle clients that go over them, often with
+long penalty delays. A :py:class:`RateLimiter` keeps the client under the
+quota instead, by making requests wait for their turn:
+
+.. code-block:: python
+
+    >>> from odata.ratelimit import RateLimiter
+    >>> limiter = RateLimiter(rate=10, burst=20, max_concurrent=4)
+    >>> Service = ODataService(url, rate_limiter=limiter)
+
+``rate`` is the sustained number of requests per second and ``burst`` the
+number of requests that can be sent at once after an idle period. Requests
+over the limit wait in the order they arrived, they are never rejected.
+``max_concurrent`` limits the number of requests in flight. Responses that
+are read incrementally, like streamed pages, keep their place until they are
+closed.
+
+Waiting respects the :py:mod:`deadlines <odata.deadline>` of the calling
+thread. A request whose turn would come after its deadline raises
+:py:class:`~odata.exceptions.ODataTimeoutError` right away, and gives its
+turn to the next request.
+
+Contexts created with :py:func:`~odata.service.ODataService.create_context`
+share the service's limiter. To limit each host of a service separately, use
+:py:class:`HostRateLimiter`. :py:class:`FileRateLimiter` shares the request
+rate between processes on the same machine through a lock file:
+
+.. code-block:: python
+
+    >>> from odata.ratelimit import FileRateLimiter
+    >>> limiter = FileRateLimiter('/var/run/myapp/odata.rate', rate=10)
+
+----
+
+API
+---
+"""
+
+import json
+import os
+import threading
+import time
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from odata.deadline import check_deadlines, get_request_timeout
+from odata.exceptions import ODataTimeoutError
+
+
+class RateLimiter(object):
+    """
+    Token bucket limiting the rate and concurrency of requests
+
+    :param rate: Requests per second. No rate limit if None
+    :param burst: Number of requests allowed at once after being idle. Default is one second's worth
+    :param max_concurrent: Number of requests allowed in flight. No limit if None
+    :param sleep: Function used to wait
+    """
+    poll_interval = 0.1
+    """Seconds between deadline checks while waiting for a concurrency slot"""
+
+    def __init__(self, rate=None, burst=None, max_concurrent=None, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1, rate or 1)
+        self.max_concurrent = max_concurrent
+        self.sleep = sleep
+        self.requests = 0
+        """Number of requests let through"""
+        self.waited = 0.0
+        """Total time requests waited for the rate limit, in seconds"""
+        self._tokens = float(self.burst)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._slot_freed = threading.Condition(threading.Lock())
+
+    def __repr__(self):
+        return '<RateLimiter rate={0} max_concurrent={1}>'.format(self.rate, self.max_concurrent)
+
+    def acquire(self, url=None):
+        """
+        Wait until a request may be sent. Must be followed by :py:func:`release`
+
+        :param url: URL of the request
+        :raises ODataTimeoutError: The request cannot be sent before the deadline of the current thread
+        :raises ODataCancelledError: The deadline of the current thread was cancelled
+        """
+        check_deadlines()
+        if self.max_concurrent:
+            self._acquire_slot()
+
+        try:
+            wait = 0.0
+            if self.rate:
+                wait = self._reserve()
+                remaining = get_request_timeout(None)
+                if wait > 0 and remaining is not None and wait > remaining:
+                    self._unreserve()
+                    msg = 'Deadline exceeded while waiting {0:.2f}s for the rate limit'.format(wait)
+                    raise ODataTimeoutError(msg)
+            with self._lock:
+                self.requests += 1
+                self.waited += wait
+            if wait > 0:
+                self.sleep(wait)
+        except BaseException:
+            self._release_slot()
+            raise
+
+    def release(self, url=None):
+        """
+        Mark a request as finished
+
+        :param url: URL of the request
+        """
+        self._release_slot()
+
+    def _acquire_slot(self):
+        with self._slot_freed:
+            while self._active >= self.max_concurrent:
+                check_deadlines()
+                self._slot_freed.wait(get_request_timeout(self.poll_interval))
+            self._active += 1
+
+    def _release_slot(self):
+        if not self.max_concurrent:
+            return
+        with self._slot_freed:
+            self._active -= 1
+            self._slot_freed.notify()
+
+    def _reserve(self):
+        """
+        Take a token from the bucket. The bucket may go negative, which
+        reserves a token from the future and queues requests in order
+
+        :return: Seconds to wait for the reserved token
+        """
+        with self._lock:
+            self._tokens, self._updated = self._take(self._tokens, self._updated)
+            if self._tokens < 0:
+                return -self._tokens / self.rate
+            return 0.0
+
+    def _unreserve(self):
+        """Give back the token of a request that was not sent"""
+        with self._lock:
+            self._tokens += 1
+
+    def _take(self, tokens, updated):
+        now = time.time()
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        return tokens - 1, now
+
+
+class FileRateLimiter(RateLimiter):
+    """
+    Rate limiter whose token bucket is stored in a file, shared by all the
+    processes using the same path. Concurrency is limited per process.
+    Requires ``fcntl``, available on Unix platforms
+
+    :param path: Path of the lock file, created if it does not exist
+    """
+    def __init__(self, path, rate=None, burst=None, max_concurrent=None, sleep=time.sleep):
+        if fcntl is None:
+            raise ImportError('FileRateLimiter requires fcntl')
+        super(FileRateLimiter, self).__init__(rate=rate, burst=burst,
+                                              max_concurrent=max_concurrent, sleep=sleep)
+        self.path = path
+
+    def __repr__(self):
+        return '<FileRateLimiter {0} rate={1}>'.format(self.path, self.rate)
+
+    def _reserve(self):
+        tokens = self._update(self._take)
+        if tokens < 0:
+            return -tokens / self.rate
+        return 0.0
+
+    def _unreserve(self):
+        self._update(lambda tokens, updated: (tokens + 1, updated))
+
+    def _update(self, fn):
+        """
+        Change the token bucket stored in the file while holding its lock
+
+        :param fn: Function taking and returning the tokens and the time they were updated
+        :return: New number of tokens
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                state = json.loads(os.read(fd, 1024).decode('utf-8'))
+                tokens, updated = state['tokens'], state['updated']
+            except (ValueError, KeyError):
+                tokens, updated = float(self.burst), time.time()
+
+            tokens, updated = fn(tokens, updated)
+            state = json.dumps(dict(tokens=tokens, updated=updated)).encode('utf-8')
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, state)
+        finally:
+            os.close(fd)
+        return tokens
+
+
+class HostRateLimiter(object):
+    """
+    Limits each host separately, with a :py:class:`RateLimiter` per host
+    created with the given arguments
+
+    :param kwargs: Arguments for :py:class:`RateLimiter`
+    """
+    def __init__(self, **kwargs):
+        self.limiter_options = kwargs
+        self.limiters = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<HostRateLimiter {0}>'.format(self.limiter_options)
+
+    def get_limiter(self, url):
+        """
+        :param url: Request URL
+        :return: RateLimiter instance of the URL's host
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            limiter = self.limiters.get(host)
+            if limiter is None:
+                limiter = RateLimiter(**self.limiter_options)
+                self.limiters[host] = limiter
+        return limiter
+
+    def acquire(self, url=None):
+        self.get_limiter(url).acquire(url)
+
+    def release(self, url=None):
+        self.get_limiter(url).release(url)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+"""
+Large result sets
+=================
+
+:py:func:`~odata.query.Query.all` keeps every resulting entity in memory. For
+entity sets larger than that, a memory budget can be given. Rows are kept in
+a compact encoded form, and once the budget is exceeded they are written to a
+file. The returned :py:class:`ResultSet` supports ``len()``, indexing,
+slicing and iteration, reading spilled rows from a memory-mapped file:
+
+.. code-block:: python
+
+    >>> results = Service.query(Order).all(memory_limit=256 * 1024 * 1024)
+    >>> len(results)
+    2155000
+    >>> results[1500000]
+    <Entity(Orders(1500001))>
+
+    >>> with Service.query(Order).materialize(spill_dir='/mnt/scratch') as results:
+    ...     for order in results:
+    ...         process(order)
+
+Entity instances are created on access, so modifying an entity and reading it
+again by index returns a fresh copy. Related entities are not kept with the
+rows, so queries using :py:func:`~odata.query.Query.prefetch` cannot be
+materialized. Use :py:func:`~odata.query.Query.expand` instead. Like the entities of a query, entities
+created from the same result set load their missing properties together, in
+as few requests as possible. The spill file is removed when the result set is
+closed or garbage collected.
+
+----
+
+API
+---
+"""
+
+import mmap
+import os
+import tempfile
+import weakref
+from array import array
+
+from odata.exceptions import ODataError
+
+
+def _offset_array():
+    try:
+        return array('Q')
+    except ValueError:
+        # python 2: unsigned long is 64 bits on the platforms mmap is useful on
+        return array('L')
+
+
+class _LoadGroup(object):
+    """
+    Entities created from a result set that are still in use. Entities are
+    created on every access, so they are only referenced weakly
+    """
+    def __init__(self):
+        self._refs = []
+        self._pruned_size = 0
+
+    def __iter__(self):
+        for ref in list(self._refs):
+            entity = ref()
+            if entity is not None:
+                yield entity
+
+    def append(self, entity):
+        self._refs.append(weakref.ref(entity))
+        if len(self._refs) > 2 * self._pruned_size + 64:
+            self._refs = [ref for ref in self._refs if ref() is not None]
+            self._pruned_size = len(self._refs)
+
+
+class ResultSet(object):
+    """
+    A read-only sequence of query results that spills to disk once the
+    memory budget is exceeded. Create with
+    :py:func:`~odata.query.Query.materialize`
+
+    :param query: Query instance to read the results of
+    :param memory_limit: Bytes of encoded rows to keep in memory before spilling to disk
+    :param spill_dir: Directory for the spill file. Default temporary directory if None
+    :raises ODataError: The query prefetches relationships
+    """
+    def __init__(self, query, memory_limit=64 * 1024 * 1024, spill_dir=None):
+        self.query = query
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self._codec = query.connection.codec
+        self.spilled = False
+        """True if the rows were written to disk"""
+        self._rows = []
+        self._offsets = _offset_array()
+        self._memory_used = 0
+        self._path = None
+        self._file = None
+        self._map = None
+        self._load_group = _LoadGroup()
+        self._access_profile = None
+        self.closed = False
+        if query.options.get('prefetch'):
+            raise ODataError('Result sets cannot keep prefetched relationships, use expand() instead')
+        self._load()
+
+    def __repr__(self):
+        return '<ResultSet of {0} rows for {1}>'.format(len(self), self.query.entity)
+
+    def __len__(self):
+        if self.spilled:
+            # the last offset marks the end of the file
+            return len(self._offsets) - 1
+        return len(self._rows)
+
+    def __getitem__(self, item):
+        if self.closed:
+            raise ODataError('ResultSet is closed')
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if item < 0 or item >= len(self):
+            raise IndexError('ResultSet index out of range')
+        model = self.query._create_model(self._codec.loads(self._read(item)))
+        if not isinstance(model, dict):
+            model.__odata__.load_group = self._load_group
+            model.__odata__.access_profile = self._access_profile
+            self._load_group.append(model)
+        return model
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def _load(self):
+        try:
+            for page in self._iter_pages():
+                for row in page:
+                    self._append(self._codec.dumps(row))
+        except Exception:
+            self.close()
+            raise
+
+        if self.spilled:
+            self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._offsets.append(self._file.tell())
+
+    def _iter_pages(self):
+        store = getattr(self.query.entity.__odata_service__, 'entity_store', None)
+        if store is not None:
+            local_results = store.execute(self.query)
+            if local_results is not None:
+                yield [row if isinstance(row, dict) else row.__odata__.data for row in local_results]
+                return
+
+        url = self.query._get_url()
+        options = self.query._get_options()
+        self._access_profile = self.query._get_access_profile(options)
+        for page in self.query._iter_pages(url, options):
+            yield page
+
+    def _append(self, encoded):
+        if self.spilled:
+            self._offsets.append(self._file.tell())
+            self._file.write(encoded)
+            return
+
+        self._rows.append(encoded)
+        self._memory_used += len(encoded)
+        if self.memory_limit is not None and self._memory_used > self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        fd, self._path = tempfile.mkstemp(suffix='.odata', dir=self.spill_dir)
+        self._file = os.fdopen(fd, 'w+b')
+        self.spilled = True
+        rows, self._rows = self._rows, []
+        self._memory_used = 0
+        for encoded in rows:
+            self._append(encoded)
+
+    def _read(self, i):
+        if not self.spilled:
+            return self._rows[i]
+        start = int(self._offsets[i])
+        end = int(self._offsets[i + 1])
+        return self._map[start:end]
+
+    def close(self):
+        """Release memory and remove the spill file"""
+        self.closed = True
+        self._rows = []
+        self._offsets = _offset_array()
+        self.spilled = False
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._path = None
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+Retrying requests
+=================
+
+By default a failed request raises an exception right away. A
+:py:class:`RetryPolicy` given to the connection retries requests that failed
+because of connection errors or responded with a status code that is usually
+temporary, like ``429 Too Many Requests`` or ``503 Service Unavailable``:
+
+.. code-block:: python
+
+    >>> from odata.retry import RetryPolicy
+    >>> Service = ODataService(url, retry=RetryPolicy(total=5, backoff=1.0))
+
+The delay between attempts grows exponentially, with random jitter to keep
+clients from retrying in lockstep. A ``Retry-After`` header in the response
+is honored instead of the computed delay.
+
+Only idempotent methods are retried by default, since retrying an insert or
+an action call could run it twice. The number of retries can be set per
+method:
+
+.. code-block:: python
+
+    >>> RetryPolicy(total=3, budgets={'GET': 8, 'POST': 1})
+
+Retries happen per request, so a query that fails on its tenth page
+continues from the tenth page. Delays are shortened to fit the remaining
+time of a :py:mod:`deadline <odata.deadline>`.
+
+----
+
+API
+---
+"""
+
+import email.utils
+import logging
+import random
+import time
+
+from odata.deadline import get_request_timeout
+from odata.exceptions import ODataConnectionError, ODataCircuitOpenError
+
+
+class RetryPolicy(object):
+    """
+    :param total: Number of retries for the methods in ``methods``
+    :param backoff: Delay before the first retry in seconds, doubled for every retry
+    :param max_backoff: Longest delay between retries in seconds
+    :param jitter: Randomize delays between zero and the computed delay
+    :param statuses: Response status codes to retry
+    :param methods: HTTP methods to retry ``total`` times
+    :param budgets: Dictionary of HTTP method and number of retries, overriding ``total`` and ``methods``
+    :param max_retry_after: Give up if ``Retry-After`` asks to wait longer than this many seconds
+    :param sleep: Function used to wait between retries
+    """
+    def __init__(self, total=3, backoff=0.5, max_backoff=30.0, jitter=True,
+                 statuses=(429, 502, 503, 504),
+                 methods=('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'),
+                 budgets=None, max_retry_after=120.0, sleep=time.sleep):
+        self.total = total
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = statuses
+        self.methods = methods
+        self.budgets = budgets or {}
+        self.max_retry_after = max_retry_after
+        self.sleep = sleep
+        self.log = logging.getLogger('odata.retry')
+
+    def __repr__(self):
+        return '<RetryPolicy total={0} backoff={1}>'.format(self.total, self.backoff)
+
+    def get_budget(self, method):
+        """
+        :param method: HTTP method
+        :return: Number of times a request with the method may be retried
+        """
+        if method in self.budgets:
+            return self.budgets[method]
+        if method in self.methods:
+            return self.total
+        return 0
+
+    def get_retry_after(self, response):
+        """
+        :param response: Response object
+        :return: Seconds to wait according to the ``Retry-After`` header, or None
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        parsed = email.utils.parsedate_tz(value)
+        if parsed is not None:
+            return max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+    def get_delay(self, attempt, response=None):
+        """
+        :param attempt: Number of retries done so far
+        :param response: Response of the failed attempt, if any
+        :return: Seconds to wait before the next attempt
+        """
+        if response is not None:
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None:
+                return retry_after
+
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def should_retry(self, method, attempt, response=None, error=None):
+        """
+        :param method: HTTP method
+        :param attempt: Number of retries done so far
+        :param response: Response of the failed attempt, if any
+        :param error: ODataConnectionError raised by the attempt, if any
+        :return: True if the request should be sent again
+        """
+        if attempt >= self.get_budget(method):
+            return False
+        if error is not None:
+            return True
+        if response is None or response.status_code not in self.statuses:
+            return False
+        retry_after = self.get_retry_after(response)
+        return retry_after is None or retry_after <= self.max_retry_after
+
+    def call(self, method, send):
+        """
+        Send a request, retrying it according to the policy
+
+        :param method: HTTP method
+        :param send: Function that sends the request and returns the response
+        :return: Response object
+        :raises ODataConnectionError: Connection failed and no retries are left
+        """
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            try:
+                response = send()
+            except ODataCircuitOpenError:
+                raise
+            except ODataConnectionError as e:
+                error = e
+
+            if not self.should_retry(method, attempt, response, error):
+                if error is not None:
+                    raise error
+                return response
+
+            delay = get_request_timeout(self.get_delay(attempt, response))
+            if response is not None:
+                reason = 'HTTP {0}'.format(response.status_code)
+                response.close()
+            else:
+                reason = str(error)
+            self.log.warning(u'{0} failed ({1}), retrying in {2:.2f}s'.format(method, reason, delay))
+            self.sleep(delay)
+            attempt += 1
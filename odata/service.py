@@ -47,6 +47,22 @@ NTLM Auth (for services like Microsoft Dynamics 2016):
     >>> Service = ODataService('url', session=my_session)
 
 
+Response format
+---------------
+
+By default the service decides how much metadata to annotate responses
+with. Entities only need their property values, as identity is built from
+the primary key properties of the model, so annotations can be turned off
+to save bandwidth. ``ieee754_compatible=True`` asks for 64-bit integers and
+decimals as strings, keeping their full precision:
+
+.. code-block:: python
+
+    >>> Service = ODataService('url', metadata='none', ieee754_compatible=True)
+    >>> context = Service.create_context(metadata='minimal')
+    >>> query = Service.query(Order).response_format(metadata='full')
+
+
 ----
 
 API
@@ -60,6 +76,9 @@ from .metadata import MetaData
 from .exceptions import ODataError
 from .context import Context
 from .action import Action, Function
+from .planner import LoadPlanner
+from .pool import ConnectionPool
+from .warmup import warmup, KeepAlive
 
 __all__ = (
     'ODataService',
@@ -74,14 +93,27 @@ class ODataService(object):
     :param reflect_entities: Create a request to the service for its metadata, and create entity classes automatically
     :param session: Custom Requests session to use for communication with the endpoint
     :param auth: Custom Requests auth object to use for credentials
+    :param warmup_connections: Number of connections to open with :py:func:`warmup` before reflecting entities
+    :param connection_options: Keyword options for :py:class:`~odata.connection.ODataConnection`, like ``page_size``. Also used by :py:func:`create_context`. A new :py:class:`~odata.pool.ConnectionPool` is used if ``pool`` is not given
     :raises ODataConnectionError: Fetching metadata failed. Server returned an HTTP error code
     """
-    def __init__(self, url, base=None, reflect_entities=False, session=None, auth=None):
+    def __init__(self, url, base=None, reflect_entities=False, session=None, auth=None,
+                 warmup_connections=0, **connection_options):
         self.url = url
         self.metadata_url = ''
         self.collections = {}
         self.log = logging.getLogger('odata.service')
-        self.default_context = Context(auth=auth, session=session)
+        if 'pool' not in connection_options:
+            connection_options['pool'] = ConnectionPool()
+        self.pool = connection_options['pool']
+        """
+        :py:class:`~odata.pool.ConnectionPool` shared by the contexts of the
+        service. See :py:mod:`odata.pool`
+
+        :type pool: odata.pool.ConnectionPool
+        """
+        self.connection_options = connection_options
+        self.default_context = Context(auth=auth, session=session, **connection_options)
 
         self.entities = {}
         """
@@ -115,6 +147,32 @@ class ODataService(object):
         :type types: dict
         """
 
+        self.access_profiler = None
+        """
+        An :py:class:`~odata.profiler.AccessProfiler` instance that narrows
+        ``$select`` of queries based on observed property access. Disabled
+        when None
+
+        :type access_profiler: odata.profiler.AccessProfiler
+        """
+
+        self.load_planner = LoadPlanner()
+        """
+        A :py:class:`~odata.planner.LoadPlanner` instance that chooses how
+        relationships given to :py:func:`~odata.query.Query.prefetch` are loaded
+
+        :type load_planner: odata.planner.LoadPlanner
+        """
+
+        self.entity_store = None
+        """
+        An :py:class:`~odata.localquery.EntityStore` instance that answers
+        queries for stored entity sets without network access. Disabled when
+        None
+
+        :type entity_store: odata.localquery.EntityStore
+        """
+
         self.metadata = MetaData(self)
         self.Base = base or declarative_base()
         """
@@ -138,6 +196,17 @@ class ODataService(object):
         :type Function: Function
         """
 
+        self.keepalive = None
+        """
+        The :py:class:`~odata.warmup.KeepAlive` instance started with
+        :py:func:`start_keepalive`, or None
+
+        :type keepalive: odata.warmup.KeepAlive
+        """
+
+        if warmup_connections:
+            self.warmup(connections=warmup_connections)
+
         if reflect_entities:
             _, self.entities, self.types = self.metadata.get_entity_sets(base=self.Entity)
 
@@ -147,16 +216,50 @@ class ODataService(object):
     def __repr__(self):
         return u'<ODataService at {0}>'.format(self.url)
 
-    def create_context(self, auth=None, session=None):
+    def warmup(self, connections=1):
+        """
+        Open and authenticate connections to the endpoint by requesting the
+        service document. See :py:mod:`odata.warmup`
+
+        :param connections: Number of concurrent requests to send
+        :return: Number of successful requests
+        """
+        return warmup(self.default_context.connection, self.url, connections)
+
+    def start_keepalive(self, interval=30.0, connections=1):
+        """
+        Start a background thread that calls :py:func:`warmup` whenever no
+        request has been sent for ``interval`` seconds
+
+        :param interval: Seconds without requests before warming up
+        :param connections: Number of concurrent requests to send
+        """
+        self.stop_keepalive()
+        self.keepalive = KeepAlive(self.default_context.connection, self.url,
+                                   interval=interval, connections=connections)
+        self.keepalive.start()
+
+    def stop_keepalive(self):
+        """
+        Stop the thread started with :py:func:`start_keepalive`
+        """
+        if self.keepalive is not None:
+            self.keepalive.stop()
+            self.keepalive = None
+
+    def create_context(self, auth=None, session=None, **connection_options):
         """
         Create new context to use for session-like usage
 
         :param auth: Custom Requests auth object to use for credentials
         :param session: Custom Requests session to use for communication with the endpoint
+        :param connection_options: Connection options to override the ones given to the service
         :return: Context instance
         :rtype: Context
         """
-        return Context(auth=auth, session=session)
+        options = dict(self.connection_options)
+        options.update(connection_options)
+        return Context(auth=auth, session=session, **options)
 
     def describe(self, entity):
         """
@@ -179,6 +282,16 @@ class ODataService(object):
         """
         return self.default_context.query(entitycls)
 
+    def crossjoin(self, *entities):
+        """
+        Start a new ``$crossjoin`` query over the given entity classes. The
+        service must support ``$crossjoin``
+
+        :param entities: Entity classes to join
+        :return: :py:class:`~odata.join.CrossJoinQuery` instance
+        """
+        return self.default_context.crossjoin(*entities)
+
     def delete(self, entity):
         """
         Creates a DELETE call to the service, deleting the entity
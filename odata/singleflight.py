@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""
+Request coalescing
+==================
+
+When several threads send the same GET request at the same time, only one
+of them needs to reach the service. With the ``coalesce_requests``
+connection option, the first request is sent and the other threads wait for
+its result, sharing the decoded response or the raised exception:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, coalesce_requests=True)
+
+Requests are identical when they have the same URL, query options and
+request headers. Only requests in flight at the same time are coalesced;
+combine with :py:mod:`odata.httpcache` to also reuse finished responses.
+
+Each waiting thread waits no longer than its own
+:py:mod:`deadline <odata.deadline>` allows. When the first request fails
+because its deadline passed or was cancelled, a waiting thread sends the
+request itself instead of sharing that error.
+
+``coalesce_requests=True`` coalesces the requests of one connection. To
+coalesce the requests of all the contexts of a service, pass a shared
+:py:class:`SingleFlight` instance instead. Contexts should only share one
+when they have the same access rights.
+
+----
+
+API
+---
+"""
+
+import threading
+
+from odata.deadline import check_deadlines, get_request_timeout
+from odata.exceptions import ODataTimeoutError, ODataCancelledError
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.completed = False
+
+
+class SingleFlight(object):
+    """
+    Runs a function once for concurrent calls with the same key
+    """
+    poll_interval = 0.1
+    """Seconds between deadline checks while waiting for another call"""
+
+    def __init__(self):
+        self.calls = 0
+        """Number of times a function was run"""
+        self.shared = 0
+        """Number of calls that received the result of another call"""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<SingleFlight calls={0} shared={1}>'.format(self.calls, self.shared)
+
+    def do(self, key, fn):
+        """
+        Run ``fn``, or wait for the result of a call with the same key that
+        is already running. Waiting is limited by the deadlines of the
+        current thread. If the running call fails because of its own deadline
+        or cancellation, the next waiting call runs ``fn`` itself
+
+        :param key: Key identifying the call
+        :param fn: Function without arguments
+        :return: Result of the function
+        :raises ODataTimeoutError: Deadline of the current thread passed while waiting
+        :raises ODataCancelledError: Deadline of the current thread was cancelled while waiting
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                    self.calls += 1
+
+            if leader:
+                return self._run(key, call, fn)
+
+            while not call.done.wait(get_request_timeout(self.poll_interval)):
+                check_deadlines()
+
+            if not call.completed or isinstance(call.error, (ODataTimeoutError, ODataCancelledError)):
+                continue  # the leader gave up for its own reasons, not the request's
+            with self._lock:
+                self.shared += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+            call.completed = True
+        except Exception as e:
+            call.error = e
+            call.completed = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -5,11 +5,15 @@ import os
 import inspect
 from collections import OrderedDict
 
+from odata.exceptions import ODataError
 from odata.property import PropertyBase, NavigationProperty
 
 
 class EntityState(object):
 
+    load_batch_size = 50
+    """Maximum number of entities to load unloaded properties for in one request"""
+
     def __init__(self, entity):
         """:type entity: EntityBase """
         self.entity = entity
@@ -19,6 +23,14 @@ class EntityState(object):
         self.connection = None
         # does this object exist serverside
         self.persisted = False
+        # entities loaded in the same result set, shared between their states
+        self.load_group = None
+        # records property access when an AccessProfiler is enabled
+        self.access_profile = None
+        # relationship statistics of a LoadPlanner, removed on first access
+        self.nav_statistics = {}
+        # values from $compute
+        self.computed = {}
 
     # dictionary access
     def __getitem__(self, item):
@@ -129,6 +141,92 @@ class EntityState(object):
                 rv.append((prop_name, prop))
         return rv
 
+    @property
+    def unloaded_properties(self):
+        rv = []
+        for prop_name, prop in self.properties:
+            if prop.name not in self.data:
+                rv.append((prop_name, prop))
+        return rv
+
+    def load_properties(self, prop=None):
+        """
+        Fetch the values of properties that were left out of the response this
+        entity was created from. Other entities in the same result set that
+        miss the same values are loaded in the same requests. Deferred
+        properties are only loaded when requested
+
+        :param prop: Property being accessed
+        :raises ODataError: The entity was read from the service without its primary key, or has no connection
+        """
+        unloaded = [p for _, p in self.unloaded_properties
+                    if not p.deferred or p is prop]
+        if not unloaded:
+            return
+
+        pk_props = [prop for _, prop in self.primary_key_properties]
+        connection = self.connection
+        if connection is None and self.entity.__odata_service__:
+            connection = self.entity.__odata_service__.default_context.connection
+
+        if self.persisted:
+            names = ', '.join(p.name for p in unloaded)
+            if any(self.data.get(p.name) is None for p in pk_props):
+                raise ODataError(u'Cannot load {0}: primary key was not selected'.format(names))
+            if connection is None:
+                raise ODataError(u'Cannot load {0}: entity has no connection'.format(names))
+
+            pending = [self.entity]
+            for entity in (self.load_group or []):
+                es = entity.__odata__
+                if entity is self.entity or not es.id:
+                    continue
+                if any(p.name not in es for p in unloaded):
+                    pending.append(entity)
+
+            for i in range(0, len(pending), self.load_batch_size):
+                chunk = pending[i:i + self.load_batch_size]
+                self._load_properties_chunk(connection, chunk, pk_props, unloaded)
+
+        # values not returned by the service, or not set on new entities, are null
+        for p in unloaded:
+            if p.name not in self.data:
+                self.data[p.name] = None
+
+    def _load_properties_chunk(self, connection, entities, pk_props, props):
+        from odata.query import Query
+
+        def key_filter(es):
+            parts = []
+            for prop in pk_props:
+                value = prop.deserialize(es[prop.name])
+                parts.append(prop == value)
+            return ' and '.join(parts)
+
+        if len(pk_props) == 1:
+            pk_prop = pk_props[0]
+            values = [pk_prop.deserialize(e.__odata__[pk_prop.name]) for e in entities]
+            query_filter = pk_prop.in_(values)
+        else:
+            key_filters = [u'({0})'.format(key_filter(e.__odata__)) for e in entities]
+            query_filter = u'({0})'.format(' or '.join(key_filters))
+
+        query = Query(self.entity.__class__, connection=connection)
+        query = query.select(*(pk_props + props)).filter(query_filter)
+
+        rows = {}
+        for row in query:
+            key = tuple(row.get(prop.name) for prop in pk_props)
+            rows[key] = row
+
+        for entity in entities:
+            es = entity.__odata__
+            key = tuple(es[prop.name] for prop in pk_props)
+            row = rows.get(key, {})
+            for prop in props:
+                if prop.name not in es:
+                    es[prop.name] = row.get(prop.name)
+
     def set_property_dirty(self, prop):
         if prop.name not in self.dirty:
             self.dirty.append(prop.name)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""
+Streaming responses
+===================
+
+Normally the whole response of a page is downloaded and decoded before the
+first entity is created. With the ``streaming`` connection option, the
+response is read in chunks and each entity of the page is created as soon as
+its part of the response has arrived. Only the row being decoded is kept in
+memory, which keeps memory use low for large pages:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, streaming=True)
+    >>> query = Service.query(Order).response_format(streaming=True)
+
+The service is asked for ``odata.streaming=true``, which makes services that
+support it send annotations like ``@odata.count`` before the results.
+``@odata.nextLink`` is followed wherever it appears in the response.
+
+The :py:mod:`deadlines <odata.deadline>` active when a page is requested are
+checked again before each chunk of it is read, so a streamed page stops when
+its deadline passes or is cancelled.
+
+----
+
+API
+---
+"""
+
+import re
+
+from odata.exceptions import ODataError
+
+_NON_WHITESPACE = re.compile(br'\S')
+_SCALAR_END = re.compile(br'[,\]}\s]')
+_STRING = re.compile(br'["\\]')
+# a complete string, a bracket, or the quote of a string that is not complete yet
+_TOKEN = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]|"')
+# an object without nested objects or arrays, matched in a single step
+_FLAT_OBJECT_PATTERN = br'\{[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*\}'
+_FLAT_OBJECT = re.compile(_FLAT_OBJECT_PATTERN)
+_NEXT_FLAT_OBJECT = re.compile(br'\s*,\s*' + _FLAT_OBJECT_PATTERN)
+
+
+class PageParser(object):
+    """
+    Reads a JSON response incrementally. Iterating yields the decoded items
+    of the ``value`` array. Other members of the response are collected in
+    :py:attr:`annotations` as they are read
+
+    :param chunks: Iterable of response body chunks as bytes
+    :param codec: Codec used to decode the individual values
+    :param response: Optional response object to close with the parser
+    :param check: Optional function called before reading each chunk, raising an exception to stop reading
+    """
+
+    compact_size = 64 * 1024
+    """Discard parsed data from the buffer once this many bytes are parsed"""
+
+    def __init__(self, chunks, codec, response=None, check=None):
+        self.annotations = {}
+        """Members of the response other than ``value``"""
+        self.rows = 0
+        """Number of rows read"""
+        self.bytes_read = 0
+        """Number of response bytes read"""
+        self.response = response
+        self._check = check
+        self._chunks = iter(chunks)
+        self._codec = codec
+        self._buffer = bytearray()
+        self._pos = 0
+        self._started = False
+
+    def __repr__(self):
+        return '<PageParser rows={0} bytes={1}>'.format(self.rows, self.bytes_read)
+
+    def __iter__(self):
+        if self._started:
+            raise ODataError('Response can only be read once')
+        self._started = True
+
+        if self._next_char() != b'{':
+            raise ODataError('Invalid response: expected a JSON object')
+        self._pos += 1
+
+        while True:
+            char = self._next_char()
+            if char == b'}':
+                self._pos += 1
+                break
+            if char == b',':
+                self._pos += 1
+                continue
+
+            key = self._decode(self._scan())
+            if self._next_char() != b':':
+                raise ODataError('Invalid response: expected a colon after {0}'.format(key))
+            self._pos += 1
+
+            if key == 'value' and self._next_char() == b'[':
+                self._pos += 1
+                for row in self._iter_array():
+                    self.rows += 1
+                    yield row
+            else:
+                self._next_char()
+                self.annotations[key] = self._decode(self._scan())
+
+    def close(self):
+        """Release the buffer and the connection of the response"""
+        self._buffer = bytearray()
+        self._pos = 0
+        if self.response is not None:
+            self.response.close()
+
+    def _iter_array(self):
+        while True:
+            char = self._next_char()
+            if char == b']':
+                self._pos += 1
+                return
+            if char == b',':
+                self._pos += 1
+                continue
+
+            # decode the following rows already in the buffer in one call
+            start = self._pos
+            self._pos = self._scan()
+            match = _NEXT_FLAT_OBJECT.match(self._buffer, self._pos)
+            if match is None:
+                yield self._codec.loads(bytes(self._buffer[start:self._pos]))
+                continue
+
+            while match is not None:
+                self._pos = match.end()
+                match = _NEXT_FLAT_OBJECT.match(self._buffer, self._pos)
+            for row in self._codec.loads(b'[' + bytes(self._buffer[start:self._pos]) + b']'):
+                yield row
+
+    def _decode(self, end):
+        value = self._codec.loads(bytes(self._buffer[self._pos:end]))
+        self._pos = end
+        return value
+
+    def _fill(self):
+        if self._check is not None:
+            self._check()
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer.extend(chunk)
+                self.bytes_read += len(chunk)
+                return True
+        return False
+
+    def _next_char(self):
+        """
+        Move to the next non-whitespace character and return it, or an empty
+        string at the end of the response
+        """
+        if self._pos > self.compact_size:
+            del self._buffer[:self._pos]
+            self._pos = 0
+
+        while True:
+            match = _NON_WHITESPACE.search(self._buffer, self._pos)
+            if match is not None:
+                self._pos = match.start()
+                return bytes(self._buffer[self._pos:self._pos + 1])
+            if not self._fill():
+                raise ODataError('Invalid response: unexpected end of data')
+
+    def _scan(self):
+        """
+        Find the end of the JSON value starting at the current position,
+        reading more of the response as needed
+
+        :return: Buffer index after the value
+        """
+        first = bytes(self._buffer[self._pos:self._pos + 1])
+        if first == b'"':
+            return self._scan_string(self._pos + 1)
+        if first in (b'{', b'['):
+            return self._scan_container()
+
+        while True:
+            match = _SCALAR_END.search(self._buffer, self._pos)
+            if match is not None:
+                return match.start()
+            if not self._fill():
+                return len(self._buffer)
+
+    def _scan_string(self, i):
+        while True:
+            match = _STRING.search(self._buffer, i)
+            if match is None:
+                if not self._fill():
+                    raise ODataError('Invalid response: unterminated string')
+                continue
+            if match.group() == b'\\':
+                # skip the escaped character
+                i = match.end() + 1
+            else:
+                return match.end()
+
+    def _scan_container(self):
+        match = _FLAT_OBJECT.match(self._buffer, self._pos)
+        if match is not None:
+            return match.end()
+
+        depth = 0
+        i = self._pos
+        while True:
+            match = _TOKEN.search(self._buffer, i)
+            if match is None:
+                if not self._fill():
+                    raise ODataError('Invalid response: unexpected end of data')
+                continue
+
+            token = match.group()
+            if token == b'"':
+                i = self._scan_string(match.end())
+                continue
+
+            i = match.end()
+            if token in (b'{', b'['):
+                depth += 1
+            elif token in (b'}', b']'):
+                depth -= 1
+                if depth == 0:
+                    return i
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.circuitbreaker import CircuitBreaker, OPEN, HALF_OPEN, CLOSED
+from odata.exceptions import ODataError, ODataCircuitOpenError
+from odata.ratelimit import RateLimiter
+from odata.retry import RetryPolicy
+from odata.tests import Service, Manufacturer
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        self.context = Service.create_context(circuit_breaker=self.breaker)
+        self.url = Manufacturer.__odata_url__()
+
+    def get_state(self):
+        return self.breaker.get_circuit(self.url).state
+
+    def test_opens_after_failures(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, self.url, status=503)
+            self.assertRaises(ODataError, self.context.query(Manufacturer).all)
+            self.assertEqual(self.get_state(), CLOSED)
+            self.assertRaises(ODataError, self.context.query(Manufacturer).all)
+            self.assertEqual(self.get_state(), OPEN)
+
+            # fails without a request
+            self.assertRaises(ODataCircuitOpenError, self.context.query(Manufacturer).all)
+            self.assertEqual(len(rsps.calls), 2)
+
+    def test_connection_errors(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, self.url, body=requests.exceptions.ConnectionError('Refused'))
+            for _ in range(2):
+                self.assertRaises(ODataError, self.context.query(Manufacturer).all)
+        self.assertEqual(self.get_state(), OPEN)
+
+    def test_success_resets(self):
+        self.breaker.record_failure(self.url)
+        self.breaker.record_success(self.url, 0.1)
+        self.breaker.record_failure(self.url)
+        self.assertEqual(self.get_state(), CLOSED)
+
+    def test_slow_calls(self):
+        self.breaker.slow_call_threshold = 1.0
+        self.breaker.record_success(self.url, 2.0)
+        self.breaker.record_success(self.url, 2.0)
+        self.assertEqual(self.get_state(), OPEN)
+
+    def test_half_open(self):
+        for _ in range(2):
+            self.breaker.record_failure(self.url)
+        circuit = self.breaker.get_circuit(self.url)
+        circuit.opened_at -= 61
+
+        self.breaker.before_request(self.url)
+        self.assertEqual(self.get_state(), HALF_OPEN)
+        # only one trial request at a time
+        self.assertRaises(ODataCircuitOpenError, self.breaker.before_request, self.url)
+
+        self.breaker.record_success(self.url, 0.1)
+        self.assertEqual(self.get_state(), CLOSED)
+
+    def test_half_open_failure(self):
+        for _ in range(2):
+            self.breaker.record_failure(self.url)
+        self.breaker.get_circuit(self.url).opened_at -= 61
+        self.breaker.before_request(self.url)
+        self.breaker.record_failure(self.url)
+        self.assertEqual(self.get_state(), OPEN)
+        self.assertRaises(ODataCircuitOpenError, self.breaker.before_request, self.url)
+
+    def test_open_circuit_not_retried(self):
+        delays = []
+        context = Service.create_context(circuit_breaker=self.breaker,
+                                         retry=RetryPolicy(jitter=False, sleep=delays.append))
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, self.url, status=503)
+            self.assertRaises(ODataCircuitOpenError, context.query(Manufacturer).all)
+            self.assertEqual(len(rsps.calls), 2)
+        self.assertEqual(len(delays), 2)
+
+    def test_half_open_trial_released(self):
+        for _ in range(2):
+            self.breaker.record_failure(self.url)
+        self.breaker.get_circuit(self.url).opened_at -= 61
+
+        def send():
+            raise KeyboardInterrupt()
+
+        self.assertRaises(KeyboardInterrupt, self.breaker.call, self.url, send)
+        self.assertEqual(self.get_state(), HALF_OPEN)
+        # the trial was given back, so another one is let through
+        self.breaker.before_request(self.url)
+
+    def test_rate_limiter_wait_not_slow(self):
+        limiter = RateLimiter(rate=1, burst=1, sleep=lambda seconds: time.sleep(0.1))
+        limiter._tokens = 0.0  # the next request waits for its turn
+        self.breaker.slow_call_threshold = 0.05
+        context = Service.create_context(circuit_breaker=self.breaker, rate_limiter=limiter)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, self.url, content_type='application/json', json=dict(value=[]))
+            context.query(Manufacturer).all()
+        self.assertEqual(self.breaker.get_circuit(self.url).failures, 0)
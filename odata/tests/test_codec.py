@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+from decimal import Decimal
+from unittest import TestCase
+
+import responses
+
+from odata.codec import JSONCodec, OrjsonCodec, orjson
+from odata.tests import Service, Product
+
+
+class TestJSONCodec(TestCase):
+
+    def test_loads(self):
+        codec = JSONCodec()
+        data = codec.loads(b'{"value": [{"Price": 1.1, "Name": "\\u00e4"}]}')
+        self.assertEqual(data, dict(value=[dict(Price=1.1, Name=u'ä')]))
+
+    def test_loads_decimal(self):
+        codec = JSONCodec(use_decimal=True)
+        data = codec.loads(b'{"Price": 0.10000000000000000001, "Count": 3}')
+        self.assertEqual(data['Price'], Decimal('0.10000000000000000001'))
+        self.assertEqual(data['Count'], 3)
+
+    def test_dumps(self):
+        codec = JSONCodec()
+        data = codec.dumps(dict(Price=Decimal('0.10000000000000000001')))
+        self.assertTrue(isinstance(data, bytes))
+        self.assertEqual(json.loads(data.decode('utf-8')), dict(Price='0.10000000000000000001'))
+
+    def test_iter_dumps(self):
+        codec = JSONCodec()
+        value = dict(Name='Foo', Parts=[dict(PartID=i, Size=Decimal('1.5')) for i in range(100)])
+        chunks = list(codec.iter_dumps(value, chunk_size=100))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(b''.join(chunks), codec.dumps(value))
+
+    def test_iter_dumps_keys(self):
+        codec = JSONCodec()
+        value = {1: dict(Name='Foo'), 2.5: [{True: None, None: False}], u'ä': Decimal('1.5')}
+        self.assertEqual(b''.join(codec.iter_dumps(value)), codec.dumps(value))
+
+        chunks = codec.iter_dumps({(1, 2): 'Foo'})
+        self.assertRaises(TypeError, list, chunks)
+
+    def test_connection_codec(self):
+        context = Service.create_context(codec=JSONCodec(use_decimal=True))
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(),
+                     content_type='application/json',
+                     body='{"value": [{"ProductID": 1, "Price": 12345678901234.123456789}]}')
+            product = context.query(Product).first()
+        self.assertEqual(product.price, Decimal('12345678901234.123456789'))
+
+    def test_post_decimal_strings(self):
+        context = Service.create_context()
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.POST, Product.__odata_url__(), status=204)
+            context.connection.execute_post(Product.__odata_url__(), dict(Price=Decimal('1.5')))
+            request = rsps.calls[0].request
+        self.assertIn('IEEE754Compatible=true', request.headers['Content-Type'])
+        self.assertEqual(json.loads(request.body.decode('utf-8')), dict(Price='1.5'))
+
+    def test_post_without_decimal_strings(self):
+        class NumberCodec(JSONCodec):
+            decimals_as_strings = False
+
+        context = Service.create_context(codec=NumberCodec())
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.POST, Product.__odata_url__(), status=204)
+            context.connection.execute_post(Product.__odata_url__(), dict(Name='Foo'))
+            request = rsps.calls[0].request
+        self.assertEqual(request.headers['Content-Type'], 'application/json')
+
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class TestOrjsonCodec(TestCase):
+
+    def test_roundtrip(self):
+        codec = OrjsonCodec()
+        data = codec.dumps(dict(Price=Decimal('1.5'), Name=u'ä'))
+        self.assertEqual(codec.loads(data), dict(Price='1.5', Name=u'ä'))
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import json
+import zlib
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.compression import compress, iter_compress
+from odata.exceptions import ODataError
+from odata.tests import Service, Product
+
+
+class TestCompression(TestCase):
+
+    def test_compress(self):
+        data = b'{"Name": "Foo"}' * 100
+        gzipped = compress(data, 'gzip')
+        self.assertEqual(zlib.decompress(gzipped, 16 + zlib.MAX_WBITS), data)
+        deflated = compress(data, 'deflate')
+        self.assertEqual(zlib.decompress(deflated), data)
+        self.assertRaises(ODataError, compress, data, 'br')
+
+    def test_iter_compress(self):
+        chunks = [b'{"value": [', b'1, 2, 3' * 1000, b']}']
+        compressed = b''.join(iter_compress(chunks, 'gzip'))
+        self.assertEqual(zlib.decompress(compressed, 16 + zlib.MAX_WBITS), b''.join(chunks))
+
+    def save_product(self, context, name):
+        requests_seen = []
+
+        def request_callback(request):
+            body = request.body
+            if not isinstance(body, bytes):
+                body = b''.join(body)
+            if request.headers.get('Content-Encoding') == 'gzip':
+                body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            requests_seen.append((request.headers.get('Content-Encoding'),
+                                  request.headers.get('Transfer-Encoding'),
+                                  json.loads(body.decode('utf-8'))))
+            return requests.codes.no_content, {}, ''
+
+        product = Product()
+        product.name = name
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.POST, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            context.save(product)
+        return requests_seen[0]
+
+    def test_compressed_insert(self):
+        context = Service.create_context(compression='gzip', compress_min_size=100)
+        encoding, _, payload = self.save_product(context, u'Kettle ' * 50)
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(payload['ProductName'], u'Kettle ' * 50)
+
+    def test_below_min_size(self):
+        context = Service.create_context(compression='gzip', compress_min_size=10000)
+        encoding, _, payload = self.save_product(context, u'Kettle')
+        self.assertIsNone(encoding)
+        self.assertEqual(payload['ProductName'], u'Kettle')
+
+    def test_chunked_insert(self):
+        context = Service.create_context(chunked_requests=True, compression='gzip')
+        context.connection.request_chunk_size = 10
+        encoding, transfer_encoding, payload = self.save_product(context, u'Kettle ' * 50)
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(transfer_encoding, 'chunked')
+        self.assertEqual(payload['ProductName'], u'Kettle ' * 50)
+
+    def test_chunked_small_insert(self):
+        context = Service.create_context(chunked_requests=True)
+        encoding, transfer_encoding, payload = self.save_product(context, u'Kettle')
+        self.assertIsNone(encoding)
+        self.assertIsNone(transfer_encoding)
+        self.assertEqual(payload['ProductName'], u'Kettle')
@@ -68,3 +68,44 @@ class TestContext(TestCase):
             context.call(Product.DemoActionWithParameters,
                          Name='TestName',
                          Price=decimal.Decimal('25.0'))
+
+    def test_context_response_format(self):
+        accept = []
+
+        def request_callback(request):
+            accept.append(request.headers.get('Accept'))
+            body = dict(value=[dict(ProductID='9007199254740993', Price='10.10')])
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+
+            context = Service.create_context(metadata='none', ieee754_compatible=True)
+            product = context.query(Product).first()
+            context.query(Product).response_format(metadata='minimal').first()
+            Service.query(Product).first()
+
+        self.assertEqual(accept, [
+            'application/json;odata.metadata=none;IEEE754Compatible=true',
+            'application/json;odata.metadata=minimal;IEEE754Compatible=true',
+            'application/json',
+        ])
+        self.assertEqual(product.id, 9007199254740993)
+        self.assertEqual(product.price, decimal.Decimal('10.10'))
+
+    def test_ieee754_compatible_set_same_value(self):
+        context = Service.create_context(ieee754_compatible=True)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=[dict(ProductID='123', Price='10.10')]))
+            product = context.query(Product).first()
+
+        product.id = 123
+        product.price = decimal.Decimal('10.10')
+        self.assertEqual(product.__odata__.dirty, [])
+
+        product.price = decimal.Decimal('10.20')
+        self.assertEqual(product.__odata__.dirty, ['Price'])
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.circuitbreaker import CircuitBreaker, CLOSED, OPEN
+from odata.deadline import Deadline, CancellationToken, get_request_timeout
+from odata.exceptions import ODataTimeoutError, ODataCancelledError, ODataConnectionError
+from odata.retry import RetryPolicy
+from odata.tests import Service, Manufacturer
+
+
+class TestDeadline(TestCase):
+
+    def test_request_timeout(self):
+        self.assertEqual(get_request_timeout(90), 90)
+        with Deadline(5.0):
+            self.assertTrue(4.0 < get_request_timeout(90) <= 5.0)
+            with Deadline(1.0):
+                self.assertTrue(get_request_timeout(90) <= 1.0)
+            with Deadline(60.0):
+                self.assertTrue(get_request_timeout(90) <= 5.0)
+        self.assertEqual(get_request_timeout(90), 90)
+
+    def test_timeout_sent(self):
+        timeouts = []
+
+        def request_callback(request):
+            timeouts.append(request.req_kwargs['timeout'])
+            return requests.codes.ok, {'content-type': 'application/json'}, '{"value": []}'
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(), callback=request_callback)
+            with Deadline(2.0):
+                Service.query(Manufacturer).all()
+        self.assertTrue(timeouts[0] <= 2.0)
+
+    def test_expired(self):
+        with responses.RequestsMock(assert_all_requests_are_fired=False):
+            with Deadline(0.0):
+                with self.assertRaises(ODataTimeoutError):
+                    Service.query(Manufacturer).all()
+
+    def test_query_deadline_pages(self):
+        next_url = Manufacturer.__odata_url__() + '?$skiptoken=1'
+
+        def request_callback(request):
+            time.sleep(0.1)
+            body = '{{"value": [{{"ManufacturerID": 1}}], "@odata.nextLink": "{0}"}}'.format(next_url)
+            return requests.codes.ok, {'content-type': 'application/json'}, body
+
+        query = Service.query(Manufacturer).deadline(0.25)
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(), callback=request_callback)
+            with self.assertRaises(ODataTimeoutError):
+                list(query)
+            self.assertTrue(2 <= len(rsps.calls) <= 3)
+
+    def test_cancel(self):
+        token = CancellationToken()
+        next_url = Manufacturer.__odata_url__() + '?$skiptoken=1'
+        body = dict(value=[dict(ManufacturerID=1)])
+        body['@odata.nextLink'] = next_url
+
+        rows = []
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), content_type='application/json', json=body)
+            with self.assertRaises(ODataCancelledError):
+                for manufacturer in Service.query(Manufacturer).deadline(token=token):
+                    rows.append(manufacturer)
+                    token.cancel()
+        self.assertEqual(len(rows), 1)
+
+    def test_retries_stop(self):
+        context = Service.create_context(retry=RetryPolicy(total=10, backoff=0.1, jitter=False))
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), status=503)
+            with Deadline(0.25):
+                with self.assertRaises(ODataTimeoutError):
+                    context.query(Manufacturer).all()
+            self.assertTrue(len(rsps.calls) < 5)
+
+    def test_deadline_timeout_not_host_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        context = Service.create_context(circuit_breaker=breaker)
+
+        def request_callback(request):
+            time.sleep(request.req_kwargs['timeout'])
+            raise requests.exceptions.ReadTimeout('Read timed out')
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(), callback=request_callback)
+            with Deadline(0.1):
+                with self.assertRaises(ODataTimeoutError):
+                    context.query(Manufacturer).all()
+        self.assertEqual(breaker.get_circuit(Manufacturer.__odata_url__()).state, CLOSED)
+
+    def test_host_timeout_is_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        context = Service.create_context(circuit_breaker=breaker)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     body=requests.exceptions.ReadTimeout('Read timed out'))
+            with Deadline(60.0):
+                with self.assertRaises(ODataConnectionError):
+                    context.query(Manufacturer).all()
+        self.assertEqual(breaker.get_circuit(Manufacturer.__odata_url__()).state, OPEN)
+
+    def test_cancel_streamed_page(self):
+        token = CancellationToken()
+        rows = [dict(ManufacturerID=i, Name='Manufacturer {0}'.format(i)) for i in range(50)]
+        context = Service.create_context()
+        context.connection.stream_chunk_size = 64
+
+        read = []
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), content_type='application/json',
+                     json=dict(value=rows))
+            query = context.query(Manufacturer).response_format(streaming=True).deadline(token=token)
+            with self.assertRaises(ODataCancelledError):
+                for manufacturer in query:
+                    read.append(manufacturer)
+                    token.cancel()
+        self.assertTrue(0 < len(read) < 50)
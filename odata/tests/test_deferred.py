@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import ODataError
+from odata.property import IntegerProperty, StringProperty
+from odata.tests import Service
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse, parse_qs
+
+
+class Document(Service.Entity):
+    __odata_type__ = 'ODataTest.Objects.Document'
+    __odata_collection__ = 'Documents'
+
+    id = IntegerProperty('DocumentID', primary_key=True)
+    title = StringProperty('Title')
+    content = StringProperty('Content', deferred=True)
+
+
+def get_params(request):
+    return parse_qs(urlparse(request.url).query)
+
+
+class TestDeferredProperties(TestCase):
+
+    def test_deferred_property_not_selected(self):
+        def request_callback(request):
+            params = get_params(request)
+            selected = params['$select'][0].split(',')
+            self.assertIn('DocumentID', selected)
+            self.assertIn('Title', selected)
+            self.assertNotIn('Content', selected)
+
+            body = dict(value=[dict(DocumentID=1, Title='Foo')])
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Document.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            doc = Service.query(Document).first()
+
+        self.assertIsInstance(doc, Document)
+        self.assertNotIn('Content', doc.__odata__)
+        self.assertEqual(doc.title, 'Foo')
+
+    def test_undefer(self):
+        def request_callback(request):
+            params = get_params(request)
+            selected = params['$select'][0].split(',')
+            self.assertIn('Content', selected)
+
+            body = dict(value=[dict(DocumentID=1, Title='Foo', Content='Bar')])
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Document.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            doc = Service.query(Document).undefer(Document.content).first()
+
+        self.assertEqual(doc.content, 'Bar')
+
+    def test_load_deferred_for_result_set(self):
+        rows = [
+            dict(DocumentID=1, Title='Foo'),
+            dict(DocumentID=2, Title='Bar'),
+        ]
+
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Document.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=rows))
+            docs = Service.query(Document).all()
+
+        def request_callback(request):
+            params = get_params(request)
+            query_filter = params['$filter'][0]
+            self.assertIn('DocumentID eq 1', query_filter)
+            self.assertIn('DocumentID eq 2', query_filter)
+            self.assertEqual(params['$select'][0], 'DocumentID,Content')
+
+            body = dict(value=[
+                dict(DocumentID=2, Content='Second'),
+                dict(DocumentID=1, Content='First'),
+            ])
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Document.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            self.assertEqual(docs[0].content, 'First')
+            self.assertEqual(len(rsps.calls), 1)
+
+        # already loaded, no further requests
+        self.assertEqual(docs[1].content, 'Second')
+        self.assertEqual(docs[0].__odata__.dirty, [])
+
+    def test_set_deferred_property_without_loading(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Document.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=[dict(DocumentID=1, Title='Foo')]))
+            doc = Service.query(Document).first()
+
+        def request_callback(request):
+            payload = json.loads(request.body)
+            self.assertEqual(payload['Content'], 'New content')
+            return requests.codes.no_content, {}, ''
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.PATCH, doc.__odata__.instance_url,
+                              callback=request_callback,
+                              content_type='application/json')
+            doc.content = 'New content'
+            Service.save(doc, force_refresh=False)
+
+    def test_load_without_primary_key(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Document.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=[dict(Title='Foo')]))
+            doc = Service.query(Document).first()
+
+            # the missing value is not mistaken for null
+            self.assertRaises(ODataError, getattr, doc, 'content')
+            self.assertEqual(len(rsps.calls), 1)
+
+    def test_new_entity_properties_null(self):
+        doc = Document()
+        self.assertIsNone(doc.content)
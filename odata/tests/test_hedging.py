@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.deadline import Deadline, get_request_timeout
+from odata.exceptions import ODataConnectionError
+from odata.hedging import HedgePolicy
+from odata.tests import Service, Manufacturer
+
+
+class FakeResponse(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestHedgePolicy(TestCase):
+
+    def setUp(self):
+        self.policy = HedgePolicy(percentile=50, min_delay=0.01, budget=1.0, min_samples=5)
+        for _ in range(5):
+            self.policy.record(0.05)
+
+    def test_delay(self):
+        policy = HedgePolicy(percentile=90, min_delay=0.01, max_delay=1.0, min_samples=10)
+        self.assertIsNone(policy.get_delay())
+        for i in range(10):
+            policy.record(i / 10.0)
+        self.assertAlmostEqual(policy.get_delay(), 0.8)
+        for _ in range(5):
+            policy.record(5.0)
+        self.assertEqual(policy.get_delay(), 1.0)
+
+    def test_no_hedge(self):
+        calls = []
+
+        def send():
+            calls.append(1)
+            return FakeResponse('first')
+
+        response = self.policy.call(send)
+        self.assertEqual(response.name, 'first')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.policy.hedged, 0)
+
+    def test_hedge_wins(self):
+        responses_sent = []
+        lock = threading.Lock()
+
+        def send():
+            with lock:
+                index = len(responses_sent)
+                response = FakeResponse(index)
+                responses_sent.append(response)
+            if index == 0:
+                time.sleep(0.3)
+            return response
+
+        response = self.policy.call(send)
+        self.assertEqual(response.name, 1)
+        self.assertEqual(self.policy.hedged, 1)
+        self.assertEqual(self.policy.hedge_wins, 1)
+        time.sleep(0.4)
+        self.assertTrue(responses_sent[0].closed)
+        self.assertFalse(responses_sent[1].closed)
+
+    def test_failed_attempt_loses(self):
+        calls = []
+        lock = threading.Lock()
+
+        def send():
+            with lock:
+                index = len(calls)
+                calls.append(1)
+            time.sleep(0.1)
+            if index == 0:
+                raise ODataConnectionError('reset')
+            time.sleep(0.1)
+            return FakeResponse(index)
+
+        self.assertEqual(self.policy.call(send).name, 1)
+
+    def test_all_attempts_fail(self):
+        def send():
+            time.sleep(0.1)
+            raise ODataConnectionError('reset')
+
+        with self.assertRaises(ODataConnectionError):
+            self.policy.call(send)
+
+    def test_budget(self):
+        self.policy.budget = 0.0
+
+        def send():
+            time.sleep(0.1)
+            return FakeResponse('first')
+
+        self.assertEqual(self.policy.call(send).name, 'first')
+        self.assertEqual(self.policy.hedged, 0)
+
+    def test_budget_window(self):
+        policy = HedgePolicy(budget=0.5, budget_window=10.0)
+        for _ in range(100):
+            policy.call(lambda: FakeResponse('first'))
+        self.assertTrue(policy._acquire_hedge())
+
+        # an hour later, the quiet period has not saved up a budget
+        policy._decayed_at -= 3600
+        policy.call(lambda: FakeResponse('first'))
+        self.assertFalse(policy._acquire_hedge())
+
+    def test_deadlines_bound(self):
+        timeouts = []
+
+        def send():
+            timeouts.append(get_request_timeout(90))
+            return FakeResponse('first')
+
+        with Deadline(2.0):
+            self.policy.call(send)
+        self.assertTrue(timeouts[0] <= 2.0)
+
+    def test_connection(self):
+        policy = HedgePolicy(percentile=50, min_delay=0.01, budget=1.0, min_samples=1)
+        policy.record(0.05)
+        context = Service.create_context(hedging=policy)
+        calls = []
+        lock = threading.Lock()
+
+        def request_callback(request):
+            with lock:
+                calls.append(1)
+                first = len(calls) == 1
+            if first:
+                time.sleep(0.3)
+                body = '{"value": [{"ManufacturerID": 1, "Name": "Slow"}]}'
+            else:
+                body = '{"value": [{"ManufacturerID": 1, "Name": "Fast"}]}'
+            return requests.codes.ok, {'content-type': 'application/json'}, body
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(), callback=request_callback)
+            result = context.query(Manufacturer).all()
+            time.sleep(0.4)
+
+        self.assertEqual([m.name for m in result], ['Fast'])
+        self.assertEqual(policy.hedge_wins, 1)
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase, skipIf
+
+from requests.auth import HTTPBasicAuth
+from requests.exceptions import HTTPError
+from requests.structures import CaseInsensitiveDict
+
+from odata import ODataService
+from odata.exceptions import ODataError, ODataConnectionError
+from odata.tests import Service, Manufacturer
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from odata import http2
+
+
+@skipIf(httpx is None, 'httpx not installed')
+class TestHTTP2Pool(TestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.handler = None
+
+        def handler(request):
+            self.requests.append(request)
+            return self.handler(request)
+
+        self.pool = http2.HTTP2Pool(http2=False, transport=httpx.MockTransport(handler))
+        self.service = ODataService(Service.url, pool=self.pool)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_query(self):
+        body = dict(value=[dict(ManufacturerID=1, Name='Acme')])
+        self.handler = lambda request: httpx.Response(200, json=body)
+
+        context = self.service.create_context(auth=HTTPBasicAuth('user', 'password'))
+        result = context.connection.execute_get(Manufacturer.__odata_url__(), params={'$top': '1'})
+
+        self.assertEqual(result, body)
+        request = self.requests[0]
+        self.assertEqual(request.url.params['$top'], '1')
+        self.assertEqual(request.headers['OData-Version'], '4.0')
+        self.assertTrue(request.headers['Authorization'].startswith('Basic '))
+        self.assertEqual(self.pool.get_stats()['requests'], 1)
+
+    def test_post(self):
+        def handler(request):
+            return httpx.Response(201, json=json.loads(request.content.decode('utf-8')))
+        self.handler = handler
+
+        context = self.service.create_context()
+        result = context.connection.execute_post(Manufacturer.__odata_url__(), dict(Name='Acme'))
+        self.assertEqual(result, dict(Name='Acme'))
+
+    def test_error_response(self):
+        self.handler = lambda request: httpx.Response(404, json=dict(error=dict(code='NotFound')))
+
+        context = self.service.create_context()
+        with self.assertRaises(ODataError) as cm:
+            context.connection.execute_get(Manufacturer.__odata_url__())
+        self.assertEqual(cm.exception.code, 'NotFound')
+
+    def test_connection_error(self):
+        def handler(request):
+            raise httpx.ConnectError('refused', request=request)
+        self.handler = handler
+
+        context = self.service.create_context()
+        with self.assertRaises(ODataConnectionError):
+            context.connection.execute_get(Manufacturer.__odata_url__())
+
+    def test_stream(self):
+        body = dict(value=[dict(ManufacturerID=1, Name='Acme')])
+        self.handler = lambda request: httpx.Response(200, json=body)
+
+        context = self.service.create_context()
+        page = context.connection.execute_get_stream(Manufacturer.__odata_url__())
+        self.assertEqual(list(page), body['value'])
+        page.close()
+
+
+class FakeHTTPX(object):
+    """
+    Stands in for the parts of the httpx module used by the adapter, so
+    that it is tested without httpx installed
+    """
+    class HTTPError(Exception):
+        pass
+
+    class TimeoutException(HTTPError):
+        pass
+
+    class Limits(object):
+        def __init__(self, **kwargs):
+            self.options = kwargs
+
+    class Response(object):
+        def __init__(self, status_code, body=b'', headers=None, chunks=None):
+            self.status_code = status_code
+            self.headers = CaseInsensitiveDict(headers or {})
+            self.http_version = 'HTTP/2'
+            self.reason_phrase = 'Not Found'
+            self.url = 'http://demo.local/odata/'
+            self.body = body
+            self.chunks = chunks
+            self.closed = False
+
+        def read(self):
+            return self.body
+
+        def iter_bytes(self, chunk_size=None):
+            for chunk in self.chunks or [self.body]:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+
+        def close(self):
+            self.closed = True
+
+    class Client(object):
+        def __init__(self, http2=True, limits=None, transport=None):
+            self.http2 = http2
+            self.limits = limits
+            self.sent = []
+            self.respond = None
+            self.closed = False
+
+        def build_request(self, method, url, params=None, headers=None, content=None, timeout=None):
+            return dict(method=method, url=url, params=params, headers=headers,
+                        content=content, timeout=timeout)
+
+        def send(self, request, auth=None, stream=False):
+            self.sent.append(dict(request, auth=auth, stream=stream))
+            return self.respond(request)
+
+        def close(self):
+            self.closed = True
+
+
+class TestHTTP2Adapter(TestCase):
+
+    def setUp(self):
+        self.original = http2.httpx
+        http2.httpx = FakeHTTPX
+        self.pool = http2.HTTP2Pool(max_connections=4, headers={'X-Pool': '1'})
+        self.client = self.pool.client
+        self.service = ODataService(Service.url, pool=self.pool)
+
+    def tearDown(self):
+        http2.httpx = self.original
+
+    def json_response(self, value, status_code=200):
+        return FakeHTTPX.Response(status_code, json.dumps(value).encode('utf-8'),
+                                  headers={'Content-Type': 'application/json'})
+
+    def test_pool(self):
+        self.assertTrue(self.client.http2)
+        self.assertEqual(self.client.limits.options['max_connections'], 4)
+        self.pool.close()
+        self.assertTrue(self.client.closed)
+
+    def test_query(self):
+        body = dict(value=[dict(ManufacturerID=1, Name='Acme')])
+        self.client.respond = lambda request: self.json_response(body)
+
+        context = self.service.create_context(auth=HTTPBasicAuth('user', 'password'))
+        result = context.connection.execute_get(Manufacturer.__odata_url__(), params={'$top': '1'})
+
+        self.assertEqual(result, body)
+        sent = self.client.sent[0]
+        self.assertEqual(sent['method'], 'GET')
+        self.assertEqual(sent['params'], {'$top': '1'})
+        self.assertEqual(sent['headers']['OData-Version'], '4.0')
+        self.assertEqual(sent['headers']['X-Pool'], '1')
+        self.assertTrue(sent['headers']['Authorization'].startswith('Basic '))
+        self.assertIsNone(sent['auth'])
+        self.assertIsNotNone(sent['timeout'])
+
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['active'], 0)
+        self.assertIsNotNone(self.pool.last_used)
+
+    def test_tuple_auth(self):
+        self.client.respond = lambda request: self.json_response(dict(value=[]))
+        context = self.service.create_context(auth=('user', 'password'))
+        context.connection.execute_get(Manufacturer.__odata_url__())
+        sent = self.client.sent[0]
+        self.assertEqual(sent['auth'], ('user', 'password'))
+        self.assertNotIn('Authorization', sent['headers'])
+
+    def test_post(self):
+        self.client.respond = lambda request: self.json_response(json.loads(request['content']), 201)
+        context = self.service.create_context()
+        result = context.connection.execute_post(Manufacturer.__odata_url__(), dict(Name='Acme'))
+        self.assertEqual(result, dict(Name='Acme'))
+        self.assertEqual(self.client.sent[0]['method'], 'POST')
+
+    def test_error_response(self):
+        self.client.respond = lambda request: self.json_response(dict(error=dict(code='NotFound')), 404)
+        context = self.service.create_context()
+        with self.assertRaises(ODataError) as cm:
+            context.connection.execute_get(Manufacturer.__odata_url__())
+        self.assertEqual(cm.exception.code, 'NotFound')
+
+    def test_raise_for_status(self):
+        response = http2.HTTP2Response(FakeHTTPX.Response(404))
+        self.assertRaises(HTTPError, response.raise_for_status)
+        http2.HTTP2Response(FakeHTTPX.Response(200)).raise_for_status()
+
+    def test_connection_errors(self):
+        context = self.service.create_context()
+        for error in (FakeHTTPX.HTTPError('refused'), FakeHTTPX.TimeoutException('timed out')):
+            def respond(request):
+                raise error
+            self.client.respond = respond
+            with self.assertRaises(ODataConnectionError):
+                context.connection.execute_get(Manufacturer.__odata_url__())
+        self.assertEqual(self.pool.get_stats()['active'], 0)
+
+    def test_stream(self):
+        response = FakeHTTPX.Response(200, headers={'Content-Type': 'application/json'},
+                                      chunks=[b'{"value": [{"ManufacturerID": 1, ', b'"Name": "Acme"}]}'])
+        self.client.respond = lambda request: response
+
+        context = self.service.create_context()
+        page = context.connection.execute_get_stream(Manufacturer.__odata_url__())
+        self.assertTrue(self.client.sent[0]['stream'])
+        self.assertEqual(list(page), [dict(ManufacturerID=1, Name='Acme')])
+        page.close()
+        self.assertTrue(response.closed)
+
+    def test_stream_error(self):
+        response = FakeHTTPX.Response(200, headers={'Content-Type': 'application/json'},
+                                      chunks=[b'{"value": [', FakeHTTPX.HTTPError('reset')])
+        self.client.respond = lambda request: response
+
+        context = self.service.create_context()
+        page = context.connection.execute_get_stream(Manufacturer.__odata_url__())
+        with self.assertRaises(ODataConnectionError):
+            list(page)
+
+
+class TestHTTP2Missing(TestCase):
+
+    def test_missing_httpx(self):
+        original = http2.httpx
+        http2.httpx = None
+        try:
+            with self.assertRaises(ODataError):
+                http2.HTTP2Pool()
+        finally:
+            http2.httpx = original
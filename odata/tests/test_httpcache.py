@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata import ODataService
+from odata.httpcache import HTTPCache, FileCacheStore, CacheEntry
+from odata.tests import Service, Manufacturer, ProductWithNavigation
+
+path = os.path.join(os.path.dirname(__file__), 'demo_metadata.xml')
+with open(path, mode='rb') as f:
+    metadata_xml = f.read()
+
+
+class TestHTTPCache(TestCase):
+
+    def setUp(self):
+        self.cache = HTTPCache()
+        self.context = Service.create_context(http_cache=self.cache)
+
+    def test_fresh_response(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     content_type='application/json',
+                     headers={'Cache-Control': 'max-age=60'},
+                     json=dict(value=[dict(ManufacturerID=1, Name='Acme')]))
+            first = self.context.query(Manufacturer).all()
+            second = self.context.query(Manufacturer).all()
+            self.assertEqual(len(rsps.calls), 1)
+
+        self.assertEqual([m.name for m in first], ['Acme'])
+        self.assertEqual([m.name for m in second], ['Acme'])
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_different_options(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     content_type='application/json',
+                     headers={'Cache-Control': 'max-age=60'},
+                     json=dict(value=[]))
+            self.context.query(Manufacturer).all()
+            self.context.query(Manufacturer).filter(Manufacturer.name == 'Acme').all()
+            self.assertEqual(len(rsps.calls), 2)
+
+    def test_revalidate(self):
+        requested = []
+
+        def request_callback(request):
+            requested.append(request.headers.get('If-None-Match'))
+            if request.headers.get('If-None-Match') == '"v1"':
+                return 304, {}, ''
+            body = '{"value": [{"ManufacturerID": 1, "Name": "Acme"}]}'
+            return requests.codes.ok, {'ETag': '"v1"'}, body
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            self.context.query(Manufacturer).all()
+            manufacturers = self.context.query(Manufacturer).all()
+
+        self.assertEqual(requested, [None, '"v1"'])
+        self.assertEqual([m.name for m in manufacturers], ['Acme'])
+        self.assertEqual(self.cache.revalidated, 1)
+
+    def test_no_store(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     content_type='application/json',
+                     headers={'Cache-Control': 'no-store', 'ETag': '"v1"'},
+                     json=dict(value=[]))
+            self.context.query(Manufacturer).all()
+            self.context.query(Manufacturer).all()
+            self.assertEqual(len(rsps.calls), 2)
+            self.assertNotIn('If-None-Match', rsps.calls[1].request.headers)
+
+    def test_expanded_data_not_modified(self):
+        row = dict(ProductID=1, ProductName='Kettle', Manufacturer=dict(ManufacturerID=1, Name='Acme'))
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(),
+                     content_type='application/json',
+                     headers={'Cache-Control': 'max-age=60'},
+                     json=dict(value=[row]))
+            query = self.context.query(ProductWithNavigation).expand(ProductWithNavigation.manufacturer)
+            query.all()
+            product = query.all()[0]
+            self.assertEqual(len(rsps.calls), 1)
+
+        self.assertEqual(product.manufacturer.name, 'Acme')
+
+    def test_not_modified_closed(self):
+        closed = []
+
+        class NotModified(object):
+            status_code = 304
+            headers = {}
+
+            def close(self):
+                closed.append(True)
+
+        url = Manufacturer.__odata_url__()
+        self.cache.store.set(self.cache.get_key(url), CacheEntry(dict(value=[]), 0, etag='"v1"'))
+        data = self.cache.fetch(url, None, {}, lambda headers: NotModified(), None)
+        self.assertEqual(data, dict(value=[]))
+        self.assertEqual(closed, [True])
+
+
+class TestFileCacheStore(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store(self):
+        store = FileCacheStore(os.path.join(self.directory, 'cache'))
+        self.assertIsNone(store.get('a'))
+        store.set('a', CacheEntry(dict(value=[1]), 0, etag='"x"'))
+        entry = store.get('a')
+        self.assertEqual(entry.data, dict(value=[1]))
+        self.assertEqual(entry.etag, '"x"')
+        store.delete('a')
+        self.assertIsNone(store.get('a'))
+
+    def test_bytes(self):
+        store = FileCacheStore(self.directory)
+        store.set('a', CacheEntry(b'<edmx/>\n', 10, last_modified='Mon, 01 Jan 2024 00:00:00 GMT'))
+        entry = store.get('a')
+        self.assertEqual(entry.data, b'<edmx/>\n')
+        self.assertEqual(entry.expires, 10)
+        self.assertEqual(entry.last_modified, 'Mon, 01 Jan 2024 00:00:00 GMT')
+
+    def test_pickle_not_loaded(self):
+        store = FileCacheStore(self.directory)
+        with open(store._get_path('a'), 'wb') as f:
+            pickle.dump(CacheEntry(dict(value=[1]), 0), f)
+        self.assertIsNone(store.get('a'))
+
+    def test_metadata(self):
+        cache = HTTPCache(FileCacheStore(self.directory))
+        url = 'http://demo.local/odata/$metadata/'
+
+        def request_callback(request):
+            if request.headers.get('If-None-Match') == '"m1"':
+                return 304, {}, ''
+            return requests.codes.ok, {'ETag': '"m1"'}, metadata_xml
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, url, callback=request_callback, content_type='text/xml')
+            ODataService('http://demo.local/odata/', reflect_entities=True, http_cache=cache)
+
+        # a new process with the same cache directory
+        cache = HTTPCache(FileCacheStore(self.directory))
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, url, callback=request_callback, content_type='text/xml')
+            service = ODataService('http://demo.local/odata/', reflect_entities=True, http_cache=cache)
+
+        self.assertIn('Product', service.entities)
+        self.assertEqual(cache.revalidated, 1)
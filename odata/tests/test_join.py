@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.deadline import Deadline
+from odata.exceptions import ODataError
+from odata.tests import Service, ProductWithNavigation, Manufacturer
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse, parse_qs
+
+
+PRODUCTS = [
+    dict(ProductID=1, ProductName='Kettle', ManufacturerID=10),
+    dict(ProductID=2, ProductName='Toaster', ManufacturerID=11),
+    dict(ProductID=3, ProductName='Lamp', ManufacturerID=10),
+    dict(ProductID=4, ProductName='Clock', ManufacturerID=12),
+]
+
+MANUFACTURERS = {
+    10: dict(ManufacturerID=10, Name='Acme'),
+    11: dict(ManufacturerID=11, Name='Globex'),
+}
+
+
+class TestSemiJoin(TestCase):
+
+    def setUp(self):
+        self.filters = []
+        self.timeouts = []
+
+    def manufacturers_callback(self, request):
+        self.timeouts.append(request.req_kwargs['timeout'])
+        query_filter = parse_qs(urlparse(request.url).query)['$filter'][0]
+        self.filters.append(query_filter)
+        rows = [row for key, row in MANUFACTURERS.items()
+                if 'ManufacturerID eq {0}'.format(key) in query_filter]
+        return requests.codes.ok, {}, json.dumps(dict(value=rows))
+
+    def run_join(self, **kwargs):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=PRODUCTS))
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=self.manufacturers_callback,
+                              content_type='application/json')
+
+            products = Service.query(ProductWithNavigation)
+            manufacturers = Service.query(Manufacturer).filter(Manufacturer.name != 'Foo')
+            on = (ProductWithNavigation.manufacturer_id, Manufacturer.id)
+            return products.join(manufacturers, on=on, **kwargs).all()
+
+    def test_join(self):
+        pairs = self.run_join()
+        names = [(p.name, m.name) for p, m in pairs]
+        self.assertEqual(names, [('Kettle', 'Acme'), ('Toaster', 'Globex'), ('Lamp', 'Acme')])
+        self.assertEqual(len(self.filters), 1)
+        self.assertIn("Name ne 'Foo'", self.filters[0])
+
+    def test_join_batches(self):
+        pairs = self.run_join(batch_size=2, max_workers=2, outer=True)
+        names = [(p.name, m.name if m else None) for p, m in pairs]
+        self.assertEqual(names, [('Kettle', 'Acme'), ('Toaster', 'Globex'),
+                                 ('Lamp', 'Acme'), ('Clock', None)])
+        # each distinct key is requested once, batches may be sent in any order
+        self.assertEqual(len(self.filters), 2)
+        for key in (10, 11, 12):
+            requests_for_key = [f for f in self.filters if 'ManufacturerID eq {0}'.format(key) in f]
+            self.assertEqual(len(requests_for_key), 1)
+
+    def test_join_in_flight_keys(self):
+        # Lamp's key is still being fetched for Kettle when Lamp is read
+        pairs = self.run_join(batch_size=1, max_workers=3, outer=True)
+        names = [(p.name, m.name if m else None) for p, m in pairs]
+        self.assertEqual(names, [('Kettle', 'Acme'), ('Toaster', 'Globex'),
+                                 ('Lamp', 'Acme'), ('Clock', None)])
+        self.assertEqual(len(self.filters), 3)
+
+    def test_join_cache_size(self):
+        pairs = self.run_join(batch_size=1, cache_size=0)
+        names = [(p.name, m.name) for p, m in pairs]
+        self.assertEqual(names, [('Kettle', 'Acme'), ('Toaster', 'Globex'), ('Lamp', 'Acme')])
+        # Acme's key was forgotten and fetched again
+        self.assertEqual(len(self.filters), 4)
+
+    def test_join_select(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=PRODUCTS))
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=self.manufacturers_callback,
+                              content_type='application/json')
+
+            products = Service.query(ProductWithNavigation)
+            products = products.select(ProductWithNavigation.name, ProductWithNavigation.manufacturer_id)
+            on = (ProductWithNavigation.manufacturer_id, Manufacturer.id)
+            pairs = products.join(Service.query(Manufacturer), on=on).all()
+
+        names = [(p['ProductName'], m.name) for p, m in pairs]
+        self.assertEqual(names, [('Kettle', 'Acme'), ('Toaster', 'Globex'), ('Lamp', 'Acme')])
+
+    def test_join_select_without_key(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=[dict(ProductName='Kettle')]))
+
+            products = Service.query(ProductWithNavigation).select(ProductWithNavigation.name)
+            on = (ProductWithNavigation.manufacturer_id, Manufacturer.id)
+            join = products.join(Service.query(Manufacturer), on=on)
+            self.assertRaises(ODataError, join.all)
+
+    def test_join_workers_deadline(self):
+        with Deadline(30.0):
+            self.run_join(batch_size=2, max_workers=2)
+        self.assertEqual(len(self.timeouts), 2)
+        self.assertTrue(all(timeout <= 30.0 for timeout in self.timeouts))
+
+
+class TestCrossJoin(TestCase):
+
+    def test_crossjoin(self):
+        url = Service.url + '$crossjoin(ProductsWithNavigation,Manufacturers)'
+
+        def request_callback(request):
+            params = parse_qs(urlparse(request.url).query)
+            self.assertEqual(params['$filter'][0],
+                             'ProductsWithNavigation/ManufacturerID eq Manufacturers/ManufacturerID'
+                             ' and Manufacturers/Name ne null')
+            self.assertEqual(params['$expand'][0],
+                             'ProductsWithNavigation($select=ProductName,ProductID),Manufacturers')
+            self.assertEqual(params['$orderby'][0], 'Manufacturers/Name asc')
+
+            rows = [{
+                'ProductsWithNavigation': dict(ProductID=1, ProductName='Kettle'),
+                'Manufacturers': dict(ManufacturerID=10, Name='Acme'),
+            }]
+            return requests.codes.ok, {}, json.dumps(dict(value=rows))
+
+        query = Service.crossjoin(ProductWithNavigation, Manufacturer)
+        p = query.qualify(ProductWithNavigation)
+        m = query.qualify(Manufacturer)
+        query = query.filter(p.manufacturer_id == m.id)
+        query = query.filter(m.name != None)
+        query = query.select(p.name)
+        query = query.order_by(m.name.asc())
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, url, callback=request_callback,
+                              content_type='application/json')
+            rows = query.all()
+
+        row = rows[0]
+        self.assertIsInstance(row.ProductWithNavigation, ProductWithNavigation)
+        self.assertEqual(row.ProductWithNavigation.name, 'Kettle')
+        self.assertEqual(row.Manufacturer.name, 'Acme')
+        product, manufacturer = row
+        self.assertEqual(manufacturer.id, 10)
+
+    def test_crossjoin_select_loads_rest(self):
+        url = Service.url + '$crossjoin(ProductsWithNavigation,Manufacturers)'
+        row = {
+            'ProductsWithNavigation': dict(ProductID=1, ProductName='Kettle'),
+            'Manufacturers': dict(ManufacturerID=10, Name='Acme'),
+        }
+
+        query = Service.crossjoin(ProductWithNavigation, Manufacturer)
+        p = query.qualify(ProductWithNavigation)
+        m = query.qualify(Manufacturer)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, url, content_type='application/json', json=dict(value=[row]))
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(), content_type='application/json',
+                     json=dict(value=[dict(ProductID=1, Price=2.5)]))
+            product = query.select(p.name, m.name).first().ProductWithNavigation
+
+            self.assertEqual(product.id, 1)
+            self.assertEqual(product.price, 2.5)
+            self.assertEqual(len(rsps.calls), 2)
+            params = parse_qs(urlparse(rsps.calls[0].request.url).query)
+            self.assertEqual(params['$expand'][0],
+                             'ProductsWithNavigation($select=ProductName,ProductID),'
+                             'Manufacturers($select=Name,ManufacturerID)')
+
+    def test_crossjoin_pages(self):
+        url = Service.url + '$crossjoin(ProductsWithNavigation,Manufacturers)'
+        row = {
+            'ProductsWithNavigation': dict(ProductID=1, ProductName='Kettle'),
+            'Manufacturers': dict(ManufacturerID=10, Name='Acme'),
+        }
+        next_link = '$crossjoin(ProductsWithNavigation,Manufacturers)?$skiptoken=1'
+
+        query = Service.crossjoin(ProductWithNavigation, Manufacturer)
+        query = query.page_size(1).response_format(streaming=True).deadline(30.0)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, url, content_type='application/json',
+                     json={'value': [row], '@odata.nextLink': next_link})
+            rsps.add(rsps.GET, url, content_type='application/json', json={'value': [row]})
+            rows = query.all()
+
+            self.assertEqual(len(rows), 2)
+            self.assertEqual(rows[1].Manufacturer.name, 'Acme')
+            for call in rsps.calls:
+                self.assertEqual(call.request.headers['Prefer'], 'odata.maxpagesize=1')
+                self.assertLessEqual(call.request.req_kwargs['timeout'], 30.0)
+            self.assertIn('$skiptoken=1', rsps.calls[1].request.url)
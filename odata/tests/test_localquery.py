@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import responses
+
+from odata.localquery import EntityStore, parse_filter, FilterParseError
+from odata.tests import Service, Product, Manufacturer
+
+
+PRODUCTS = [
+    dict(ProductID=1, ProductName='Kettle', Category='Kitchen', Price=20.0, ColorSelection='Red'),
+    dict(ProductID=2, ProductName='Toaster', Category='Kitchen', Price=35.5, ColorSelection='Black'),
+    dict(ProductID=3, ProductName='Lamp', Category='Living room', Price=12.0, ColorSelection='Blue'),
+    dict(ProductID=4, ProductName="Chef's knife", Category='Kitchen', Price=None, ColorSelection='Black'),
+]
+
+
+class TestFilterParser(TestCase):
+
+    def test_parse_comparisons(self):
+        tree = parse_filter(Product.price > 20)
+        self.assertEqual(tree, ('cmp', 'gt', ('prop', 'Price'), ('lit', 20)))
+
+        tree = parse_filter(Product.name == "Chef's knife")
+        self.assertEqual(tree, ('cmp', 'eq', ('prop', 'ProductName'), ('lit', "Chef's knife")))
+
+    def test_parse_precedence(self):
+        tree = parse_filter('A eq 1 or B eq 2 and not C eq 3')
+        self.assertEqual(tree[0], 'or')
+        self.assertEqual(tree[2][0], 'and')
+        self.assertEqual(tree[2][2][0], 'not')
+
+    def test_unsupported_function(self):
+        self.assertRaises(FilterParseError, parse_filter, 'geo.distance(A, B) lt 5')
+
+
+class TestEntityStore(TestCase):
+
+    def setUp(self):
+        self.store = EntityStore()
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=PRODUCTS))
+            self.store.load(Service.query(Product))
+        Service.entity_store = self.store
+
+    def tearDown(self):
+        Service.entity_store = None
+
+    def test_materialize(self):
+        query = Service.query(Product).filter(Product.category == 'Kitchen')
+        with responses.RequestsMock():
+            expected = [p.name for p in query]
+            with query.materialize(memory_limit=0) as results:
+                self.assertEqual([p.name for p in results], expected)
+        self.assertTrue(expected)
+
+    def test_filter_order_limit(self):
+        query = Service.query(Product)
+        query = query.filter(Product.category == 'Kitchen')
+        query = query.filter(Product.price > 10)
+        query = query.order_by(Product.price.desc())
+
+        with responses.RequestsMock():
+            results = query.all()
+            self.assertEqual([p.name for p in results], ['Toaster', 'Kettle'])
+            self.assertEqual(query.offset(1).limit(1).first().name, 'Kettle')
+
+    def test_null_ordering_and_functions(self):
+        query = Service.query(Product).filter(Product.name.startswith('Chef'))
+        with responses.RequestsMock():
+            self.assertEqual(query.one().id, 4)
+
+            query = Service.query(Product).filter(Product.category == 'Kitchen')
+            query = query.order_by(Product.price.asc())
+            self.assertEqual([p.id for p in query], [4, 1, 2])
+
+    def test_get_and_select(self):
+        self.store.add_index(Product, Product.category)
+        with responses.RequestsMock():
+            self.assertEqual(Service.query(Product).get(3).name, 'Lamp')
+
+            query = Service.query(Product).select(Product.name)
+            query = query.filter(Product.id.in_([1, 3]))
+            self.assertEqual(query.all(), [dict(ProductName='Kettle'), dict(ProductName='Lamp')])
+
+            query = Service.query(Product).filter(Product.category == 'Living room')
+            self.assertEqual([p.id for p in query], [3])
+
+    def test_fallback_to_service(self):
+        query = Service.query(Product).filter('geo.distance(Location, Here) lt 5')
+        self.assertFalse(self.store.covers(query))
+        self.assertFalse(self.store.covers(Service.query(Manufacturer)))
+
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Product.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=[PRODUCTS[0]]))
+            self.assertEqual(len(query.all()), 1)
+            self.assertEqual(len(rsps.calls), 1)
+
+    def test_expiry(self):
+        self.store.ttl = 60
+        self.assertTrue(self.store.covers(Service.query(Product)))
+        self.store.collections[Product].loaded_at -= 61
+        self.assertFalse(self.store.covers(Service.query(Product)))
+
+    def test_save_and_restore(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'store.json')
+        self.store.save(path)
+
+        store = EntityStore()
+        store.restore(path, [Product, Manufacturer])
+        Service.entity_store = store
+        with responses.RequestsMock():
+            self.assertEqual(len(Service.query(Product).all()), 4)
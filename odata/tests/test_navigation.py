@@ -6,6 +6,7 @@ import json
 import responses
 import requests
 
+from odata.query import Expand
 from odata.tests import Service, ProductWithNavigation, ProductPart, Manufacturer
 
 
@@ -211,3 +212,91 @@ class TestNavigationObjects(unittest.TestCase):
             )
 
             Service.save(product)
+
+    def test_expand_options(self):
+        expand = Expand(ProductWithNavigation.parts,
+                        select=[ProductPart.name, ProductPart.size],
+                        filter=ProductPart.size > 2,
+                        order_by=ProductPart.name.asc(),
+                        limit=5,
+                        count=True,
+                        expand=[ProductPart.product])
+        # the key of the expanded entity is always selected
+        expected = ('Parts($select=PartName,Size,PartID;$filter=Size gt 2;'
+                    '$orderby=PartName asc;$top=5;$count=true;$expand=Product)')
+        self.assertEqual(str(expand), expected)
+
+        self.assertEqual(str(Expand('Parts/Product', select=[ProductWithNavigation.name])),
+                         'Parts($expand=Product($select=ProductName))')
+        self.assertEqual(str(Expand(ProductWithNavigation.parts, levels='max')),
+                         'Parts($levels=max)')
+
+        query = Service.query(ProductWithNavigation).expand(expand, 'Manufacturer')
+        self.assertEqual(query._get_options()['$expand'], expected + ',Manufacturer')
+
+        query = Service.query(ProductWithNavigation)
+        query = query.expand(Expand('Parts/Product', select=[ProductWithNavigation.name]))
+        self.assertEqual(query._get_options()['$expand'],
+                         'Parts($expand=Product($select=ProductName,ProductID))')
+
+    def test_expand_select_loads_rest(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(), content_type='application/json',
+                     json=dict(value=[dict(ProductID=51, ProductName='Foo',
+                                           Parts=[dict(PartID=512, PartName='Bits')])]))
+            rsps.add(rsps.GET, ProductPart.__odata_url__(), content_type='application/json',
+                     json=dict(value=[dict(PartID=512, Size=2.5)]))
+
+            query = Service.query(ProductWithNavigation)
+            query = query.expand(Expand(ProductWithNavigation.parts, select=[ProductPart.name]))
+            part = query.first().parts[0]
+            self.assertEqual(part.id, 512)
+            self.assertEqual(float(part.size), 2.5)
+            self.assertEqual(len(rsps.calls), 2)
+            self.assertIn('PartID', rsps.calls[1].request.url)
+
+    def test_read_nested_expanded_navigation_property(self):
+        def request_callback(request):
+            payload = {
+                'ProductID': 51,
+                'ProductName': 'Foo',
+                'Parts@odata.count': 12,
+                'Parts': [
+                    {
+                        'PartID': 512,
+                        'PartName': 'Bits and bobs',
+                        'Product': {
+                            'ProductID': 51,
+                            'ProductName': 'Foo',
+                            'Manufacturer': None,
+                        },
+                    }
+                ]
+            }
+
+            resp_body = {'value': [payload]}
+            headers = {}
+            return requests.codes.ok, headers, json.dumps(resp_body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(
+                rsps.GET, ProductWithNavigation.__odata_url__(),
+                callback=request_callback,
+                content_type='application/json',
+            )
+
+            query = Service.query(ProductWithNavigation)
+            query = query.expand(Expand(ProductWithNavigation.parts,
+                                        select=[ProductPart.name],
+                                        count=True,
+                                        expand=[Expand(ProductPart.product,
+                                                       expand=['Manufacturer'])]))
+            product = query.first()
+
+            part = product.parts[0]
+            self.assertEqual(part.name, 'Bits and bobs')
+            self.assertEqual(product.__odata__.nav_cache['Parts']['count'], 12)
+            self.assertEqual(part.product.name, 'Foo')
+            self.assertIsNone(part.product.manufacturer)
+            self.assertIs(part.__odata__.connection, Service.default_context.connection)
+            self.assertEqual(len(rsps.calls), 1)
@@ -7,8 +7,16 @@ from decimal import Decimal
 import responses
 import requests
 
+from odata.property import DecimalProperty
 from odata.tests import Service, Product, ProductWithNavigation, ProductPart
 
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse, parse_qs
+
 
 class TestSimpleObjectManipulation(unittest.TestCase):
 
@@ -279,3 +287,39 @@ class TestSimpleObjectManipulation(unittest.TestCase):
             )
 
             Service.delete(product)
+
+    def test_compute(self):
+        def request_callback(request):
+            params = parse_qs(urlparse(request.url).query)
+            self.assertEqual(params['$compute'][0], 'Price mul 2 as DoublePrice,year(Created) as Year')
+            self.assertEqual(params['$filter'][0], 'DoublePrice gt 100')
+            self.assertEqual(params['$orderby'][0], 'DoublePrice desc')
+
+            payload = {
+                'ProductID': 1,
+                'ProductName': 'Foo',
+                'Category': 'Bar',
+                'Price': 60.5,
+                'DoublePrice': 121.0,
+                'Year': 2016,
+            }
+            resp_body = {'value': [payload]}
+            return requests.codes.ok, {}, json.dumps(resp_body)
+
+        query = Service.query(Product)
+        query = query.compute(Product.price.name + ' mul 2', as_='DoublePrice', property_type=DecimalProperty)
+        query = query.compute('year(Created)', as_='Year')
+        query = query.filter(query.computed('DoublePrice') > 100)
+        query = query.order_by(query.computed('DoublePrice').desc())
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            product = query.first()
+
+        self.assertEqual(product.__odata__.computed['DoublePrice'], Decimal('121.0'))
+        self.assertEqual(product.__odata__.computed['Year'], 2016)
+
+        selected = query.select(Product.name, query.computed('Year'))
+        self.assertEqual(selected._get_options()['$select'], 'ProductName,Year,DoublePrice')
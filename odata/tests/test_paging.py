@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.paging import AdaptivePageSize
+from odata.tests import Service, Manufacturer
+
+
+class TestPageSize(TestCase):
+
+    def setUp(self):
+        self.prefer = []
+
+    def request_callback(self, request):
+        self.prefer.append(request.headers.get('Prefer'))
+        body = dict(value=[dict(ManufacturerID=1, Name='Acme')])
+        return requests.codes.ok, {}, json.dumps(body)
+
+    def run_query(self, query):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+            return query.all()
+
+    def test_default(self):
+        self.run_query(Service.query(Manufacturer))
+        self.assertEqual(self.prefer, [None])
+
+    def test_query_page_size(self):
+        self.run_query(Service.query(Manufacturer).page_size(500))
+        self.assertEqual(self.prefer, ['odata.maxpagesize=500'])
+
+    def test_context_page_size(self):
+        context = Service.create_context(page_size=200)
+        self.run_query(context.query(Manufacturer))
+        self.run_query(context.query(Manufacturer).page_size(20))
+        self.assertEqual(self.prefer, ['odata.maxpagesize=200', 'odata.maxpagesize=20'])
+
+    def test_adaptive_page_size(self):
+        adaptive = AdaptivePageSize(initial=100)
+        context = Service.create_context(page_size=adaptive)
+        self.run_query(context.query(Manufacturer))
+        self.assertEqual(self.prefer, ['odata.maxpagesize=100'])
+        self.assertNotEqual(adaptive.get(Manufacturer.__odata_url__()), 100)
+
+
+class TestAdaptivePageSize(TestCase):
+
+    def test_grows_when_under_targets(self):
+        adaptive = AdaptivePageSize(initial=100, target_time=1.0, target_bytes=1000000)
+        adaptive.observe('a', 100, 0.1, 10000)
+        self.assertEqual(adaptive.get('a'), 200)
+        self.assertEqual(adaptive.get('b'), 100)
+
+    def test_shrinks_when_over_target_time(self):
+        adaptive = AdaptivePageSize(initial=100, target_time=1.0, target_bytes=1000000)
+        adaptive.observe('a', 100, 1.25, 10000)
+        self.assertEqual(adaptive.get('a'), 80)
+
+    def test_shrinks_when_over_target_bytes(self):
+        adaptive = AdaptivePageSize(initial=100, target_time=1.0, target_bytes=10000)
+        adaptive.observe('a', 100, 0.1, 100000)
+        self.assertEqual(adaptive.get('a'), 50)
+
+    def test_limits(self):
+        adaptive = AdaptivePageSize(initial=100, minimum=60, maximum=150)
+        adaptive.observe('a', 100, 0.001, 1)
+        self.assertEqual(adaptive.get('a'), 150)
+        adaptive.observe('a', 150, 100.0, 1)
+        self.assertEqual(adaptive.get('a'), 75)
+        adaptive.observe('a', 75, 100.0, 1)
+        self.assertEqual(adaptive.get('a'), 60)
+
+    def test_empty_page(self):
+        adaptive = AdaptivePageSize(initial=100)
+        adaptive.observe('a', 0, 0.1, 10)
+        self.assertEqual(adaptive.get('a'), 100)
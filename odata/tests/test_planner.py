@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.planner import LoadPlanner, EXPAND, BATCH, LAZY
+from odata.profiler import SiteProfile
+from odata.tests import Service, ProductWithNavigation, ProductPart
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse, parse_qs
+
+
+def get_params(request):
+    return parse_qs(urlparse(request.url).query)
+
+
+class TestLoadPlanner(TestCase):
+
+    def setUp(self):
+        self.planner = LoadPlanner(request_cost=1000, min_observations=1)
+
+    def observe(self, entitycls, nav, parents, related_per_parent, distinct_ratio, size, accessed):
+        stats = self.planner.get_statistics(entitycls, nav)
+        stats.pages = 1
+        stats.parents = parents
+        stats.loaded_parents = parents
+        stats.related = parents * related_per_parent
+        stats.distinct = int(stats.related * distinct_ratio)
+        stats.samples = 1
+        stats.sampled_bytes = size
+        stats.accessed = accessed
+
+    def test_cold_start(self):
+        planner = LoadPlanner()
+        self.assertEqual(planner.choose(ProductWithNavigation, ProductWithNavigation.manufacturer), BATCH)
+        self.assertEqual(planner.choose(ProductWithNavigation, ProductWithNavigation.parts), BATCH)
+        self.assertEqual(planner.choose(ProductPart, ProductPart.product), BATCH)
+
+    def test_repeated_related_entities_use_batch(self):
+        nav = ProductWithNavigation.manufacturer
+        self.observe(ProductWithNavigation, nav, 100, 1, 0.05, 5000, 100)
+        self.assertEqual(self.planner.choose(ProductWithNavigation, nav), BATCH)
+
+    def test_unique_small_related_entities_use_expand(self):
+        nav = ProductWithNavigation.manufacturer
+        self.observe(ProductWithNavigation, nav, 100, 1, 1.0, 100, 100)
+        self.assertEqual(self.planner.choose(ProductWithNavigation, nav), EXPAND)
+
+    def test_rarely_accessed_use_lazy(self):
+        nav = ProductWithNavigation.parts
+        self.observe(ProductWithNavigation, nav, 100, 20, 1.0, 2000, 1)
+        self.assertEqual(self.planner.choose(ProductWithNavigation, nav), LAZY)
+
+
+class TestPrefetch(TestCase):
+
+    def test_prefetch_batch(self):
+        parts = [
+            dict(PartID=1, PartName='A', Size=1.0, ProductID=10),
+            dict(PartID=2, PartName='B', Size=1.0, ProductID=10),
+            dict(PartID=3, PartName='C', Size=1.0, ProductID=11),
+        ]
+
+        def products_callback(request):
+            query_filter = get_params(request)['$filter'][0]
+            self.assertEqual(query_filter, '(ProductID eq 10 or ProductID eq 11)')
+            body = dict(value=[
+                dict(ProductID=10, ProductName='Foo'),
+                dict(ProductID=11, ProductName='Bar'),
+            ])
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, ProductPart.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=parts))
+            rsps.add_callback(rsps.GET, ProductWithNavigation.__odata_url__(),
+                              callback=products_callback,
+                              content_type='application/json')
+
+            query = Service.query(ProductPart).prefetch(ProductPart.product)
+            results = query.all()
+
+            self.assertEqual(len(rsps.calls), 2)
+            names = [part.product.name for part in results]
+            self.assertEqual(names, ['Foo', 'Foo', 'Bar'])
+            self.assertEqual(len(rsps.calls), 2)
+
+    def test_prefetch_expand(self):
+        Service.load_planner = LoadPlanner()
+        Service.load_planner.choose = lambda entitycls, nav: EXPAND
+        self.addCleanup(setattr, Service, 'load_planner', LoadPlanner())
+
+        def request_callback(request):
+            self.assertEqual(get_params(request)['$expand'][0], 'Manufacturer')
+            row = dict(ProductID=10, ProductName='Foo', ManufacturerID=3,
+                       Manufacturer=dict(ManufacturerID=3, Name='Acme'))
+            return requests.codes.ok, {}, json.dumps(dict(value=[row]))
+
+        nav = ProductWithNavigation.manufacturer
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, ProductWithNavigation.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            product = Service.query(ProductWithNavigation).prefetch(nav).first()
+
+        self.assertEqual(product.manufacturer.name, 'Acme')
+        stats = Service.load_planner.get_statistics(ProductWithNavigation, nav)
+        self.assertEqual(stats.related, 1)
+        self.assertEqual(stats.accessed, 1)
+
+    def test_prefetch_batch_key_selected(self):
+        class NarrowingProfiler(object):
+            def get_site(self, entitycls):
+                return SiteProfile('test')
+
+            def get_select(self, site, properties):
+                return ['PartID', 'PartName']
+
+        Service.access_profiler = NarrowingProfiler()
+        self.addCleanup(setattr, Service, 'access_profiler', None)
+
+        def parts_callback(request):
+            self.assertEqual(get_params(request)['$select'][0], 'PartID,PartName,ProductID')
+            body = dict(value=[dict(PartID=1, PartName='A', ProductID=10)])
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, ProductPart.__odata_url__(),
+                              callback=parts_callback,
+                              content_type='application/json')
+            rsps.add(rsps.GET, ProductWithNavigation.__odata_url__(),
+                     content_type='application/json',
+                     json=dict(value=[dict(ProductID=10, ProductName='Foo')]))
+            part = Service.query(ProductPart).prefetch(ProductPart.product).first()
+            self.assertEqual(part.product.name, 'Foo')
+
+    def test_batch_missing_key_left_unloaded(self):
+        part = ProductPart.__new__(ProductPart, from_data=dict(PartID=1, PartName='A'),
+                                   connection=Service.default_context.connection)
+        with responses.RequestsMock():
+            ProductPart.product.load_batch([part], Service.default_context.connection)
+        self.assertNotIn('Product', part.__odata__.nav_cache)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata import ODataService
+from odata.pool import ConnectionPool
+from odata.tests import Service, Manufacturer
+
+
+class TestConnectionPool(TestCase):
+
+    def test_contexts_share_adapter(self):
+        first = Service.create_context()
+        second = Service.create_context(auth=('user', 'password'))
+        adapter = Service.pool.adapter
+        self.assertIs(first.connection.session.get_adapter(Service.url), adapter)
+        self.assertIs(second.connection.session.get_adapter(Service.url), adapter)
+        self.assertIsNot(first.connection.session, second.connection.session)
+        self.assertEqual(second.connection.auth, ('user', 'password'))
+
+    def test_custom_session(self):
+        session = requests.Session()
+        context = Service.create_context(session=session)
+        self.assertIs(context.connection.session, session)
+
+    def test_session_close(self):
+        pool = ConnectionPool()
+        session = pool.create_session()
+        session.close()
+        self.assertIs(session.get_adapter('http://example.com/'), pool.adapter)
+
+    def test_headers(self):
+        pool = ConnectionPool(keep_alive=False, headers={'X-Tenant': 'a'})
+        session = pool.create_session()
+        self.assertEqual(session.headers['Connection'], 'close')
+        self.assertEqual(session.headers['X-Tenant'], 'a')
+
+    def test_stats(self):
+        pool = ConnectionPool(pool_maxsize=2)
+        service = ODataService(Service.url, pool=pool)
+        context = service.create_context()
+
+        def request_callback(request):
+            time.sleep(0.2)
+            return requests.codes.ok, {'content-type': 'application/json'}, '{"value": []}'
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=request_callback)
+            threads = [threading.Thread(target=context.connection.execute_get,
+                                        args=(Manufacturer.__odata_url__(),))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        stats = pool.get_stats()
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['active'], 0)
+        self.assertEqual(stats['peak_active'], 4)
+        self.assertEqual(stats['saturated'], 2)
+        self.assertEqual(stats['sessions'], 2)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.profiler import AccessProfiler
+from odata.tests import Service, Product
+
+try:
+    # noinspection PyUnresolvedReferences
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    # noinspection PyUnresolvedReferences
+    from urlparse import urlparse, parse_qs
+
+
+class TestAccessProfiler(TestCase):
+
+    def setUp(self):
+        # the default skips the whole odata package, including these tests
+        Service.access_profiler = AccessProfiler(warmup=1, skip_modules=['odata.query', 'odata.resultset'])
+        self.selects = []
+
+    def tearDown(self):
+        Service.access_profiler = None
+
+    def request_callback(self, request):
+        params = parse_qs(urlparse(request.url).query)
+        select = params.get('$select', [None])[0]
+        self.selects.append(select)
+
+        row = dict(ProductID=1, ProductName='Foo', Category='Bar', Price=1.5)
+        if select:
+            row = dict((k, v) for k, v in row.items() if k in select.split(','))
+        return requests.codes.ok, {}, json.dumps(dict(value=[row]))
+
+    def read_names(self):
+        return [p.name for p in Service.query(Product)]
+
+    def test_narrow_select_after_warmup(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+
+            self.assertEqual(self.read_names(), ['Foo'])
+            self.assertEqual(self.read_names(), ['Foo'])
+
+        self.assertIsNone(self.selects[0])
+        self.assertEqual(self.selects[1], 'ProductID,ProductName')
+
+    def test_fallback_for_unrecorded_property(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+
+            for _ in range(2):
+                products = list(Service.query(Product))
+                [p.name for p in products]
+
+            self.assertEqual(products[0].category, 'Bar')
+
+        # narrowed query, then one fallback fetch for the unloaded properties
+        self.assertEqual(self.selects[1], 'ProductID,ProductName')
+        self.assertEqual(self.selects[2], 'ProductID,Category,ColorSelection,Price')
+        self.assertEqual(len(self.selects), 3)
+        self.assertEqual(products[0].price, 1.5)
+
+    def test_materialize_narrowed(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+            for _ in range(2):
+                with Service.query(Product).materialize() as results:
+                    self.assertEqual([p.name for p in results], ['Foo'])
+
+        self.assertEqual(self.selects, [None, 'ProductID,ProductName'])
+
+    def test_select_queries_not_narrowed(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Product.__odata_url__(),
+                              callback=self.request_callback,
+                              content_type='application/json')
+
+            for _ in range(2):
+                Service.query(Product).select(Product.price).all()
+
+        self.assertEqual(self.selects, ['Price', 'Price'])
+
+    def test_max_sites(self):
+        profiler = AccessProfiler(skip_modules=['odata.profiler'], max_sites=2)
+        first = profiler.get_site(Product)
+        second = profiler.get_site(Product)
+        profiler.get_site(Product)
+        self.assertEqual(len(profiler.sites), 2)
+
+        # the least recently used site was dropped
+        self.assertNotIn(first.key, profiler.sites)
+        self.assertIn(second.key, profiler.sites)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+import responses
+
+from odata.deadline import Deadline
+from odata.exceptions import ODataTimeoutError
+from odata.ratelimit import RateLimiter, FileRateLimiter, HostRateLimiter, fcntl
+from odata.tests import Service, Manufacturer
+
+
+class TestRateLimiter(TestCase):
+
+    def test_rate(self):
+        waits = []
+        limiter = RateLimiter(rate=10, burst=2, sleep=waits.append)
+        started = time.time()
+        for _ in range(4):
+            limiter.acquire()
+            limiter.release()
+        elapsed = time.time() - started
+        self.assertEqual(len(waits), 2)
+        # the bucket refills a little while the test runs
+        self.assertTrue(0.1 - elapsed <= waits[0] <= 0.1)
+        self.assertTrue(0.2 - elapsed <= waits[1] <= 0.2)
+        self.assertEqual(limiter.requests, 4)
+
+    def test_concurrency(self):
+        limiter = RateLimiter(max_concurrent=2)
+        lock = threading.Lock()
+        state = dict(active=0, peak=0)
+
+        def work():
+            limiter.acquire()
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.01)
+            with lock:
+                state['active'] -= 1
+            limiter.release()
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(state['peak'], 2)
+
+    def test_per_host(self):
+        waits = []
+        limiter = HostRateLimiter(rate=1, burst=1, sleep=waits.append)
+        limiter.acquire('http://a.example.com/odata/Products')
+        limiter.acquire('http://b.example.com/odata/Products')
+        self.assertEqual(waits, [])
+        limiter.acquire('http://a.example.com/odata/Orders')
+        self.assertEqual(len(waits), 1)
+
+    def test_connection(self):
+        limiter = RateLimiter(rate=1000)
+        context = Service.create_context(rate_limiter=limiter)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     content_type='application/json', json=dict(value=[]))
+            context.query(Manufacturer).all()
+            context.query(Manufacturer).all()
+        self.assertEqual(limiter.requests, 2)
+
+    def test_streamed_response_holds_slot(self):
+        limiter = RateLimiter(max_concurrent=1)
+        context = Service.create_context(rate_limiter=limiter)
+        active = []
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), content_type='application/json',
+                     json=dict(value=[dict(ManufacturerID=1, Name='Acme')]))
+            for _ in context.query(Manufacturer).response_format(streaming=True):
+                active.append(limiter._active)
+        self.assertEqual(active, [1])
+        self.assertEqual(limiter._active, 0)
+
+    def test_deadline_rate(self):
+        waits = []
+        limiter = RateLimiter(rate=1, burst=1, sleep=waits.append)
+        limiter.acquire()
+        limiter.release()
+        with Deadline(0.5):
+            self.assertRaises(ODataTimeoutError, limiter.acquire)
+        self.assertEqual(waits, [])
+
+        # the token of the request that was not sent is given back
+        limiter.acquire()
+        self.assertEqual(len(waits), 1)
+        self.assertLessEqual(waits[0], 1.0)
+
+    def test_deadline_slot(self):
+        limiter = RateLimiter(max_concurrent=1)
+        limiter.acquire()
+        with Deadline(0.05):
+            self.assertRaises(ODataTimeoutError, limiter.acquire)
+        limiter.release()
+        limiter.acquire()
+        self.assertEqual(limiter._active, 1)
+
+
+@unittest.skipIf(fcntl is None, 'fcntl is not available')
+class TestFileRateLimiter(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_bucket(self):
+        path = os.path.join(self.directory, 'rate')
+        waits = []
+        first = FileRateLimiter(path, rate=10, burst=1, sleep=waits.append)
+        second = FileRateLimiter(path, rate=10, burst=1, sleep=waits.append)
+        started = time.time()
+        first.acquire()
+        self.assertEqual(waits, [])
+        second.acquire()
+        elapsed = time.time() - started
+        self.assertEqual(len(waits), 1)
+        self.assertTrue(0.1 - elapsed <= waits[0] <= 0.1)
+
+    def test_deadline_gives_back_token(self):
+        path = os.path.join(self.directory, 'rate')
+        waits = []
+        first = FileRateLimiter(path, rate=10, burst=1, sleep=waits.append)
+        second = FileRateLimiter(path, rate=10, burst=1, sleep=waits.append)
+        first.acquire()
+        with Deadline(0.05):
+            self.assertRaises(ODataTimeoutError, second.acquire)
+        second.acquire()
+        self.assertEqual(len(waits), 1)
+        self.assertLessEqual(waits[0], 0.1)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import responses
+
+from odata.exceptions import ODataError
+from odata.tests import Service, Manufacturer, ProductPart
+
+
+PAGE_1 = dict(value=[dict(ManufacturerID=i, Name='Name {0}'.format(i)) for i in range(1, 6)],
+              **{'@odata.nextLink': 'Manufacturers?$skiptoken=5'})
+PAGE_2 = dict(value=[dict(ManufacturerID=i, Name='Name {0}'.format(i)) for i in range(6, 11)])
+
+
+class TestResultSet(TestCase):
+
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.spill_dir)
+
+    def materialize(self, memory_limit):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     content_type='application/json', json=PAGE_1)
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     content_type='application/json', json=PAGE_2)
+            return Service.query(Manufacturer).all(memory_limit=memory_limit,
+                                                  spill_dir=self.spill_dir)
+
+    def test_in_memory(self):
+        results = self.materialize(memory_limit=1024 * 1024)
+        self.assertFalse(results.spilled)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+        self.assertEqual([m.id for m in results], list(range(1, 11)))
+
+    def test_spill(self):
+        results = self.materialize(memory_limit=100)
+        self.assertTrue(results.spilled)
+        self.assertEqual(len(os.listdir(self.spill_dir)), 1)
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual([m.id for m in results], list(range(1, 11)))
+        self.assertEqual(results[0].name, 'Name 1')
+        self.assertEqual(results[-1].name, 'Name 10')
+        self.assertEqual([m.id for m in results[3:6]], [4, 5, 6])
+        self.assertRaises(IndexError, results.__getitem__, 10)
+
+        results.close()
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_context_manager(self):
+        with self.materialize(memory_limit=0) as results:
+            self.assertTrue(results.spilled)
+            self.assertEqual(results[4].id, 5)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_empty(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     content_type='application/json', json=dict(value=[]))
+            results = Service.query(Manufacturer).materialize(memory_limit=0,
+                                                              spill_dir=self.spill_dir)
+        self.assertEqual(len(results), 0)
+        self.assertEqual(list(results), [])
+        results.close()
+
+    def test_missing_properties_loaded_together(self):
+        results = self.materialize(memory_limit=100)
+        first = results[0]
+        entities = list(results[3:6])
+
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), content_type='application/json',
+                     json=dict(value=[dict(ManufacturerID=i, DateEstablished=None)
+                                      for i in (1, 4, 5, 6)]))
+            self.assertIsNone(first.established_date)
+            self.assertEqual([e.established_date for e in entities], [None, None, None])
+            self.assertEqual(len(rsps.calls), 1)
+        results.close()
+
+    def test_closed(self):
+        results = self.materialize(memory_limit=100)
+        results.close()
+        self.assertEqual(len(results), 0)
+        self.assertRaises(ODataError, results.__getitem__, 0)
+
+    def test_prefetch_rejected(self):
+        query = Service.query(ProductPart).prefetch(ProductPart.product)
+        self.assertRaises(ODataError, query.materialize, spill_dir=self.spill_dir)
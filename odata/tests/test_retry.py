@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.exceptions import ODataError, ODataConnectionError
+from odata.retry import RetryPolicy
+from odata.tests import Service, Manufacturer, Product
+
+
+class TestRetryPolicy(TestCase):
+
+    def setUp(self):
+        self.delays = []
+        self.policy = RetryPolicy(total=3, backoff=1.0, jitter=False, sleep=self.delays.append)
+
+    def test_budgets(self):
+        policy = RetryPolicy(total=3, budgets={'POST': 1, 'DELETE': 0})
+        self.assertEqual(policy.get_budget('GET'), 3)
+        self.assertEqual(policy.get_budget('POST'), 1)
+        self.assertEqual(policy.get_budget('DELETE'), 0)
+        self.assertEqual(policy.get_budget('PATCH'), 0)
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=1.0, max_backoff=5.0, jitter=False)
+        self.assertEqual([policy.get_delay(i) for i in range(5)], [1.0, 2.0, 4.0, 5.0, 5.0])
+        policy.jitter = True
+        self.assertTrue(0 <= policy.get_delay(2) <= 4.0)
+
+    def get_context(self):
+        return Service.create_context(retry=self.policy)
+
+    def test_retry_status(self):
+        context = self.get_context()
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), status=503,
+                     headers={'Retry-After': '7'})
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), status=429)
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), content_type='application/json',
+                     json=dict(value=[dict(ManufacturerID=1, Name='Acme')]))
+            manufacturers = context.query(Manufacturer).all()
+
+        self.assertEqual([m.name for m in manufacturers], ['Acme'])
+        self.assertEqual(self.delays, [7.0, 2.0])
+
+    def test_retry_connection_error(self):
+        context = self.get_context()
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(),
+                     body=requests.exceptions.ConnectionError('Connection reset'))
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), content_type='application/json',
+                     json=dict(value=[]))
+            self.assertEqual(context.query(Manufacturer).all(), [])
+        self.assertEqual(self.delays, [1.0])
+
+    def test_retries_exhausted(self):
+        context = self.get_context()
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), status=503)
+            self.assertRaises(ODataError, context.query(Manufacturer).all)
+        self.assertEqual(self.delays, [1.0, 2.0, 4.0])
+
+    def test_long_retry_after(self):
+        context = self.get_context()
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Manufacturer.__odata_url__(), status=503,
+                     headers={'Retry-After': '3600'})
+            self.assertRaises(ODataError, context.query(Manufacturer).all)
+        self.assertEqual(self.delays, [])
+
+    def test_post_not_retried(self):
+        context = self.get_context()
+        product = Product()
+        product.name = 'Kettle'
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.POST, Product.__odata_url__(),
+                     body=requests.exceptions.ConnectionError('Connection reset'))
+            self.assertRaises(ODataConnectionError, context.save, product)
+        self.assertEqual(self.delays, [])
+
+    def test_resume_pagination(self):
+        requested = []
+        failures = []
+
+        def request_callback(request):
+            requested.append(request.url)
+            if 'skiptoken' not in request.url:
+                body = {'value': [dict(ManufacturerID=1, Name='Acme')],
+                        '@odata.nextLink': 'Manufacturers?$skiptoken=1'}
+            elif not failures:
+                failures.append(request.url)
+                return 503, {}, ''
+            else:
+                body = dict(value=[dict(ManufacturerID=2, Name='Globex')])
+            return requests.codes.ok, {}, json.dumps(body)
+
+        context = self.get_context()
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+            manufacturers = context.query(Manufacturer).all()
+
+        self.assertEqual([m.name for m in manufacturers], ['Acme', 'Globex'])
+        self.assertEqual(len(requested), 3)
+        self.assertEqual(len([url for url in requested if 'skiptoken' not in url]), 1)
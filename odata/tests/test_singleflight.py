@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.deadline import Deadline, CancellationToken
+from odata.exceptions import ODataError, ODataTimeoutError, ODataCancelledError
+from odata.singleflight import SingleFlight
+from odata.tests import Service, Manufacturer
+
+
+class TestSingleFlight(TestCase):
+
+    def _run_concurrently(self, count, fn):
+        results = [None] * count
+        errors = [None] * count
+
+        def worker(index):
+            try:
+                results[index] = fn()
+            except Exception as e:
+                errors[index] = e
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_shared_result(self):
+        group = SingleFlight()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'value': 1}
+
+        results, errors = self._run_concurrently(5, lambda: group.do('key', fn))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [None] * 5)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(group.calls, 1)
+        self.assertEqual(group.shared, 4)
+
+    def test_shared_error(self):
+        group = SingleFlight()
+
+        def fn():
+            time.sleep(0.2)
+            raise ODataError('failed')
+
+        results, errors = self._run_concurrently(3, lambda: group.do('key', fn))
+        self.assertTrue(all(isinstance(e, ODataError) for e in errors))
+        self.assertEqual(group.calls, 1)
+
+    def test_follower_deadline(self):
+        group = SingleFlight()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            time.sleep(0.5)
+            return 1
+
+        leader = threading.Thread(target=group.do, args=('key', slow))
+        leader.start()
+        started.wait()
+        begin = time.time()
+        with Deadline(0.1):
+            self.assertRaises(ODataTimeoutError, group.do, 'key', slow)
+        self.assertTrue(time.time() - begin < 0.4)
+        leader.join()
+
+    def test_follower_cancelled(self):
+        group = SingleFlight()
+        started = threading.Event()
+        token = CancellationToken()
+
+        def slow():
+            started.set()
+            time.sleep(0.5)
+            return 1
+
+        leader = threading.Thread(target=group.do, args=('key', slow))
+        leader.start()
+        started.wait()
+        threading.Timer(0.05, token.cancel).start()
+        with Deadline(token=token):
+            self.assertRaises(ODataCancelledError, group.do, 'key', slow)
+        leader.join()
+
+    def test_leader_deadline_not_shared(self):
+        group = SingleFlight()
+        started = threading.Event()
+        calls = []
+
+        def leader_fn():
+            started.set()
+            time.sleep(0.1)
+            raise ODataTimeoutError('Deadline exceeded')
+
+        def follower_fn():
+            calls.append(1)
+            return 2
+
+        leader = threading.Thread(target=lambda: self.assertRaises(ODataTimeoutError, group.do,
+                                                                   'key', leader_fn))
+        leader.start()
+        started.wait()
+        self.assertEqual(group.do('key', follower_fn), 2)
+        self.assertEqual(calls, [1])
+        self.assertEqual(group.shared, 0)
+        leader.join()
+
+    def test_sequential_calls(self):
+        group = SingleFlight()
+        self.assertEqual(group.do('key', lambda: 1), 1)
+        self.assertEqual(group.do('key', lambda: 2), 2)
+        self.assertEqual(group.calls, 2)
+        self.assertEqual(group.shared, 0)
+
+    def test_coalesce_requests(self):
+        context = Service.create_context(coalesce_requests=True)
+
+        def request_callback(request):
+            time.sleep(0.2)
+            body = '{"value": [{"ManufacturerID": 1, "Name": "Acme"}]}'
+            return requests.codes.ok, {'content-type': 'application/json'}, body
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=request_callback)
+            results, errors = self._run_concurrently(
+                4, lambda: [m.name for m in context.query(Manufacturer).all()])
+            self.assertEqual(len(rsps.calls), 1)
+
+        self.assertEqual(errors, [None] * 4)
+        self.assertEqual(results, [['Acme']] * 4)
+        self.assertEqual(context.connection.single_flight.shared, 3)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata.codec import JSONCodec
+from odata.exceptions import ODataError
+from odata.streaming import PageParser
+from odata.tests import Service, Manufacturer
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestPageParser(TestCase):
+
+    body = json.dumps({
+        '@odata.context': '$metadata#Manufacturers',
+        '@odata.count': 3,
+        'value': [
+            {'ManufacturerID': 1, 'Name': u'Acme "Quoted" \\ {x} ä', 'Tags': ['a', ']']},
+            {'ManufacturerID': 2, 'Name': None, 'Nested': {'Value': [1, {'x': 2.5}]}},
+            {'ManufacturerID': 3, 'Name': '', 'Active': True},
+        ],
+        '@odata.nextLink': 'Manufacturers?$skiptoken=3',
+    }, ensure_ascii=False).encode('utf-8')
+
+    def parse(self, chunk_size):
+        parser = PageParser(chunked(self.body, chunk_size), JSONCodec())
+        return parser, list(parser)
+
+    def test_single_chunk(self):
+        parser, rows = self.parse(len(self.body))
+        self.assertEqual(rows, json.loads(self.body.decode('utf-8'))['value'])
+        self.assertEqual(parser.rows, 3)
+        self.assertEqual(parser.bytes_read, len(self.body))
+        self.assertEqual(parser.annotations['@odata.count'], 3)
+        self.assertEqual(parser.annotations['@odata.nextLink'], 'Manufacturers?$skiptoken=3')
+
+    def test_small_chunks(self):
+        expected = json.loads(self.body.decode('utf-8'))['value']
+        for size in (1, 2, 3, 7):
+            parser, rows = self.parse(size)
+            self.assertEqual(rows, expected)
+            self.assertEqual(parser.annotations['@odata.nextLink'], 'Manufacturers?$skiptoken=3')
+
+    def test_rows_before_end(self):
+        chunks = iter([b'{"value": [{"a": 1},', b' {"a": 2}'])
+        parser = PageParser(chunks, JSONCodec())
+        rows = iter(parser)
+        self.assertEqual(next(rows), dict(a=1))
+        self.assertEqual(next(rows), dict(a=2))
+        self.assertRaises(ODataError, next, rows)
+
+    def test_empty_value(self):
+        parser = PageParser([b' { "value" : [ ] } '], JSONCodec())
+        self.assertEqual(list(parser), [])
+        self.assertEqual(parser.annotations, {})
+
+    def test_invalid(self):
+        parser = PageParser([b'[1, 2]'], JSONCodec())
+        self.assertRaises(ODataError, list, parser)
+
+
+class TestStreamingQuery(TestCase):
+
+    def test_query(self):
+        accept = []
+
+        def request_callback(request):
+            accept.append(request.headers.get('Accept'))
+            if 'skiptoken' in request.url:
+                body = dict(value=[dict(ManufacturerID=2, Name='Globex')])
+            else:
+                body = {
+                    '@odata.nextLink': 'Manufacturers?$skiptoken=1',
+                    'value': [dict(ManufacturerID=1, Name='Acme')],
+                }
+            return requests.codes.ok, {}, json.dumps(body)
+
+        with responses.RequestsMock() as rsps:
+            rsps.add_callback(rsps.GET, Manufacturer.__odata_url__(),
+                              callback=request_callback,
+                              content_type='application/json')
+
+            context = Service.create_context(streaming=True)
+            manufacturers = context.query(Manufacturer).all()
+
+        self.assertEqual([m.name for m in manufacturers], ['Acme', 'Globex'])
+        self.assertEqual(accept, ['application/json;odata.streaming=true'] * 2)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import time
+from unittest import TestCase
+
+import requests
+import responses
+
+from odata import ODataService
+from odata.tests import Service
+
+
+class TestWarmup(TestCase):
+
+    def test_warmup(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Service.url, content_type='application/json', json=dict(value=[]))
+            self.assertEqual(Service.warmup(connections=3), 3)
+            self.assertEqual(len(rsps.calls), 3)
+            self.assertEqual(rsps.calls[0].request.headers['OData-Version'], '4.0')
+
+    def test_warmup_failed(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Service.url, status=401)
+            self.assertEqual(Service.warmup(connections=2), 0)
+
+    def test_warmup_connection_error(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Service.url, body=requests.exceptions.ConnectionError('refused'))
+            self.assertEqual(Service.warmup(), 0)
+
+    def test_warmup_on_create(self):
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Service.url, content_type='application/json', json=dict(value=[]))
+            service = ODataService(Service.url, warmup_connections=2)
+            self.assertEqual(len(rsps.calls), 2)
+        self.assertEqual(service.pool.get_stats()['requests'], 2)
+
+    def test_keepalive(self):
+        service = ODataService(Service.url)
+        with responses.RequestsMock() as rsps:
+            rsps.add(rsps.GET, Service.url, content_type='application/json', json=dict(value=[]))
+            service.start_keepalive(interval=0.05)
+            time.sleep(0.3)
+            service.stop_keepalive()
+            self.assertTrue(len(rsps.calls) >= 2)
+        self.assertIsNone(service.keepalive)
+
+    def test_keepalive_not_idle(self):
+        service = ODataService(Service.url)
+        service.pool.last_used = time.time() + 60
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+            rsps.add(rsps.GET, Service.url, content_type='application/json', json=dict(value=[]))
+            service.start_keepalive(interval=0.05)
+            time.sleep(0.2)
+            service.stop_keepalive()
+            self.assertEqual(len(rsps.calls), 0)
+
+    def test_keepalive_not_idle_with_session(self):
+        service = ODataService(Service.url, session=requests.Session())
+        self.assertIsNone(service.default_context.connection.pool)
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+            rsps.add(rsps.GET, Service.url, content_type='application/json', json=dict(value=[]))
+            service.default_context.connection.last_used = time.time() + 60
+            service.start_keepalive(interval=0.05)
+            time.sleep(0.2)
+            service.stop_keepalive()
+            self.assertEqual(len(rsps.calls), 0)
+
+            service.default_context.connection.last_used = None
+            service.start_keepalive(interval=0.05)
+            time.sleep(0.2)
+            service.stop_keepalive()
+            self.assertTrue(len(rsps.calls) >= 1)
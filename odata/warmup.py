@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""
+Connection warm-up
+==================
+
+The first request to an endpoint pays for the DNS lookup, the TCP and TLS
+handshakes and the authentication. :py:func:`~odata.service.ODataService.warmup`
+sends requests for the service document ahead of time, opening and
+authenticating pooled connections before they are needed:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, auth=my_auth)
+    >>> Service.warmup(connections=4)
+    4
+
+The requests are sent at the same time so that up to ``connections``
+connections are opened. Services can also be warmed up while they are
+created, before the metadata document is requested:
+
+.. code-block:: python
+
+    >>> Service = ODataService(url, reflect_entities=True, warmup_connections=4)
+
+Servers and load balancers close connections that stay idle for long. A
+keep-alive thread sends the same requests whenever no other request has been
+sent for ``interval`` seconds:
+
+.. code-block:: python
+
+    >>> Service.start_keepalive(interval=30, connections=4)
+    >>> Service.stop_keepalive()
+
+Failed warm-up requests are logged and do not raise exceptions.
+
+----
+
+API
+---
+"""
+
+import logging
+import threading
+import time
+
+from requests.exceptions import RequestException
+
+from odata.exceptions import ODataConnectionError
+
+log = logging.getLogger('odata.warmup')
+
+
+def warmup(connection, url, connections=1):
+    """
+    Send ``connections`` concurrent GET requests to ``url``
+
+    :param connection: ODataConnection instance
+    :param url: URL to GET, usually the service root
+    :param connections: Number of concurrent requests
+    :return: Number of successful requests
+    """
+    headers = connection._get_request_headers(None)
+    results = []
+
+    def ping():
+        try:
+            response = connection._do_get(url, headers=headers)
+            response.content  # read the body so the connection returns to the pool
+            response.close()
+        except (ODataConnectionError, RequestException) as e:
+            log.warning(u'Warm-up request to {0} failed: {1}'.format(url, e))
+            results.append(False)
+            return
+        if response.status_code >= 400:
+            log.warning(u'Warm-up request to {0} failed: HTTP {1}'.format(url, response.status_code))
+        results.append(response.status_code < 400)
+
+    threads = [threading.Thread(target=ping) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(results)
+
+
+class KeepAlive(object):
+    """
+    Background thread sending warm-up requests while the connection is idle
+
+    :param connection: ODataConnection instance
+    :param url: URL to GET, usually the service root
+    :param interval: Seconds without requests before sending warm-up requests
+    :param connections: Number of concurrent requests
+    """
+    def __init__(self, connection, url, interval=30.0, connections=1):
+        self.connection = connection
+        self.url = url
+        self.interval = interval
+        self.connections = connections
+        self.pings = 0
+        """Number of times warm-up requests were sent"""
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return '<KeepAlive {0} interval={1}>'.format(self.url, self.interval)
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='odata-keepalive')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _is_idle(self):
+        # the pool also sees the requests of other contexts sharing it
+        if self.connection.pool is not None:
+            last_used = self.connection.pool.last_used
+        else:
+            last_used = self.connection.last_used
+        return last_used is None or time.time() - last_used >= self.interval
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if self._is_idle():
+                self.pings += 1
+                warmup(self.connection, self.url, self.connections)
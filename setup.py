@@ -16,6 +16,10 @@ tests_require = (
     'responses',
 )
 
+extras_require = {
+    'http2': ['httpx[http2]'],
+}
+
 setup(
     name='odata',
     version='0.2',
@@ -25,5 +29,6 @@ setup(
     author_email='tuomas.mursu@kapsi.fi',
     install_requires=requires,
     tests_require=tests_require,
+    extras_require=extras_require,
     packages=find_packages(),
 )